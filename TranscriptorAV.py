@@ -1,24 +1,37 @@
 import os
 import streamlit as st
-from PIL import Image
 import subprocess
-import zipfile
-import io
-import shutil
 import uuid
+import hashlib
 import time
-import tempfile
 
-# Importación condicional de moviepy para evitar errores en Streamlit Cloud
-try:
-    from moviepy.editor import VideoFileClip
-
-    MOVIEPY_AVAILABLE = True
-except ImportError:
-    MOVIEPY_AVAILABLE = False
-    st.warning(
-        "La biblioteca moviepy no está disponible. Algunas funcionalidades de procesamiento de video estarán limitadas."
-    )
+from avtools import whisper_models
+from avtools import chunked_transcription
+from avtools import streaming_transcription
+from avtools import transcript_store
+from avtools import batch_transcription
+from avtools import result_cache
+from avtools import audio_cache
+from avtools import job_scheduler
+from avtools import metrics
+from avtools import ffmpeg_utils
+from avtools import ffmpeg_progress
+from avtools import video_resize
+from avtools import video_compress
+from avtools import audio_extract
+from avtools import media_probe
+from avtools import car_conversion
+from avtools import segment_encode
+from avtools import vad
+from avtools import upload_spool
+from avtools import session_storage
+
+# Modelos de Whisper ofrecidos en la barra lateral; el primero es el predeterminado
+WHISPER_MODELS = ("small", "base", "tiny")
+
+# Precarga opcional del modelo predeterminado al iniciar el servidor / Optional model warm-up
+if os.environ.get("TRANSCRIPTORAV_PRELOAD_MODEL", "0") == "1":
+    whisper_models.warm_up(WHISPER_MODELS[0])
 
 # Configuración de Streamlit / Streamlit Configuration
 st.set_page_config(
@@ -40,8 +53,8 @@ st.set_page_config(
 
 # Carga y muestra el logo de la aplicación / Load and show the application logo
 try:
-    logo = Image.open("img/logo.png")
-    st.image(logo, width=250)
+    # Streamlit lee el archivo directamente; no hace falta cargar PIL al arrancar
+    st.image("img/logo.png", width=250)
 except Exception as e:
     st.write("TranscriptorAV: Suite de Procesamiento de Audio y Video")
 
@@ -156,26 +169,190 @@ def get_text(text_key, lang):
             "es": "Selecciona el formato de audio",
             "en": "Select the audio format",
         },
+        "transcription_started": {
+            "es": "Transcripción iniciada.",
+            "en": "Transcription started.",
+        },
+        "transcription_progress": {
+            "es": "Progreso de la transcripción",
+            "en": "Transcription progress",
+        },
+        "partial_transcript": {
+            "es": "Transcripción parcial",
+            "en": "Partial transcript",
+        },
+        "transcript_formats": {
+            "es": "Formatos de la transcripción",
+            "en": "Transcript formats",
+        },
+        "max_line_width": {
+            "es": "Ancho máximo de línea (0 = sin límite)",
+            "en": "Maximum line width (0 = no limit)",
+        },
+        "merge_paragraphs": {
+            "es": "Unir los segmentos en párrafos",
+            "en": "Merge segments into paragraphs",
+        },
+        "download_partial_txt": {
+            "es": "Descargar TXT parcial",
+            "en": "Download partial TXT",
+        },
+        "download_partial_srt": {
+            "es": "Descargar SRT parcial",
+            "en": "Download partial SRT",
+        },
+        "encoding_options": {
+            "es": "Opciones de codificación",
+            "en": "Encoding options",
+        },
+        "select_scaler": {
+            "es": "Algoritmo de escalado",
+            "en": "Scaling algorithm",
+        },
+        "select_x264_preset": {
+            "es": "Preset de x264 (más rápido = archivo más grande)",
+            "en": "x264 preset (faster = larger file)",
+        },
+        "encoder_threads": {
+            "es": "Hilos del codificador (0 = automático)",
+            "en": "Encoder threads (0 = automatic)",
+        },
+        "parallel_conversions": {
+            "es": "Conversiones simultáneas",
+            "en": "Simultaneous conversions",
+        },
+        "resume_batch": {
+            "es": "Reanudar: repetir solo los videos fallidos, incompletos o modificados",
+            "en": "Resume: redo only failed, unfinished or modified videos",
+        },
+        "server_busy": {
+            "es": "El servidor está al límite de capacidad. Inténtalo de nuevo en unos minutos.",
+            "en": "The server is at capacity. Please try again in a few minutes.",
+        },
+        "output_expired": {
+            "es": "El resultado ya no está disponible en el servidor. Vuelve a procesar el archivo.",
+            "en": "The result is no longer available on the server. Please process the file again.",
+        },
+        "job_queued": {
+            "es": "Tu trabajo está en cola. Posición:",
+            "en": "Your job is queued. Position:",
+        },
+        "job_running": {
+            "es": "Procesando... Esto puede tardar varios minutos.",
+            "en": "Processing... This may take several minutes.",
+        },
+        "parallel_transcription": {
+            "es": "Transcripción paralela por fragmentos (archivos largos)",
+            "en": "Parallel chunked transcription (long files)",
+        },
+        "chunk_minutes": {
+            "es": "Duración aproximada de cada fragmento (minutos)",
+            "en": "Approximate length of each chunk (minutes)",
+        },
+        "parallel_workers": {
+            "es": "Número de procesos en paralelo",
+            "en": "Number of parallel processes",
+        },
+        "files_uploaded": {
+            "es": "Archivos subidos:",
+            "en": "Uploaded files:",
+        },
+        "batch_transcription_info": {
+            "es": "Los archivos se transcriben juntos, en lotes, y se descargan en un único zip.",
+            "en": "The files are transcribed together in batches and downloaded as a single zip.",
+        },
+        "car_plan_copied": {
+            "es": "El video ya era compatible: se copió sin cambios.",
+            "en": "The video was already compatible: copied as is.",
+        },
+        "car_plan_remuxed": {
+            "es": "Video y audio compatibles: solo se cambió el contenedor a MP4.",
+            "en": "Compatible video and audio: only the container was changed to MP4.",
+        },
+        "car_plan_audio_transcoded": {
+            "es": "Video compatible copiado; solo se recodificó el audio a AAC.",
+            "en": "Compatible video copied; only the audio was re-encoded to AAC.",
+        },
+        "car_plan_converted": {
+            "es": "Video recodificado a H.264 1080p a 25 fps.",
+            "en": "Video re-encoded to H.264 1080p at 25 fps.",
+        },
+        "encoding_progress": {
+            "es": "Codificando",
+            "en": "Encoding",
+        },
+        "eta": {"es": "Tiempo restante", "en": "Time left"},
+        "encode_fps": {"es": "Fotogramas/s", "en": "Frames/s"},
+        "encode_speed": {"es": "Velocidad", "en": "Speed"},
+        "videos_done": {"es": "videos terminados", "en": "videos done"},
+        "admin_token": {
+            "es": "Clave de administración",
+            "en": "Admin key",
+        },
+        "show_metrics": {
+            "es": "Ver métricas de rendimiento",
+            "en": "Show performance metrics",
+        },
+        "metrics_title": {
+            "es": "Métricas por tarea (p50/p95 de las ejecuciones correctas)",
+            "en": "Per-task metrics (p50/p95 of successful runs)",
+        },
+        "no_metrics": {
+            "es": "Todavía no hay métricas registradas.",
+            "en": "No metrics recorded yet.",
+        },
+        "storage_state": {
+            "es": "Almacenamiento temporal de las sesiones",
+            "en": "Session temporary storage",
+        },
+        "scheduler_state": {
+            "es": "Estado del planificador",
+            "en": "Scheduler state",
+        },
+        "skip_silence": {
+            "es": "Omitir silencios y música (detección de voz)",
+            "en": "Skip silence and music (voice activity detection)",
+        },
     }
     return texts[text_key][lang]
 
 
-# Función para cambiar la resolución de un video / Function to change video resolution
-def change_video_resolution(uploaded_file, target_resolution, session_id, lang):
-    if not MOVIEPY_AVAILABLE:
-        return "Error: La biblioteca moviepy no está disponible", ""
+# Salida de una tarea para las métricas / Task output for the metrics
+def task_output(result):
+    """Ruta de salida de una tarea terminada con éxito (en cualquier idioma), o None."""
+    message, output_file_or_error = result[:2]
+    if message in (
+        get_text("file_processed_success", "es"),
+        get_text("file_processed_success", "en"),
+    ):
+        return output_file_or_error
+    return None
 
-    file_name_without_extension = os.path.splitext(uploaded_file.name)[0]
-    file_extension = os.path.splitext(uploaded_file.name)[1]
-    temp_dir = f"/tmp/{session_id}"
-    os.makedirs(temp_dir, exist_ok=True)
-    temp_file_path = os.path.join(temp_dir, uploaded_file.name)
 
+# Duración de un archivo para el progreso y las métricas / Media duration for progress and metrics
+def media_duration(file_path):
+    """Duración en segundos de ``file_path``, o None si ffprobe no puede leerlo."""
     try:
-        with open(temp_file_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
-    except Exception as e:
-        return get_text("error_file_write", lang), str(e)
+        return media_probe.probe(file_path).duration
+    except (subprocess.CalledProcessError, OSError, ValueError):
+        return None
+
+
+# Función para cambiar la resolución de un video / Function to change video resolution
+@metrics.tracked("change_resolution", outputs=task_output)
+def change_video_resolution(
+    uploaded_file,
+    target_resolution,
+    session_id,
+    lang,
+    scaler="bicubic",
+    preset="medium",
+    threads=0,
+    progress=None,
+):
+    file_name_without_extension = os.path.splitext(uploaded_file.name)[0]
+    file_extension = video_resize.output_extension(uploaded_file.name)
+    temp_dir = upload_spool.upload_dir(session_id, uploaded_file)
 
     # Definir el nuevo nombre de archivo con la resolución
     output_file_name = (
@@ -183,116 +360,408 @@ def change_video_resolution(uploaded_file, target_resolution, session_id, lang):
     )
     output_file_path = os.path.join(temp_dir, output_file_name)
 
+    # Reutilizar el resultado si este contenido ya se procesó con los mismos parámetros
+    cache_key = result_cache.task_key(
+        uploaded_file,
+        "change_resolution",
+        {"resolution": target_resolution, "scaler": scaler, "preset": preset},
+    )
+    cached_path = result_cache.default_cache.get(cache_key, output_file_path)
+    if cached_path:
+        return get_text("file_processed_success", lang), cached_path
+
+    try:
+        # El archivo se escribe en disco una sola vez por sesión
+        temp_file_path = upload_spool.spool_upload(uploaded_file, temp_dir)
+    except Exception as e:
+        return get_text("error_file_write", lang), str(e)
+
+    remove_previous_output(output_file_path)
+
     # Extraer dimensiones de la resolución (formato: 1920x1080)
     width, height = map(int, target_resolution.split("x"))
 
     try:
-        # Cargar el video y cambiar su resolución
-        video = VideoFileClip(temp_file_path)
-        resized_video = video.resize(newsize=(width, height))
-        resized_video.write_videofile(output_file_path, codec="libx264")
-        video.close()
-        resized_video.close()
-    except Exception as e:
-        return get_text("error_cmd_execution", lang), str(e)
+        # Escalar con FFmpeg conservando la relación de aspecto (bandas negras)
+        with metrics.stage("encode"):
+            video_resize.resize_video(
+                temp_file_path,
+                output_file_path,
+                width,
+                height,
+                scaler,
+                preset,
+                threads,
+                progress,
+            )
+    except subprocess.CalledProcessError as e:
+        return get_text("error_cmd_execution", lang), ffmpeg_utils.ffmpeg_error_message(e)
 
+    result_cache.default_cache.put(cache_key, output_file_path)
     return get_text("file_processed_success", lang), output_file_path
 
 
 # Función para comprimir un video / Function to compress video
-def compress_video(uploaded_file, compression_level, session_id, lang):
+@metrics.tracked("compress_video", outputs=task_output)
+def compress_video(uploaded_file, compression_level, session_id, lang, progress=None):
     file_name_without_extension = os.path.splitext(uploaded_file.name)[0]
     file_extension = os.path.splitext(uploaded_file.name)[1]
-    temp_dir = f"/tmp/{session_id}"
-    os.makedirs(temp_dir, exist_ok=True)
-    temp_file_path = os.path.join(temp_dir, uploaded_file.name)
+    temp_dir = upload_spool.upload_dir(session_id, uploaded_file)
 
-    try:
-        with open(temp_file_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
-    except Exception as e:
-        return get_text("error_file_write", lang), str(e)
+    # Configurar parámetros de compresión según el nivel
+    bitrate = video_compress.bitrate_for_level(compression_level)
 
     # Definir el nuevo nombre de archivo comprimido
     output_file_name = f"{file_name_without_extension}_compressed{file_extension}"
     output_file_path = os.path.join(temp_dir, output_file_name)
 
-    # Configurar parámetros de compresión según el nivel
-    if compression_level == "bajo":
-        bitrate = "2000k"
-    elif compression_level == "medio":
-        bitrate = "1000k"
-    else:  # alto
-        bitrate = "500k"
+    # Reutilizar el resultado si este contenido ya se procesó con los mismos parámetros
+    cache_key = result_cache.task_key(
+        uploaded_file, "compress_video", {"bitrate": bitrate}
+    )
+    cached_path = result_cache.default_cache.get(cache_key, output_file_path)
+    if cached_path:
+        return get_text("file_processed_success", lang), cached_path
+
+    try:
+        # El archivo se escribe en disco una sola vez por sesión
+        temp_file_path = upload_spool.spool_upload(uploaded_file, temp_dir)
+    except Exception as e:
+        return get_text("error_file_write", lang), str(e)
+
+    remove_previous_output(output_file_path)
+
+    # La duración da el porcentaje del progreso y el factor de tiempo real de las métricas
+    duration = media_duration(temp_file_path)
+    if progress is not None:
+        progress.duration = duration
 
     try:
         # Usar FFmpeg para comprimir el video
-        cmd = f'ffmpeg -i "{temp_file_path}" -b:v {bitrate} -bufsize {bitrate} "{output_file_path}"'
-        subprocess.run(cmd, shell=True, check=True)
+        with metrics.stage("encode"):
+            video_compress.compress_video(
+                temp_file_path,
+                output_file_path,
+                bitrate,
+                progress,
+                segments=segment_encode.DEFAULT_SEGMENTS,
+            )
     except subprocess.CalledProcessError as e:
-        return get_text("error_cmd_execution", lang), str(e)
+        return get_text("error_cmd_execution", lang), ffmpeg_utils.ffmpeg_error_message(e)
 
+    result_cache.default_cache.put(cache_key, output_file_path)
     return get_text("file_processed_success", lang), output_file_path
 
 
 # Función para procesar el archivo / Function to process the file
-def process_file(uploaded_file, model_choice, language_code, session_id, lang):
+@metrics.tracked("transcribe", outputs=task_output)
+def process_file(
+    uploaded_file,
+    model_choice,
+    language_code,
+    session_id,
+    lang,
+    chunk_minutes=None,
+    workers=None,
+    vad_backend=None,
+):
     file_name_without_extension = os.path.splitext(uploaded_file.name)[0]
-    temp_dir = f"/tmp/{session_id}"
-    os.makedirs(temp_dir, exist_ok=True)
-    temp_file_path = os.path.join(temp_dir, file_name_without_extension)
+    temp_dir = upload_spool.upload_dir(session_id, uploaded_file)
+    output_base = os.path.join(temp_dir, file_name_without_extension)
+
+    # Reutilizar el resultado si este contenido ya se procesó con los mismos parámetros
+    cache_key = transcription_cache_key(
+        uploaded_file, model_choice, language_code, chunk_minutes, vad_backend
+    )
+    cached_path = result_cache.default_cache.get(
+        cache_key, f"{output_base}{transcript_store.BUNDLE_EXTENSION}"
+    )
+    if cached_path:
+        return get_text("file_processed_success", lang), cached_path
 
     try:
-        with open(temp_file_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
+        # El archivo se escribe en disco una sola vez por sesión
+        temp_file_path = upload_spool.spool_upload(uploaded_file, temp_dir)
     except Exception as e:
         return get_text("error_file_write", lang), str(e)
 
-    cmd = (
-        f'whisper "{temp_file_path}" --model {model_choice} --language {language_code}'
+    # Transcribir con el modelo residente en memoria / Transcribe with the resident model
+    # Con chunk_minutes, los fragmentos se transcriben en paralelo en varios procesos
+    try:
+        # El audio decodificado se guarda en caché: otro modelo no vuelve a decodificarlo
+        digest = result_cache.upload_digest(uploaded_file)
+        if chunk_minutes:
+            with metrics.stage("transcribe"):
+                result = chunked_transcription.transcribe_in_chunks(
+                    temp_file_path,
+                    model_choice,
+                    language_code,
+                    chunk_minutes,
+                    workers,
+                    digest=digest,
+                    vad_backend=vad_backend,
+                )
+        else:
+            audio = audio_cache.load_audio(temp_file_path, digest)
+            with metrics.stage("transcribe"), whisper_models.use_model(
+                model_choice
+            ) as model:
+                if vad_backend:
+                    # Solo se transcriben los tramos con voz; los tiempos son los originales
+                    result = vad.transcribe_speech(
+                        model, audio, vad_backend, language=language_code
+                    )
+                else:
+                    result = model.transcribe(audio, language=language_code)
+    except Exception as e:
+        return get_text("error_cmd_execution", lang), str(e)
+
+    message, bundle_path = save_transcription(result, output_base, lang)
+    if message == get_text("file_processed_success", lang):
+        result_cache.default_cache.put(cache_key, bundle_path)
+    return message, bundle_path
+
+
+# Función para transcribir varios archivos en lote / Function to batch-transcribe several files
+@metrics.tracked("transcribe_batch", outputs=task_output)
+def process_files(uploaded_files, model_choice, language_code, session_id, lang):
+    """Transcribe varios archivos en una sola pasada por lotes y los entrega en un zip."""
+    temp_dir = upload_spool.upload_dir(session_id, *uploaded_files)
+    digests = [result_cache.upload_digest(f) for f in uploaded_files]
+    batch_digest = hashlib.sha256("".join(digests).encode("utf-8")).hexdigest()
+    cache_key = result_cache.cache_key(
+        batch_digest,
+        "transcribe_batch",
+        {"model": model_choice, "language": language_code, "output": "segments"},
+    )
+    bundle_path = os.path.join(
+        temp_dir, f"transcripciones_{batch_digest[:8]}{transcript_store.BUNDLE_EXTENSION}"
     )
+    cached_path = result_cache.default_cache.get(cache_key, bundle_path)
+    if cached_path:
+        return get_text("file_processed_success", lang), cached_path
+
     try:
-        subprocess.run(cmd, shell=True, check=True, cwd=temp_dir)
-    except subprocess.CalledProcessError as e:
+        paths = [upload_spool.spool_upload(f, temp_dir) for f in uploaded_files]
+    except Exception as e:
+        return get_text("error_file_write", lang), str(e)
+
+    # Las ventanas de 30 s de todos los archivos se decodifican juntas
+    try:
+        with metrics.stage("transcribe"):
+            results = batch_transcription.transcribe_files(
+                paths, model_choice, language_code, digests=digests
+            )
+    except Exception as e:
         return get_text("error_cmd_execution", lang), str(e)
 
-    zip_file_name = f"{temp_file_path}.zip"
+    names = [os.path.splitext(os.path.basename(path))[0] for path in paths]
+    message, bundle_path = save_transcriptions(results, names, bundle_path, lang)
+    if message == get_text("file_processed_success", lang):
+        result_cache.default_cache.put(cache_key, bundle_path)
+    return message, bundle_path
+
+
+# Clave de caché de una transcripción / Cache key for a transcription
+def transcription_cache_key(
+    uploaded_file, model_choice, language_code, chunk_minutes, vad_backend=None
+):
+    params = {
+        "model": model_choice,
+        "language": language_code,
+        "chunk_minutes": chunk_minutes,
+        # El resultado en caché es el almacén de segmentos, no un zip con los formatos
+        "output": "segments",
+    }
+    # Sin VAD la clave no cambia, para conservar las entradas ya guardadas
+    if vad_backend:
+        params["vad"] = vad_backend
+    return result_cache.task_key(uploaded_file, "transcribe", params)
+
+
+# Función para guardar la transcripción / Function to save the transcript
+def save_transcription(result, output_base, lang):
+    return save_transcriptions(
+        [result],
+        [os.path.basename(output_base)],
+        f"{output_base}{transcript_store.BUNDLE_EXTENSION}",
+        lang,
+    )
+
+
+# Guarda varias transcripciones en un almacén de segmentos / Save several transcripts in a segment store
+def save_transcriptions(results, names, bundle_path, lang):
+    """Guarda los segmentos; los formatos se generan al descargarlos."""
+    remove_previous_output(bundle_path)
     try:
-        with zipfile.ZipFile(zip_file_name, "w") as zipf:
-            for ext in ["json", "srt", "tsv", "txt", "vtt"]:
-                file_to_zip = f"{temp_file_path}.{ext}"
-                if os.path.exists(file_to_zip):
-                    zipf.write(file_to_zip, arcname=os.path.basename(file_to_zip))
+        with metrics.stage("write_outputs"):
+            transcript_store.save_bundle(
+                bundle_path,
+                {
+                    name: transcript_store.SegmentStore.from_result(result)
+                    for name, result in zip(transcript_store.unique_names(names), results)
+                },
+            )
     except Exception as e:
-        return get_text("error_file_zip", lang), str(e)
+        return get_text("error_file_write", lang), str(e)
+
+    return get_text("file_processed_success", lang), bundle_path
+
+
+# Descarga de transcripciones en los formatos elegidos / Download transcripts in the chosen formats
+def show_transcript_downloads(bundle_path, lang):
+    """Formatos y opciones de las transcripciones de ``bundle_path``.
+
+    Nada se genera hasta pulsar el botón: un solo archivo en un solo formato se
+    descarga tal cual y lo demás en un zip. Cambiar las opciones no vuelve a
+    ejecutar el modelo.
+    """
+    if not os.path.exists(bundle_path):
+        st.warning(get_text("output_expired", lang))
+        return
+    formats = st.multiselect(
+        get_text("transcript_formats", lang),
+        transcript_store.FORMATS,
+        default=list(transcript_store.FORMATS),
+    )
+    col_width, col_paragraphs = st.columns(2)
+    with col_width:
+        max_line_width = st.number_input(
+            get_text("max_line_width", lang), min_value=0, max_value=200, value=0
+        )
+    with col_paragraphs:
+        paragraphs = st.checkbox(get_text("merge_paragraphs", lang))
+    if not formats:
+        return
+
+    options = {"max_line_width": max_line_width or None, "paragraphs": paragraphs}
+    names = transcript_store.bundle_names(bundle_path)
+    if len(names) == 1 and len(formats) == 1:
+        label = get_text("download_file", lang)
+        file_name = f"{names[0]}.{formats[0]}"
+
+        def render():
+            store = transcript_store.load_bundle(bundle_path)[names[0]]
+            return transcript_store.render(store, formats[0], **options).encode("utf-8")
+
+    else:
+        label = get_text("download_zip", lang)
+        file_name = f"{os.path.splitext(os.path.basename(bundle_path))[0]}.zip"
 
-    return get_text("file_processed_success", lang), zip_file_name
+        def render():
+            bundle = transcript_store.load_bundle(bundle_path)
+            return transcript_store.zip_bytes(bundle, formats, **options)
+
+    # Streamlit llama a la función al pulsar el botón, en otro hilo
+    def tracked_render():
+        with metrics.track("download") as recorder, metrics.stage("render"):
+            data = render()
+            recorder.add_bytes(bytes_out=len(data))
+        return data
+
+    st.download_button(label, tracked_render, file_name=file_name)
+
+
+# Función para iniciar una transcripción incremental / Function to start a streaming transcription
+def start_transcription_stream(
+    uploaded_file, model_choice, language_code, session_id, lang
+):
+    file_name_without_extension = os.path.splitext(uploaded_file.name)[0]
+    temp_dir = upload_spool.upload_dir(session_id, uploaded_file)
+    output_base = os.path.join(temp_dir, file_name_without_extension)
+
+    # Un acierto de caché devuelve directamente el zip, sin iniciar la transcripción
+    cache_key = transcription_cache_key(uploaded_file, model_choice, language_code, None)
+    cached_path = result_cache.default_cache.get(
+        cache_key, f"{output_base}{transcript_store.BUNDLE_EXTENSION}"
+    )
+    if cached_path:
+        return get_text("file_processed_success", lang), cached_path
+
+    try:
+        # El archivo se escribe en disco una sola vez por sesión
+        temp_file_path = upload_spool.spool_upload(uploaded_file, temp_dir)
+    except Exception as e:
+        return get_text("error_file_write", lang), str(e)
+
+    stream = streaming_transcription.TranscriptionStream(
+        temp_file_path,
+        model_choice,
+        language_code,
+        digest=result_cache.upload_digest(uploaded_file),
+    )
+
+    # El planificador ejecuta la transcripción y también el guardado: así la sesión
+    # sigue protegida y la salida cuenta en su cuota, como en process_file
+    def run():
+        stream.run()
+        if stream.error:
+            return get_text("error_cmd_execution", lang), stream.error
+        message, bundle_path = save_transcription(stream.result(), output_base, lang)
+        if message == get_text("file_processed_success", lang):
+            result_cache.default_cache.put(cache_key, bundle_path)
+        return message, bundle_path
+
+    return get_text("transcription_started", lang), (stream, run)
+
+
+# Muestra el progreso y los resultados parciales de la transcripción / Show streaming progress
+def show_transcription_stream(stream, lang):
+    segments = stream.segments()
+    st.progress(
+        stream.progress(),
+        text=f"{get_text('transcription_progress', lang)}: {stream.progress():.0%}",
+    )
+    store = transcript_store.SegmentStore.from_segments(segments)
+    st.text_area(
+        get_text("partial_transcript", lang),
+        transcript_store.render(store, "txt"),
+        height=300,
+    )
+
+    base_name = os.path.splitext(os.path.basename(stream.path))[0]
+    col_txt, col_srt = st.columns(2)
+    with col_txt:
+        st.download_button(
+            get_text("download_partial_txt", lang),
+            transcript_store.render(store, "txt"),
+            file_name=f"{base_name}.txt",
+            disabled=not segments,
+        )
+    with col_srt:
+        st.download_button(
+            get_text("download_partial_srt", lang),
+            transcript_store.render(store, "srt"),
+            file_name=f"{base_name}.srt",
+            disabled=not segments,
+        )
+
+
+# Función para retirar una salida anterior / Function to remove a previous output
+def remove_previous_output(output_file_path):
+    """Elimina una salida previa con el mismo nombre antes de volver a generarla.
+
+    Las salidas pueden ser enlaces duros a entradas de la caché de resultados:
+    sobrescribirlas en el sitio corrompería la entrada, mientras que eliminarlas
+    solo retira el enlace de la sesión.
+    """
+    if os.path.exists(output_file_path):
+        os.remove(output_file_path)
 
 
 # Función para eliminar el directorio temporal / Function to cleanup the temporary directory
-def cleanup(temp_dir, retries=5, delay=1):
-    """Intenta eliminar el directorio temporal con reintentos.
+def cleanup(temp_dir):
+    """Elimina el directorio temporal de una sesión sin bloquear el script.
+
+    El directorio se renombra al instante y se borra en segundo plano; si algún
+    archivo sigue en uso, el conserje de ``session_storage`` lo borrará más tarde.
+    Las rutas que no son directorios de sesión se ignoran.
 
     Args:
         temp_dir (str): La ruta del directorio temporal a eliminar.
-        retries (int): Número de reintentos para eliminar el directorio.
-        delay (int): Tiempo de espera entre reintentos en segundos.
     """
-    for i in range(retries):
-        try:
-            if os.path.exists(temp_dir):
-                shutil.rmtree(temp_dir)
-                print(f"El directorio temporal {temp_dir} ha sido eliminado.")
-                break
-        except PermissionError as e:
-            print(
-                f"No se puede eliminar {temp_dir} porque está en uso. Reintentando..."
-            )
-            time.sleep(delay)
-    else:
-        print(
-            f"No se pudo eliminar el directorio temporal {temp_dir} después de {retries} reintentos."
-        )
+    if session_storage.default_storage.remove_dir(temp_dir):
+        print(f"El directorio temporal {temp_dir} ha sido eliminado.")
 
 
 # Configuración de Streamlit / Streamlit configuration
@@ -311,139 +780,298 @@ def sidebar_config():
     st.session_state["lang"] = lang
 
     model_choice = st.sidebar.selectbox(
-        get_text("select_model", lang), ("small", "base", "tiny")
+        get_text("select_model", lang), WHISPER_MODELS
     )
     return lang, model_choice
 
 
+# Envía una tarea al planificador global / Submit a task to the global scheduler
+def submit_job(task, resource, fn, *args, weight=1, **kwargs):
+    """Encola ``fn`` en el planificador compartido por todas las sesiones.
+
+    Un trabajo anterior de la sesión que siga en espera se retira de la cola.
+    ``weight`` es el número de hilos del recurso que ocupa (ver ``job_scheduler``).
+
+    Returns:
+        Job: El trabajo encolado, o None si el servidor está al límite de capacidad.
+    """
+    lang = st.session_state["lang"]
+    previous = st.session_state.get("job")
+    if previous is not None:
+        previous.cancel()
+    session_id = st.session_state["session_id"]
+
+    # La salida (o el enlace a la caché) también cuenta en la cuota de la sesión
+    def run_and_claim(*args, **kwargs):
+        result = fn(*args, **kwargs)
+        # Solo las tareas de un archivo devuelven (mensaje, salida, ...)
+        if isinstance(result, tuple) and result[0] == get_text("file_processed_success", lang):
+            try:
+                session_storage.default_storage.claim(session_id, result[1])
+            except session_storage.QuotaExceededError as e:
+                return get_text("error_file_write", lang), str(e)
+        return result
+
+    try:
+        # Mientras el trabajo corre, el conserje no expulsa los archivos de la sesión
+        job = job_scheduler.submit(
+            session_id,
+            resource,
+            session_storage.default_storage.holding(session_id, run_and_claim),
+            *args,
+            weight=weight,
+            **kwargs,
+        )
+    except job_scheduler.SchedulerFullError:
+        st.warning(get_text("server_busy", lang))
+        return None
+    st.session_state["job"] = job
+    st.session_state["job_task"] = task
+    return job
+
+
+# Muestra el estado del trabajo de la sesión / Show the state of the session job
+def wait_for_job(task, lang, on_running=None):
+    """Muestra la posición en cola del trabajo de ``task`` y recarga hasta que termine.
+
+    Returns:
+        Job: El trabajo terminado, o None si la sesión no tiene trabajo para ``task``.
+    """
+    job = st.session_state.get("job")
+    if job is None or st.session_state.get("job_task") != task:
+        return None
+    if job.state == job_scheduler.QUEUED:
+        st.info(f"{get_text('job_queued', lang)} {job.position()}")
+    elif job.state == job_scheduler.RUNNING:
+        if on_running is not None:
+            on_running()
+        else:
+            st.info(get_text("job_running", lang))
+    if not job.finished:
+        time.sleep(1)
+        st.rerun()
+    return job
+
+
+# Muestra el progreso de FFmpeg / Show the FFmpeg progress
+def show_ffmpeg_progress(progress, lang):
+    """Barra de progreso, tiempo restante, fotogramas/s y velocidad de la codificación."""
+    fraction = progress.fraction
+    st.progress(
+        fraction or 0.0,
+        text=(
+            f"{get_text('encoding_progress', lang)}: "
+            f"{ffmpeg_progress.format_clock(progress.out_seconds)} / "
+            f"{ffmpeg_progress.format_clock(progress.duration)}"
+        ),
+    )
+    eta_col, fps_col, speed_col = st.columns(3)
+    eta_col.metric(get_text("eta", lang), ffmpeg_progress.format_clock(progress.eta))
+    fps_col.metric(
+        get_text("encode_fps", lang), f"{progress.fps:.0f}" if progress.fps else "-"
+    )
+    speed_col.metric(
+        get_text("encode_speed", lang), f"{progress.speed:.2f}x" if progress.speed else "-"
+    )
+
+
+# Muestra el progreso del trabajo de la sesión / Show the progress of the session job
+def show_session_progress(lang):
+    progress = st.session_state.get("ffmpeg_progress")
+    if progress is None:
+        st.info(get_text("job_running", lang))
+    else:
+        show_ffmpeg_progress(progress, lang)
+
+
+# Muestra el progreso de un lote / Show the progress of a batch
+def show_batch_progress(progress, lang):
+    st.progress(
+        progress.fraction or 0.0,
+        text=f"{progress.finished}/{progress.total} {get_text('videos_done', lang)}",
+    )
+    for name, file_progress in list(progress.running.items()):
+        st.caption(f"{name}: {file_progress.format_line()}")
+
+
+# Botón de descarga de un archivo en disco / Download button for a file on disk
+def file_download_button(label, file_path):
+    """Botón de descarga de ``file_path`` que solo lee el archivo al pulsarlo.
+
+    Streamlit guarda en memoria todo lo que recibe; con una función, el archivo
+    no se relee en cada recarga de la página mientras la tarea siga en la sesión.
+    """
+
+    # Streamlit llama a la función al pulsar el botón, en otro hilo
+    def read_file():
+        with metrics.track("download") as recorder, metrics.stage("download_read"):
+            with open(file_path, "rb") as f:
+                data = f.read()
+            recorder.add_bytes(bytes_out=len(data))
+        return data
+
+    st.download_button(label, read_file, file_name=os.path.basename(file_path))
+
+
+# Muestra el resultado de una tarea terminada / Show the result of a finished task
+def show_job_result(job, lang, download_label):
+    if job.state == job_scheduler.FAILED:
+        st.error(f"{get_text('error_cmd_execution', lang)}: {job.error}")
+        return
+    if job.state != job_scheduler.DONE:
+        return
+    message, output_file_or_error = job.result[:2]
+    if message == get_text("file_processed_success", lang):
+        # La sesión pudo caducar o ser expulsada para hacer sitio a otras
+        if not os.path.exists(output_file_or_error):
+            st.warning(get_text("output_expired", lang))
+            return
+        # Algunas tareas añaden un detalle del resultado (p. ej. el plan de conversión)
+        if len(job.result) > 2:
+            st.info(job.result[2])
+        if output_file_or_error.endswith(transcript_store.BUNDLE_EXTENSION):
+            show_transcript_downloads(output_file_or_error, lang)
+        else:
+            file_download_button(get_text(download_label, lang), output_file_or_error)
+    else:
+        st.error(f"{message}: {output_file_or_error}")
+        cleanup(os.path.dirname(output_file_or_error))
+
+
 # Función para convertir video para reproductores de carro / Function to convert video for car players
-def convert_video_for_car(uploaded_file, session_id, lang):
+@metrics.tracked("convert_for_car", outputs=task_output)
+def convert_video_for_car(uploaded_file, session_id, lang, progress=None):
     file_name_without_extension = os.path.splitext(uploaded_file.name)[0]
-    file_extension = os.path.splitext(uploaded_file.name)[1]
-    temp_dir = f"/tmp/{session_id}"
-    os.makedirs(temp_dir, exist_ok=True)
-    temp_file_path = os.path.join(temp_dir, uploaded_file.name)
+    temp_dir = upload_spool.upload_dir(session_id, uploaded_file)
+
+    # Definir el nuevo nombre de archivo compatible con reproductores de carro (siempre MP4)
+    output_file_name = f"{file_name_without_extension}_car_compatible.mp4"
+    output_file_path = os.path.join(temp_dir, output_file_name)
+
+    # Reutilizar el resultado si este contenido ya se procesó con los mismos parámetros
+    cache_key = result_cache.task_key(uploaded_file, "convert_for_car", {"output": "mp4"})
+    cached_path = result_cache.default_cache.get(cache_key, output_file_path)
+    if cached_path:
+        return get_text("file_processed_success", lang), cached_path
 
     try:
-        with open(temp_file_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
+        # El archivo se escribe en disco una sola vez por sesión
+        temp_file_path = upload_spool.spool_upload(uploaded_file, temp_dir)
     except Exception as e:
         return get_text("error_file_write", lang), str(e)
 
-    # Definir el nuevo nombre de archivo compatible con reproductores de carro
-    output_file_name = f"{file_name_without_extension}_car_compatible{file_extension}"
-    output_file_path = os.path.join(temp_dir, output_file_name)
+    remove_previous_output(output_file_path)
 
     try:
-        # Convertir el video a H.264 con resolución 1080p y framerate 25fps
-        cmd = f'ffmpeg -i "{temp_file_path}" -c:v libx264 -profile:v high -level:v 4.0 -preset medium -crf 23 -vf "scale=1920:1080:force_original_aspect_ratio=decrease,pad=1920:1080:(ow-iw)/2:(oh-ih)/2" -r 25 -c:a aac -b:a 128k "{output_file_path}"'
-        subprocess.run(cmd, shell=True, check=True)
+        # Copiar, cambiar de contenedor, recodificar solo el audio o todo, lo que baste
+        with metrics.stage("encode"):
+            plan = car_conversion.convert_for_car(
+                temp_file_path,
+                output_file_path,
+                progress=progress,
+                segments=segment_encode.DEFAULT_SEGMENTS,
+            )
     except subprocess.CalledProcessError as e:
-        return get_text("error_cmd_execution", lang), str(e)
-
-    return get_text("file_processed_success", lang), output_file_path
+        return get_text("error_cmd_execution", lang), ffmpeg_utils.ffmpeg_error_message(e)
+    metrics.set_label("plan", plan)
+
+    result_cache.default_cache.put(cache_key, output_file_path)
+    return (
+        get_text("file_processed_success", lang),
+        output_file_path,
+        get_text(f"car_plan_{plan}", lang),
+    )
 
 
 # Función para procesar un directorio de videos y convertirlos para reproductores de carro
-def batch_convert_videos_for_car(input_dir, output_dir, lang):
+@metrics.tracked("batch_convert_for_car")
+def batch_convert_videos_for_car(
+    input_dir, output_dir, lang, jobs=1, resume=False, on_result=None, progress=None
+):
+    """Convierte los videos de ``input_dir`` con hasta ``jobs`` conversiones simultáneas.
+
+    Args:
+        resume (bool): Usa el registro del lote para repetir solo lo pendiente.
+        on_result (callable): Recibe la línea de resultado de cada video en cuanto termina.
+        progress (BatchProgress): Recibe el progreso de las conversiones en curso.
+    """
     # Verificar que los directorios existan
     if not os.path.exists(input_dir):
         return f"El directorio de entrada {input_dir} no existe"
 
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-
-    # Obtener todos los archivos de video en el directorio de entrada
-    video_files = [
-        f
-        for f in os.listdir(input_dir)
-        if f.endswith((".mp4", ".mkv", ".avi", ".mov", ".webm"))
-    ]
-
     results = []
-    for video_file in video_files:
-        input_path = os.path.join(input_dir, video_file)
-        file_name_without_extension = os.path.splitext(video_file)[0]
-        output_path = os.path.join(
-            output_dir, f"{file_name_without_extension}_car_compatible.mp4"
-        )
-
-        # Verificar si el archivo ya existe en el directorio de salida
-        if os.path.exists(output_path):
-            results.append(f"{video_file}: Ya convertido anteriormente")
-            continue
-
-        try:
-            # Verificar si el video ya está en formato H.264
-            probe_cmd = f'ffprobe -v error -select_streams v:0 -show_entries stream=codec_name -of default=noprint_wrappers=1:nokey=1 "{input_path}"'
-            codec = (
-                subprocess.check_output(probe_cmd, shell=True).decode("utf-8").strip()
-            )
-
-            if codec == "h264":
-                # Verificar la resolución
-                resolution_cmd = f'ffprobe -v error -select_streams v:0 -show_entries stream=width,height -of csv=s=x:p=0 "{input_path}"'
-                resolution = (
-                    subprocess.check_output(resolution_cmd, shell=True)
-                    .decode("utf-8")
-                    .strip()
-                )
-                width, height = map(int, resolution.split("x"))
-
-                if width <= 1920 and height <= 1080:
-                    # El video ya es compatible, solo copiarlo
-                    shutil.copy2(input_path, output_path)
-                    results.append(f"{video_file}: Ya compatible, copiado")
-                    continue
-
-            # Convertir el video a H.264 con resolución 1080p y framerate 25fps
-            cmd = f'ffmpeg -i "{input_path}" -c:v libx264 -profile:v high -level:v 4.0 -preset medium -crf 23 -vf "scale=1920:1080:force_original_aspect_ratio=decrease,pad=1920:1080:(ow-iw)/2:(oh-ih)/2" -r 25 -c:a aac -b:a 128k "{output_path}"'
-            subprocess.run(cmd, shell=True, check=True)
-            results.append(f"{video_file}: Convertido exitosamente")
-        except Exception as e:
-            results.append(f"{video_file}: Error - {str(e)}")
+    for video_file, status, error in car_conversion.iter_batch_convert(
+        input_dir, output_dir, jobs, resume, progress
+    ):
+        if status == car_conversion.FAILED:
+            line = f"{video_file}: Error - {error}"
+        else:
+            line = f"{video_file}: {car_conversion.STATUS_MESSAGES[status]}"
+        results.append(line)
+        if on_result is not None:
+            on_result(line)
 
     return "\n".join(results)
 
 
 # Función para convertir video a audio / Function to convert video to audio
-def convert_video_to_audio(uploaded_file, output_format, session_id, lang):
-    if not MOVIEPY_AVAILABLE:
-        return "Error: La biblioteca moviepy no está disponible", ""
-
+@metrics.tracked("convert_to_audio", outputs=task_output)
+def convert_video_to_audio(uploaded_file, output_format, session_id, lang, progress=None):
     file_name_without_extension = os.path.splitext(uploaded_file.name)[0]
-    temp_dir = f"/tmp/{session_id}"
-    os.makedirs(temp_dir, exist_ok=True)
-    temp_file_path = os.path.join(temp_dir, uploaded_file.name)
-
-    try:
-        with open(temp_file_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
-    except Exception as e:
-        return get_text("error_file_write", lang), str(e)
+    temp_dir = upload_spool.upload_dir(session_id, uploaded_file)
 
     # Definir el nuevo nombre de archivo de audio
     output_file_name = f"{file_name_without_extension}.{output_format}"
     output_file_path = os.path.join(temp_dir, output_file_name)
 
+    # Reutilizar el resultado si este contenido ya se procesó con los mismos parámetros
+    cache_key = result_cache.task_key(uploaded_file, "convert_to_audio", {"format": output_format})
+    cached_path = result_cache.default_cache.get(cache_key, output_file_path)
+    if cached_path:
+        return get_text("file_processed_success", lang), cached_path
+
     try:
-        # Cargar el video y extraer el audio
-        video = VideoFileClip(temp_file_path)
+        # El archivo se escribe en disco una sola vez por sesión
+        temp_file_path = upload_spool.spool_upload(uploaded_file, temp_dir)
+    except Exception as e:
+        return get_text("error_file_write", lang), str(e)
 
-        if output_format == "mp3":
-            video.audio.write_audiofile(output_file_path)
-        elif output_format == "wav":
-            video.audio.write_audiofile(output_file_path, codec="pcm_s16le")
-        elif output_format == "ogg":
-            video.audio.write_audiofile(output_file_path, codec="libvorbis")
+    remove_previous_output(output_file_path)
 
-        video.close()
-    except Exception as e:
+    try:
+        # Copiar el flujo de audio si el formato lo admite; si no, transcodificar con FFmpeg
+        with metrics.stage("encode"):
+            audio_extract.extract_audio(
+                temp_file_path, output_file_path, output_format, progress
+            )
+    except subprocess.CalledProcessError as e:
+        return get_text("error_cmd_execution", lang), ffmpeg_utils.ffmpeg_error_message(e)
+    except ValueError as e:
         return get_text("error_cmd_execution", lang), str(e)
 
+    result_cache.default_cache.put(cache_key, output_file_path)
     return get_text("file_processed_success", lang), output_file_path
 
 
+# Vista de administración con las métricas / Admin view with the metrics
+def show_metrics_admin(lang):
+    """Resumen p50/p95 por tarea y etapa leído del registro de métricas."""
+    sink = metrics.default_sink()
+    st.subheader(get_text("metrics_title", lang))
+    rows = metrics.summarize(metrics.read_log(sink.log_path))
+    if rows:
+        st.dataframe(rows)
+    else:
+        st.info(get_text("no_metrics", lang))
+    st.caption(f"{sink.log_path} · {sink.prom_path}")
+
+    st.subheader(get_text("scheduler_state", lang))
+    st.json(job_scheduler.scheduler.stats())
+
+    st.subheader(get_text("storage_state", lang))
+    st.json(session_storage.default_storage.stats())
+
+
 # Función principal / Main function
 def main():
     # Inicializar las claves de estado de sesión si no existen
@@ -453,6 +1081,10 @@ def main():
         st.session_state["lang"] = "es"
     if "session_id" not in st.session_state:
         st.session_state["session_id"] = str(uuid.uuid4())
+
+    # Cada recarga aleja la sesión de la caducidad; el conserje borra las abandonadas
+    session_storage.default_storage.touch(st.session_state["session_id"])
+    session_storage.default_storage.start_janitor()
     if "task" not in st.session_state:
         st.session_state["task"] = "transcribe"
 
@@ -490,6 +1122,15 @@ def main():
         "[WhatsApp](https://api.whatsapp.com/send?phone=573015930519&text=Hola%20!Quiero%20conversar%20contigo!%20)"
     )
 
+    # Las métricas solo se muestran con la clave de TRANSCRIPTORAV_ADMIN_TOKEN
+    admin_token = os.environ.get("TRANSCRIPTORAV_ADMIN_TOKEN")
+    if admin_token:
+        st.sidebar.markdown("---")
+        entered = st.sidebar.text_input(get_text("admin_token", lang), type="password")
+        if entered == admin_token and st.sidebar.checkbox(get_text("show_metrics", lang)):
+            show_metrics_admin(lang)
+            return
+
     # Campo para subir el archivo / Field to upload the file
     st.write(get_text("upload_file", lang))
 
@@ -573,114 +1214,159 @@ def main():
             "mpeg",
         ]
 
-    uploaded_file = st.file_uploader(
+    # La transcripción admite varios archivos, que se procesan juntos en lotes
+    uploaded = st.file_uploader(
         get_text("choose_file", lang),
         type=file_types,
-        accept_multiple_files=False,
+        accept_multiple_files=task == "transcribe",
     )
+    if isinstance(uploaded, list):
+        uploaded_files = uploaded
+    else:
+        uploaded_files = [uploaded] if uploaded else []
+    uploaded_file = uploaded_files[0] if len(uploaded_files) == 1 else None
 
-    if uploaded_file:
+    if len(uploaded_files) > 1:
+        st.session_state["cleanup_flag"] = True
+        st.write(
+            get_text("files_uploaded", lang),
+            ", ".join(f.name for f in uploaded_files),
+        )
+        st.info(get_text("batch_transcription_info", lang))
+
+        if st.button(get_text("process", lang)):
+            st.session_state.pop("transcription_bundle", None)
+            submit_job(
+                "transcribe_batch",
+                job_scheduler.TRANSCRIPTION,
+                process_files,
+                uploaded_files,
+                model_choice,
+                lang,
+                st.session_state["session_id"],
+                lang,
+            )
+        job = wait_for_job("transcribe_batch", lang)
+        if job is not None:
+            show_job_result(job, lang, "download_zip")
+    elif uploaded_file:
         st.session_state["cleanup_flag"] = True
         st.write(get_text("file_uploaded", lang), uploaded_file.name)
 
         # Opciones específicas para cada tarea
+        # Cada tarea se envía al planificador global; la página se recarga hasta que termina
         if task == "change_resolution":
             # Opciones de resolución para videos
             resolution = st.selectbox(
                 get_text("select_resolution", lang),
                 ["1920x1080", "1280x720", "854x480", "640x360", "426x240"],
             )
+            with st.expander(get_text("encoding_options", lang)):
+                scaler = st.selectbox(
+                    get_text("select_scaler", lang), video_resize.SCALERS
+                )
+                preset = st.selectbox(
+                    get_text("select_x264_preset", lang),
+                    video_resize.X264_PRESETS,
+                    index=video_resize.X264_PRESETS.index("medium"),
+                )
+                threads = st.number_input(
+                    get_text("encoder_threads", lang),
+                    min_value=0,
+                    max_value=os.cpu_count() or 1,
+                    value=0,
+                )
 
             if st.button(get_text("process", lang)):
-                message, output_file_or_error = change_video_resolution(
-                    uploaded_file, resolution, st.session_state["session_id"], lang
+                st.session_state["ffmpeg_progress"] = ffmpeg_progress.FfmpegProgress()
+                submit_job(
+                    task,
+                    job_scheduler.VIDEO,
+                    change_video_resolution,
+                    uploaded_file,
+                    resolution,
+                    st.session_state["session_id"],
+                    lang,
+                    scaler=scaler,
+                    preset=preset,
+                    threads=threads,
+                    progress=st.session_state["ffmpeg_progress"],
                 )
-                if message == get_text("file_processed_success", lang):
-                    with open(output_file_or_error, "rb") as f:
-                        file_bytes = io.BytesIO(f.read())
-                        st.download_button(
-                            get_text("download_file", lang),
-                            file_bytes,
-                            file_name=os.path.basename(output_file_or_error),
-                        )
-                else:
-                    st.error(f"{message}: {output_file_or_error}")
-                    cleanup(os.path.dirname(output_file_or_error))
+            job = wait_for_job(task, lang, on_running=lambda: show_session_progress(lang))
+            if job is not None:
+                show_job_result(job, lang, "download_file")
 
         elif task == "compress_video":
             # Opciones de compresión para videos
             compression_level = st.selectbox(
                 get_text("select_compression", lang),
                 ["bajo", "medio", "alto"],
-                format_func=lambda x: (
-                    get_text(f"compression_{x}", lang)
-                    if x in ["bajo", "medio", "alto"]
-                    else x
+                format_func=lambda x: get_text(
+                    {"bajo": "compression_low", "medio": "compression_medium", "alto": "compression_high"}[x],
+                    lang,
                 ),
             )
 
             if st.button(get_text("process", lang)):
-                message, output_file_or_error = compress_video(
+                st.session_state["ffmpeg_progress"] = ffmpeg_progress.FfmpegProgress()
+                submit_job(
+                    task,
+                    job_scheduler.VIDEO,
+                    compress_video,
                     uploaded_file,
                     compression_level,
                     st.session_state["session_id"],
                     lang,
+                    progress=st.session_state["ffmpeg_progress"],
                 )
-                if message == get_text("file_processed_success", lang):
-                    with open(output_file_or_error, "rb") as f:
-                        file_bytes = io.BytesIO(f.read())
-                        st.download_button(
-                            get_text("download_file", lang),
-                            file_bytes,
-                            file_name=os.path.basename(output_file_or_error),
-                        )
-                else:
-                    st.error(f"{message}: {output_file_or_error}")
-                    cleanup(os.path.dirname(output_file_or_error))
+            job = wait_for_job(task, lang, on_running=lambda: show_session_progress(lang))
+            if job is not None:
+                show_job_result(job, lang, "download_file")
 
         elif task == "convert_to_audio":
             # Opciones de formato de audio
             audio_format = st.selectbox(
-                get_text("select_audio_format", lang), ["mp3", "wav", "ogg"]
+                get_text("select_audio_format", lang), audio_extract.OUTPUT_FORMATS
             )
 
             if st.button(get_text("process", lang)):
-                message, output_file_or_error = convert_video_to_audio(
-                    uploaded_file, audio_format, st.session_state["session_id"], lang
+                st.session_state["ffmpeg_progress"] = ffmpeg_progress.FfmpegProgress()
+                submit_job(
+                    task,
+                    job_scheduler.VIDEO,
+                    convert_video_to_audio,
+                    uploaded_file,
+                    audio_format,
+                    st.session_state["session_id"],
+                    lang,
+                    progress=st.session_state["ffmpeg_progress"],
                 )
-                if message == get_text("file_processed_success", lang):
-                    with open(output_file_or_error, "rb") as f:
-                        file_bytes = io.BytesIO(f.read())
-                        st.download_button(
-                            get_text("download_file", lang),
-                            file_bytes,
-                            file_name=os.path.basename(output_file_or_error),
-                        )
-                else:
-                    st.error(f"{message}: {output_file_or_error}")
-                    cleanup(os.path.dirname(output_file_or_error))
+            job = wait_for_job(task, lang, on_running=lambda: show_session_progress(lang))
+            if job is not None:
+                show_job_result(job, lang, "download_file")
 
         elif task == "convert_for_car":
             # Opción para convertir video para reproductores de carro
             st.info(
-                "Esta opción convertirá el video a formato H.264 con resolución 1080p y 25fps, compatible con la mayoría de reproductores de carro."
+                "Esta opción deja el video en MP4 con H.264 (hasta 1080p, entre 24 y 30 fps) y audio AAC o MP3, "
+                "compatible con la mayoría de reproductores de carro. Solo se recodifica lo que no cumple: "
+                "si el video ya es válido, se copia o se cambia de contenedor a la velocidad del disco."
             )
 
             if st.button(get_text("process", lang)):
-                message, output_file_or_error = convert_video_for_car(
-                    uploaded_file, st.session_state["session_id"], lang
+                st.session_state["ffmpeg_progress"] = ffmpeg_progress.FfmpegProgress()
+                submit_job(
+                    task,
+                    job_scheduler.VIDEO,
+                    convert_video_for_car,
+                    uploaded_file,
+                    st.session_state["session_id"],
+                    lang,
+                    progress=st.session_state["ffmpeg_progress"],
                 )
-                if message == get_text("file_processed_success", lang):
-                    with open(output_file_or_error, "rb") as f:
-                        file_bytes = io.BytesIO(f.read())
-                        st.download_button(
-                            get_text("download_file", lang),
-                            file_bytes,
-                            file_name=os.path.basename(output_file_or_error),
-                        )
-                else:
-                    st.error(f"{message}: {output_file_or_error}")
-                    cleanup(os.path.dirname(output_file_or_error))
+            job = wait_for_job(task, lang, on_running=lambda: show_session_progress(lang))
+            if job is not None:
+                show_job_result(job, lang, "download_file")
 
             # Opción para procesar todos los videos en el directorio
             st.markdown("---")
@@ -689,41 +1375,138 @@ def main():
                 "Esta opción convertirá todos los videos en el directorio 'videos_originales' y guardará los resultados en 'videos_convertidos'."
             )
 
+            # Cada conversión simultánea ocupa un hilo de video del planificador
+            jobs = st.number_input(
+                get_text("parallel_conversions", lang),
+                min_value=1,
+                max_value=job_scheduler.scheduler.slots[job_scheduler.VIDEO],
+                value=1,
+            )
+            resume = st.checkbox(get_text("resume_batch", lang), value=True)
+
             if st.button("Procesar todos los videos"):
-                with st.spinner(
-                    "Procesando videos... Esto puede tardar varios minutos."
-                ):
-                    results = batch_convert_videos_for_car(
-                        "videos_originales", "videos_convertidos", lang
-                    )
+                # Cada video terminado se añade a la lista y se muestra en la siguiente recarga
+                st.session_state["batch_results"] = []
+                st.session_state["batch_progress"] = ffmpeg_progress.BatchProgress()
+                submit_job(
+                    "batch_convert_for_car",
+                    job_scheduler.VIDEO,
+                    batch_convert_videos_for_car,
+                    "videos_originales",
+                    "videos_convertidos",
+                    lang,
+                    weight=jobs,
+                    jobs=jobs,
+                    resume=resume,
+                    on_result=st.session_state["batch_results"].append,
+                    progress=st.session_state["batch_progress"],
+                )
+
+            def show_batch_running():
+                if "batch_progress" in st.session_state:
+                    show_batch_progress(st.session_state["batch_progress"], lang)
+                st.text_area(
+                    "Resultados",
+                    "\n".join(st.session_state.get("batch_results", [])),
+                    height=300,
+                )
+
+            job = wait_for_job("batch_convert_for_car", lang, on_running=show_batch_running)
+            if job is not None:
+                if job.state == job_scheduler.FAILED:
+                    st.error(f"{get_text('error_cmd_execution', lang)}: {job.error}")
+                elif job.state == job_scheduler.DONE:
                     st.success("Procesamiento completado")
-                    st.text_area("Resultados", results, height=300)
+                    st.text_area("Resultados", job.result, height=300)
 
         elif task == "transcribe":
-            if st.button(get_text("process", lang)):
-                message, output_file_or_error = process_file(
-                    uploaded_file,
-                    model_choice,
-                    lang,
-                    st.session_state["session_id"],
-                    lang,
+            # Opción de transcripción paralela por fragmentos para archivos largos
+            parallel = st.checkbox(get_text("parallel_transcription", lang))
+            chunk_minutes = None
+            workers = None
+            if parallel:
+                chunk_minutes = st.slider(get_text("chunk_minutes", lang), 2, 30, 10)
+                # Cada proceso carga su propia copia del modelo: por defecto, los que caben en RAM
+                workers = st.number_input(
+                    get_text("parallel_workers", lang),
+                    min_value=1,
+                    max_value=os.cpu_count() or 1,
+                    value=chunked_transcription.default_workers(model_choice),
                 )
-                if message == get_text("file_processed_success", lang):
-                    with open(output_file_or_error, "rb") as f:
-                        zip_bytes = io.BytesIO(f.read())
-                        st.download_button(
-                            get_text("download_zip", lang),
-                            zip_bytes,
-                            file_name=os.path.basename(output_file_or_error),
-                        )
+
+            use_vad = st.checkbox(get_text("skip_silence", lang))
+
+            if st.button(get_text("process", lang)):
+                st.session_state.pop("transcription_bundle", None)
+                st.session_state.pop("transcription_stream", None)
+                if parallel or use_vad:
+                    submit_job(
+                        task,
+                        job_scheduler.TRANSCRIPTION,
+                        process_file,
+                        uploaded_file,
+                        model_choice,
+                        lang,
+                        st.session_state["session_id"],
+                        lang,
+                        chunk_minutes=chunk_minutes,
+                        workers=workers,
+                        vad_backend="energy" if use_vad else None,
+                    )
                 else:
-                    st.error(f"{message}: {output_file_or_error}")
-                    cleanup(os.path.dirname(output_file_or_error))
+                    # Los segmentos se muestran a medida que se decodifican; las recargas
+                    # de la página (p. ej. al descargar un parcial) no interrumpen el trabajo
+                    message, stream_or_error = start_transcription_stream(
+                        uploaded_file,
+                        model_choice,
+                        lang,
+                        st.session_state["session_id"],
+                        lang,
+                    )
+                    if message == get_text("transcription_started", lang):
+                        stream, run = stream_or_error
+                        if submit_job(
+                            task,
+                            job_scheduler.TRANSCRIPTION,
+                            metrics.tracked("transcribe_stream")(run),
+                        ):
+                            st.session_state["transcription_stream"] = stream
+                    elif message == get_text("file_processed_success", lang):
+                        st.session_state["transcription_bundle"] = stream_or_error
+                    else:
+                        st.error(f"{message}: {stream_or_error}")
+
+            stream = st.session_state.get("transcription_stream")
+            job = wait_for_job(
+                task,
+                lang,
+                on_running=(lambda: show_transcription_stream(stream, lang))
+                if stream is not None
+                else None,
+            )
+            if job is not None:
+                st.session_state.pop("job")
+                if job.state == job_scheduler.FAILED:
+                    st.error(f"{get_text('error_cmd_execution', lang)}: {job.error}")
+                elif job.state == job_scheduler.DONE:
+                    st.session_state.pop("transcription_stream", None)
+                    message, output_file_or_error = job.result
+                    if message == get_text("file_processed_success", lang):
+                        st.session_state["transcription_bundle"] = output_file_or_error
+                    else:
+                        st.error(f"{message}: {output_file_or_error}")
+                        cleanup(os.path.dirname(output_file_or_error))
+
+            bundle_path = st.session_state.get("transcription_bundle")
+            if bundle_path and os.path.exists(bundle_path):
+                show_transcript_downloads(bundle_path, lang)
     else:
         # Limpieza condicional de archivos temporales
         if st.session_state["cleanup_flag"]:
-            temp_dir = f"/tmp/{st.session_state['session_id']}"
-            cleanup(temp_dir)
+            job = st.session_state.pop("job", None)
+            if job is not None:
+                job.cancel()
+            session_storage.default_storage.remove(st.session_state["session_id"])
             st.session_state["cleanup_flag"] = False
 
 
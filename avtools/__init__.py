@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+"""
+Utilidades compartidas por TranscriptorAV.py (Streamlit) y textodesdeaudiovideo.py (CLI).
+
+Los módulos de este paquete no importan dependencias pesadas (whisper, torch, numpy)
+al cargarse; cada función las importa cuando realmente las necesita.
+"""
@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""
+Caché en disco del audio decodificado, en el formato que usa Whisper.
+
+Cada archivo se decodifica una sola vez con FFmpeg a 16 kHz mono float32 y se
+guarda como ``.npy``. Las lecturas posteriores lo abren con ``mmap``, así que
+transcribir el mismo archivo con ``tiny`` y luego con ``small``, o repartirlo
+entre varios procesos, no vuelve a decodificarlo ni lo copia en la memoria de
+cada proceso.
+
+Las entradas se indexan por el SHA-256 del contenido y se expulsan por tamaño
+total, de la menos usada recientemente a la más usada.
+
+Estructura del directorio:
+    <raíz>/<k[:2]>/<k>.audio.npy
+"""
+
+import os
+import struct
+import subprocess
+import tempfile
+import threading
+import uuid
+import weakref
+
+from avtools import metrics
+from avtools import result_cache
+
+SAMPLE_RATE = 16000
+
+DEFAULT_AUDIO_CACHE_DIR = os.environ.get(
+    "TRANSCRIPTORAV_AUDIO_CACHE_DIR", "/tmp/transcriptorav-audio"
+)
+DEFAULT_AUDIO_CACHE_MB = int(os.environ.get("TRANSCRIPTORAV_AUDIO_CACHE_MB", "4096"))
+
+# Tamaño fijo de la cabecera .npy: se escribe antes de conocer el número de muestras
+_NPY_HEADER_LEN = 128
+
+_BLOCK_SAMPLES = 1024 * 1024
+
+# (ruta, tamaño, mtime_ns) -> SHA-256, para no volver a leer un archivo ya identificado
+_digests = {}
+_digests_lock = threading.Lock()
+# Un cerrojo por entrada mientras alguien lo usa; desaparece al terminar la decodificación
+_decode_locks = weakref.WeakValueDictionary()
+
+
+def npy_header(shape, dtype_descr="<f4"):
+    """Cabecera .npy versión 1.0 de longitud fija ``_NPY_HEADER_LEN``."""
+    header = f"{{'descr': '{dtype_descr}', 'fortran_order': False, 'shape': {shape!r}, }}"
+    padding = _NPY_HEADER_LEN - 10 - len(header) - 1
+    return b"\x93NUMPY\x01\x00" + struct.pack("<H", _NPY_HEADER_LEN - 10) + (
+        header + " " * padding + "\n"
+    ).encode("latin1")
+
+
+def file_digest(path):
+    """SHA-256 de ``path``, memorizado mientras el archivo no cambie."""
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _digests_lock:
+        digest = _digests.get(memo_key)
+    if digest is None:
+        digest = result_cache.hash_file(path)
+        with _digests_lock:
+            _digests[memo_key] = digest
+    return digest
+
+
+def _decode_lock(key):
+    with _digests_lock:
+        return _decode_locks.setdefault(key, threading.Lock())
+
+
+class AudioCache:
+    """Caché de audio decodificado con límite de tamaño y expulsión LRU.
+
+    Args:
+        directory (str): Raíz de la caché.
+        max_mb (int): Tamaño máximo aproximado de la caché en MB.
+    """
+
+    def __init__(self, directory=DEFAULT_AUDIO_CACHE_DIR, max_mb=DEFAULT_AUDIO_CACHE_MB):
+        self.directory = directory
+        self.max_bytes = max_mb * 1024 * 1024
+
+    def _entry_path(self, digest, kind):
+        return os.path.join(self.directory, digest[:2], f"{digest}.{kind}.npy")
+
+    def _open(self, path):
+        import numpy as np
+
+        array = np.load(path, mmap_mode="r")
+        os.utime(path)
+        return array
+
+    def peek(self, digest):
+        """Audio en caché de ``digest`` (mapeado en memoria), o None sin decodificar nada."""
+        path = self._entry_path(digest, "audio")
+        try:
+            return self._open(path)
+        except (OSError, ValueError):
+            return None
+
+    def audio_path(self, path, digest=None):
+        """Ruta del ``.npy`` con el audio de ``path``, decodificándolo si hace falta."""
+        digest = digest or file_digest(path)
+        entry = self._entry_path(digest, "audio")
+        if os.path.exists(entry):
+            os.utime(entry)
+            return entry
+        # Dos tareas de la misma sesión no decodifican el mismo archivo a la vez
+        with _decode_lock(entry):
+            if not os.path.exists(entry):
+                with metrics.stage("decode"):
+                    self._decode(path, entry)
+                self.evict(keep=entry)
+        return entry
+
+    def load_audio(self, path, digest=None):
+        """Audio de ``path`` a 16 kHz mono float32, mapeado en memoria."""
+        audio = self._open(self.audio_path(path, digest))
+        metrics.set_media_seconds(len(audio) / SAMPLE_RATE)
+        return audio
+
+    def _decode(self, path, entry):
+        """Decodifica ``path`` a ``entry`` por bloques; la memoria usada no depende de la duración."""
+        import numpy as np
+
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        staging = f"{entry}.{uuid.uuid4().hex}.tmp"
+        cmd = [
+            "ffmpeg",
+            "-nostdin",
+            "-v",
+            "error",
+            "-i",
+            path,
+            "-vn",
+            "-f",
+            "s16le",
+            "-ac",
+            "1",
+            "-acodec",
+            "pcm_s16le",
+            "-ar",
+            str(SAMPLE_RATE),
+            "-",
+        ]
+        samples = 0
+        try:
+            # stderr va a un archivo: con una entrada dañada FFmpeg puede escribir más
+            # de lo que cabe en una tubería y bloquearse mientras se lee stdout
+            with open(staging, "wb") as out, tempfile.TemporaryFile() as errors, \
+                    subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=errors) as process:
+                out.write(npy_header((0,)))
+                pending = b""
+                while True:
+                    data = process.stdout.read(_BLOCK_SAMPLES * 2)
+                    if not data:
+                        break
+                    data = pending + data
+                    usable = len(data) // 2 * 2
+                    pending = data[usable:]
+                    block = np.frombuffer(data[:usable], np.int16).astype(np.float32) / 32768.0
+                    out.write(block.tobytes())
+                    samples += block.size
+                if process.wait() != 0:
+                    errors.seek(0)
+                    raise subprocess.CalledProcessError(
+                        process.returncode, cmd, stderr=errors.read()
+                    )
+                # Con el número de muestras ya conocido se reescribe la cabecera
+                out.seek(0)
+                out.write(npy_header((samples,)))
+            os.replace(staging, entry)
+        finally:
+            if os.path.exists(staging):
+                os.remove(staging)
+
+    def evict(self, keep=None):
+        """Expulsa los archivos menos usados recientemente hasta respetar el tamaño máximo.
+
+        Args:
+            keep (str): Archivo que no debe expulsarse (el que se acaba de escribir).
+        """
+        entries = []
+        total = 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                file_path = os.path.join(root, name)
+                if not name.endswith(".npy"):
+                    continue
+                try:
+                    stat = os.stat(file_path)
+                except OSError:
+                    continue
+                total += stat.st_size
+                if file_path != keep:
+                    entries.append((stat.st_mtime, stat.st_size, file_path))
+
+        entries.sort()
+        for _, size, file_path in entries:
+            if total <= self.max_bytes:
+                break
+            # Los lectores que ya tienen el archivo mapeado siguen leyéndolo sin problema
+            try:
+                os.remove(file_path)
+            except OSError:
+                continue
+            total -= size
+
+
+def duration(npy_path):
+    """Duración en segundos de un ``.npy`` de la caché, leyendo solo su cabecera."""
+    import numpy as np
+
+    return np.load(npy_path, mmap_mode="r").shape[0] / SAMPLE_RATE
+
+
+default_cache = AudioCache()
+
+
+def load_audio(path, digest=None):
+    return default_cache.load_audio(path, digest)
+
+
+def audio_path(path, digest=None):
+    return default_cache.audio_path(path, digest)
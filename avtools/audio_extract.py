@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+Extracción del audio de un video con FFmpeg.
+
+Antes de extraer se consulta el códec del flujo de audio. Si el formato pedido
+puede contenerlo tal cual (AAC en .m4a, Opus en .ogg/.opus, MP3 en .mp3...), el
+flujo se copia sin decodificar y la extracción dura lo que tarda leer el archivo.
+En otro caso FFmpeg transcodifica directamente, sin pasar muestras por Python.
+"""
+
+from avtools import ffmpeg_utils
+from avtools import media_probe
+
+OUTPUT_FORMATS = ("mp3", "wav", "ogg", "m4a", "opus")
+
+# Códecs que cada formato de salida admite sin recodificar
+COPY_CODECS = {
+    "mp3": {"mp3"},
+    "wav": {"pcm_s16le", "pcm_s24le", "pcm_s32le", "pcm_f32le", "pcm_u8"},
+    "ogg": {"vorbis", "opus", "flac"},
+    "m4a": {"aac", "alac"},
+    "opus": {"opus"},
+}
+
+# Parámetros de FFmpeg cuando hay que transcodificar
+TRANSCODE_ARGS = {
+    "mp3": ["-c:a", "libmp3lame", "-q:a", "2"],
+    "wav": ["-c:a", "pcm_s16le"],
+    "ogg": ["-c:a", "libvorbis", "-q:a", "5"],
+    "m4a": ["-c:a", "aac", "-b:a", "192k"],
+    "opus": ["-c:a", "libopus", "-b:a", "128k"],
+}
+
+COPY = "copy"
+TRANSCODE = "transcode"
+
+
+def plan_extraction(audio_codec, output_format):
+    """Decide si el audio puede copiarse (``COPY``) o debe transcodificarse (``TRANSCODE``)."""
+    if audio_codec in COPY_CODECS[output_format]:
+        return COPY
+    return TRANSCODE
+
+
+def extract_audio(input_path, output_path, output_format, progress=None):
+    """Extrae el primer flujo de audio de ``input_path`` en ``output_path``.
+
+    Args:
+        progress (FfmpegProgress): Recibe el progreso de FFmpeg.
+
+    Returns:
+        str: El plan aplicado (``COPY`` o ``TRANSCODE``).
+
+    Raises:
+        ValueError: Si el archivo no tiene audio.
+        subprocess.CalledProcessError: Si FFmpeg falla.
+    """
+    info = media_probe.probe(input_path)
+    audio_codec = info.audio_codec
+    if progress is not None and progress.duration is None:
+        progress.duration = info.duration
+    if audio_codec is None:
+        raise ValueError(f"{input_path} no contiene ninguna pista de audio")
+
+    plan = plan_extraction(audio_codec, output_format)
+    codec_args = ["-c:a", "copy"] if plan == COPY else TRANSCODE_ARGS[output_format]
+    ffmpeg_utils.run_ffmpeg(
+        ["-i", input_path, "-vn", "-map", "0:a:0", *codec_args, output_path], progress
+    )
+    return plan
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+División de archivos de audio con el muxer ``segment`` de FFmpeg.
+
+El audio no se decodifica: los paquetes se copian tal cual a cada parte, así que
+la memoria usada es constante y el tiempo depende casi solo de la velocidad del
+disco. Las partes MP3 no pierden calidad porque no se vuelven a codificar. Solo
+se transcodifica si el códec no cabe en el contenedor de salida.
+
+La duración de cada parte puede indicarse directamente o calcularse a partir de
+un tamaño máximo en MB y la tasa de bits del archivo, obtenida con ffprobe.
+"""
+
+import os
+
+from avtools import audio_extract
+from avtools import ffmpeg_utils
+from avtools import media_probe
+
+# Margen para la sobrecarga del contenedor y la variación de una tasa de bits variable
+SIZE_SAFETY_FACTOR = 0.95
+
+
+def seconds_for_size(max_mb, bit_rate):
+    """Duración (segundos) de una parte que no supere ``max_mb`` MB a ``bit_rate`` bit/s."""
+    return max_mb * 1024 * 1024 * 8 * SIZE_SAFETY_FACTOR / bit_rate
+
+
+def estimated_bit_rate(info):
+    """Tasa de bits del archivo según ffprobe, o tamaño / duración si no la declara."""
+    if info.bit_rate:
+        return info.bit_rate
+    if info.audio_bit_rate:
+        return info.audio_bit_rate
+    if info.size and info.duration:
+        return info.size * 8 / info.duration
+    raise ValueError("No se pudo determinar la tasa de bits del archivo")
+
+
+def build_split_args(input_path, output_pattern, segment_seconds, codec_args):
+    return [
+        "-i",
+        input_path,
+        "-map",
+        "0:a:0",
+        *codec_args,
+        "-f",
+        "segment",
+        "-segment_time",
+        f"{segment_seconds:.3f}",
+        "-segment_start_number",
+        "1",
+        "-reset_timestamps",
+        "1",
+        "-segment_list",
+        "pipe:1",
+        "-segment_list_type",
+        "flat",
+        output_pattern,
+    ]
+
+
+def split_audio(input_path, output_dir=".", segment_seconds=None, max_mb=None):
+    """Divide ``input_path`` en partes ``<nombre>_part_<n><ext>`` dentro de ``output_dir``.
+
+    Args:
+        input_path (str): Archivo de audio.
+        output_dir (str): Directorio de las partes.
+        segment_seconds (float): Duración de cada parte.
+        max_mb (float): Tamaño máximo de cada parte en MB (alternativa a la duración).
+
+    Returns:
+        tuple: (rutas de las partes en orden, plan ``COPY`` o ``TRANSCODE``).
+
+    Raises:
+        ValueError: Si no se indica duración ni tamaño, o el archivo no tiene audio.
+        subprocess.CalledProcessError: Si FFmpeg falla.
+    """
+    info = media_probe.probe(input_path)
+    if not info.has_audio:
+        raise ValueError(f"{input_path} no contiene ninguna pista de audio")
+    if max_mb:
+        segment_seconds = seconds_for_size(max_mb, estimated_bit_rate(info))
+    if not segment_seconds or segment_seconds <= 0:
+        raise ValueError("Se requiere una duración o un tamaño máximo por parte")
+
+    base_name, extension = os.path.splitext(os.path.basename(input_path))
+    output_format = extension[1:].lower()
+    # Los formatos sin parámetros de transcodificación propios se copian siempre
+    if output_format in audio_extract.COPY_CODECS:
+        plan = audio_extract.plan_extraction(info.audio_codec, output_format)
+    else:
+        plan = audio_extract.COPY
+    if plan == audio_extract.COPY:
+        codec_args = ["-c:a", "copy"]
+    else:
+        codec_args = audio_extract.TRANSCODE_ARGS[output_format]
+
+    os.makedirs(output_dir, exist_ok=True)
+    # "%" es especial en el patrón del muxer segment
+    pattern_base = base_name.replace("%", "%%")
+    output_pattern = os.path.join(output_dir, f"{pattern_base}_part_%d{extension}")
+    completed = ffmpeg_utils.run_ffmpeg(
+        build_split_args(input_path, output_pattern, segment_seconds, codec_args)
+    )
+    parts = [
+        os.path.join(output_dir, os.path.basename(line))
+        for line in completed.stdout.decode("utf-8", errors="replace").splitlines()
+        if line.strip()
+    ]
+    return parts, plan
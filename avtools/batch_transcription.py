@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""
+Transcripción de muchos archivos cortos con inferencia por lotes.
+
+``model.transcribe`` procesa una ventana de 30 s cada vez, así que transcribir
+40 notas de voz supone 40 pasadas del codificador con lotes de tamaño 1. Aquí
+las ventanas de 30 s de todos los archivos se reparten en lotes y cada lote se
+decodifica con una sola llamada a ``whisper.decode``, que ejecuta el codificador
+y el decodificador sobre todas las ventanas a la vez.
+
+A diferencia de ``transcribe``, las ventanas se cortan cada 30 s exactos y no se
+condicionan con el texto de la ventana anterior; para notas de voz y clips
+cortos (una o pocas ventanas por archivo) el resultado es equivalente.
+"""
+
+from avtools import audio_cache
+
+SAMPLE_RATE = 16000
+WINDOW_SECONDS = 30
+DEFAULT_BATCH_SIZE = 16
+
+# Mismos umbrales que ``transcribe`` para descartar ventanas sin voz
+NO_SPEECH_THRESHOLD = 0.6
+LOGPROB_THRESHOLD = -1.0
+
+# Un resto final más corto que esto (0,1 s) no merece una ventana propia
+MIN_TAIL_SAMPLES = SAMPLE_RATE // 10
+
+
+def plan_windows(sample_counts, window_samples=WINDOW_SECONDS * SAMPLE_RATE):
+    """Lista de ventanas ``(archivo, inicio, fin)`` en muestras para todos los archivos."""
+    windows = []
+    for file_index, n_samples in enumerate(sample_counts):
+        for start in range(0, n_samples, window_samples):
+            end = min(start + window_samples, n_samples)
+            if start and end - start < MIN_TAIL_SAMPLES:
+                break
+            windows.append((file_index, start, end))
+    return windows
+
+
+def tokens_to_segments(tokens, timestamp_begin, window_seconds):
+    """Separa los tokens de una ventana en segmentos según sus marcas de tiempo.
+
+    Returns:
+        list: Tuplas (inicio, fin, tokens de texto) con tiempos relativos a la ventana.
+    """
+    segments = []
+    start = None
+    text_tokens = []
+    for token in tokens:
+        if token < timestamp_begin:
+            text_tokens.append(token)
+            continue
+        seconds = (token - timestamp_begin) * 0.02
+        if start is not None and text_tokens:
+            segments.append((start, seconds, text_tokens))
+            text_tokens = []
+            start = None
+        else:
+            start = seconds
+    if text_tokens:
+        segments.append((start or 0.0, window_seconds, text_tokens))
+    return segments
+
+
+def _decode_batch(model, pieces, language):
+    import torch
+    import whisper
+
+    mel = torch.stack(
+        [
+            whisper.log_mel_spectrogram(
+                whisper.pad_or_trim(torch.from_numpy(piece)), model.dims.n_mels
+            )
+            for piece in pieces
+        ]
+    ).to(model.device)
+    options = whisper.DecodingOptions(
+        language=language,
+        without_timestamps=False,
+        fp16=model.device.type == "cuda",
+    )
+    return whisper.decode(model, mel, options)
+
+
+def transcribe_files(
+    paths, model_name, language, batch_size=DEFAULT_BATCH_SIZE, digests=None
+):
+    """Transcribe varios archivos agrupando sus ventanas de 30 s en lotes.
+
+    Args:
+        paths (list): Rutas de los archivos.
+        model_name (str): Modelo de Whisper.
+        language (str): Código de idioma.
+        batch_size (int): Ventanas por llamada a ``whisper.decode``.
+        digests (list): SHA-256 de cada archivo, si ya se conocen.
+
+    Returns:
+        list: Un resultado tipo ``transcribe`` por archivo, en el mismo orden.
+    """
+    import numpy as np
+    import whisper
+
+    from avtools import whisper_models
+
+    digests = digests or [None] * len(paths)
+    audios = [audio_cache.load_audio(p, d) for p, d in zip(paths, digests)]
+    windows = plan_windows([len(a) for a in audios])
+    segments_per_file = [[] for _ in paths]
+
+    with whisper_models.use_model(model_name) as model:
+        tokenizer = whisper.tokenizer.get_tokenizer(
+            model.is_multilingual,
+            num_languages=getattr(model, "num_languages", 99),
+            language=language,
+            task="transcribe",
+        )
+        for first in range(0, len(windows), batch_size):
+            batch = windows[first : first + batch_size]
+            pieces = [
+                np.array(audios[file_index][start:end], dtype=np.float32)
+                for file_index, start, end in batch
+            ]
+            results = _decode_batch(model, pieces, language)
+            for (file_index, start, end), decoded in zip(batch, results):
+                if (
+                    decoded.no_speech_prob > NO_SPEECH_THRESHOLD
+                    and decoded.avg_logprob < LOGPROB_THRESHOLD
+                ):
+                    continue
+                offset = start / SAMPLE_RATE
+                window_seconds = (end - start) / SAMPLE_RATE
+                for seg_start, seg_end, text_tokens in tokens_to_segments(
+                    decoded.tokens, tokenizer.timestamp_begin, window_seconds
+                ):
+                    segments_per_file[file_index].append(
+                        {
+                            "start": offset + seg_start,
+                            "end": offset + min(seg_end, window_seconds),
+                            "text": tokenizer.decode(text_tokens),
+                            "tokens": text_tokens,
+                            "avg_logprob": decoded.avg_logprob,
+                            "compression_ratio": decoded.compression_ratio,
+                            "no_speech_prob": decoded.no_speech_prob,
+                        }
+                    )
+
+    results = []
+    for segments in segments_per_file:
+        for i, segment in enumerate(segments):
+            segment["id"] = i
+        results.append(
+            {
+                "text": "".join(s["text"] for s in segments),
+                "segments": segments,
+                "language": language,
+            }
+        )
+    return results
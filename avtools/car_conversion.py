@@ -0,0 +1,303 @@
+# -*- coding: utf-8 -*-
+"""
+Conversión de videos para reproductores de carro (H.264, máximo 1080p, 25 fps).
+
+Cada archivo se analiza una vez y se elige la acción más barata que deja un MP4
+compatible, con las mismas reglas que ``es_compatible_con_carro`` del script
+``legacy_code/convertir_todos_videos.py`` (H.264 hasta 1920x1080 entre 24 y 30
+fps), más audio AAC o MP3 en contenedor MP4:
+
+- ``COPIED``: ya cumple todo; se copia tal cual.
+- ``REMUXED``: video y audio válidos en otro contenedor; se copian los flujos a MP4.
+- ``AUDIO_TRANSCODED``: video válido con audio AC3, Opus...; se copia el video y
+  solo se recodifica el audio a AAC.
+- ``CONVERTED``: el video no cumple; recodificación completa con libx264.
+
+Las tres primeras van a la velocidad del disco.
+
+Compartido por la aplicación de Streamlit y el CLI. La conversión por lotes puede
+ejecutar varias conversiones a la vez; el presupuesto de hilos de FFmpeg se
+reparte entre ellas para no sobrecargar la máquina.
+
+Las salidas se escriben con un nombre temporal y se renombran al terminar, de
+modo que un archivo ``_car_compatible.mp4`` siempre está completo. Los lotes
+llevan un registro (``conversion_journal``) que permite reanudarlos.
+"""
+
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from avtools import conversion_journal
+from avtools import ffmpeg_utils
+from avtools import media_probe
+from avtools import metrics
+from avtools import segment_encode
+
+VIDEO_EXTENSIONS = (".mp4", ".mkv", ".avi", ".mov", ".webm")
+
+# Estados de cada archivo en una conversión por lotes; los del medio son los planes
+SKIPPED = "skipped"
+COPIED = "copied"
+REMUXED = "remuxed"
+AUDIO_TRANSCODED = "audio_transcoded"
+CONVERTED = "converted"
+FAILED = "failed"
+
+# Texto de cada estado en los resultados de la interfaz y del CLI
+STATUS_MESSAGES = {
+    SKIPPED: "Ya convertido anteriormente",
+    COPIED: "Ya compatible, copiado",
+    REMUXED: "Video y audio compatibles, pasados a MP4 sin recodificar",
+    AUDIO_TRANSCODED: "Video copiado, solo se recodificó el audio a AAC",
+    CONVERTED: "Convertido exitosamente (recodificación completa)",
+}
+
+# Reglas de compatibilidad (las de ``es_compatible_con_carro``)
+MAX_WIDTH = 1920
+MAX_HEIGHT = 1080
+MIN_FPS = 24
+MAX_FPS = 30
+CAR_AUDIO_CODECS = {"aac", "mp3"}
+CAR_CONTAINERS = {".mp4"}
+
+AUDIO_ARGS = ["-c:a", "aac", "-b:a", "128k"]
+
+
+# H.264 1080p a 25 fps; también se usan tal cual para cada tramo en la codificación por tramos
+VIDEO_ARGS = [
+    "-c:v",
+    "libx264",
+    "-profile:v",
+    "high",
+    "-level:v",
+    "4.0",
+    "-preset",
+    "medium",
+    "-crf",
+    "23",
+    "-vf",
+    "scale=1920:1080:force_original_aspect_ratio=decrease,pad=1920:1080:(ow-iw)/2:(oh-ih)/2",
+    "-r",
+    "25",
+]
+
+
+def build_car_args(input_path, output_path, threads=0):
+    """Argumentos de FFmpeg para convertir a H.264 1080p a 25 fps con audio AAC."""
+    return [
+        "-i",
+        input_path,
+        *VIDEO_ARGS,
+        *AUDIO_ARGS,
+        "-threads",
+        str(threads),
+        output_path,
+    ]
+
+
+def build_remux_args(input_path, output_path, transcode_audio=False):
+    """Argumentos de FFmpeg para pasar el video sin recodificar a MP4.
+
+    Solo se conservan el primer flujo de video y el primero de audio (si existe):
+    los subtítulos y adjuntos de MKV no caben en MP4.
+    """
+    audio_args = AUDIO_ARGS if transcode_audio else ["-c:a", "copy"]
+    return [
+        "-i",
+        input_path,
+        "-map",
+        "0:v:0",
+        "-map",
+        "0:a:0?",
+        "-c:v",
+        "copy",
+        *audio_args,
+        "-movflags",
+        "+faststart",
+        output_path,
+    ]
+
+
+def is_car_compatible_video(info):
+    """Indica si el flujo de video ya es H.264 hasta 1920x1080 y entre 24 y 30 fps."""
+    return (
+        info.video_codec == "h264"
+        and info.width is not None
+        and info.height is not None
+        and info.width <= MAX_WIDTH
+        and info.height <= MAX_HEIGHT
+        and info.fps is not None
+        and MIN_FPS <= info.fps <= MAX_FPS
+    )
+
+
+def plan_car_conversion(info, extension):
+    """Acción más barata que deja un archivo compatible.
+
+    Args:
+        info (MediaInfo): Metadatos del archivo de entrada.
+        extension (str): Extensión del archivo de entrada (decide el contenedor).
+
+    Returns:
+        str: ``COPIED``, ``REMUXED``, ``AUDIO_TRANSCODED`` o ``CONVERTED``.
+    """
+    if not is_car_compatible_video(info):
+        return CONVERTED
+    if info.has_audio and info.audio_codec not in CAR_AUDIO_CODECS:
+        return AUDIO_TRANSCODED
+    if extension.lower() not in CAR_CONTAINERS:
+        return REMUXED
+    return COPIED
+
+
+def convert_for_car(input_path, output_path, threads=0, progress=None, segments=1):
+    """Deja en ``output_path`` (MP4) una versión compatible de ``input_path`` con la acción más barata.
+
+    La salida se escribe primero en un archivo temporal y se renombra de forma
+    atómica solo si la conversión termina bien.
+
+    Args:
+        progress (FfmpegProgress): Recibe el progreso de FFmpeg.
+        segments (int): Si es mayor que 1 y hay que recodificar el video, se
+            codifica por tramos simultáneos (ver ``segment_encode``).
+
+    Returns:
+        str: El plan aplicado: ``COPIED``, ``REMUXED``, ``AUDIO_TRANSCODED`` o ``CONVERTED``.
+
+    Raises:
+        subprocess.CalledProcessError: Si FFmpeg o ffprobe fallan.
+    """
+    partial = conversion_journal.partial_path(output_path)
+    try:
+        info = media_probe.probe(input_path)
+        status = plan_car_conversion(info, os.path.splitext(input_path)[1])
+        if progress is not None and progress.duration is None:
+            progress.duration = info.duration
+        if status == COPIED:
+            shutil.copy2(input_path, partial)
+        elif status == CONVERTED:
+            segments = segment_encode.segment_count(info.duration, segments)
+            if segments > 1:
+                segment_encode.encode_in_segments(
+                    input_path,
+                    partial,
+                    VIDEO_ARGS,
+                    AUDIO_ARGS,
+                    segments,
+                    info.duration,
+                    has_audio=info.has_audio,
+                    threads=threads,
+                    progress=progress,
+                )
+            else:
+                ffmpeg_utils.run_ffmpeg(build_car_args(input_path, partial, threads), progress)
+        else:
+            ffmpeg_utils.run_ffmpeg(
+                build_remux_args(
+                    input_path, partial, transcode_audio=status == AUDIO_TRANSCODED
+                ),
+                progress,
+            )
+        os.replace(partial, output_path)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+    return status
+
+
+def threads_per_job(jobs, total_threads=None):
+    """Reparte los hilos de la máquina entre ``jobs`` conversiones simultáneas."""
+    total_threads = total_threads or os.cpu_count() or 1
+    return max(1, total_threads // max(1, jobs))
+
+
+def list_videos(input_dir):
+    return sorted(
+        f
+        for f in os.listdir(input_dir)
+        if f.endswith(VIDEO_EXTENSIONS) and not conversion_journal.is_partial(f)
+    )
+
+
+def car_output_path(output_dir, video_file):
+    file_name_without_extension = os.path.splitext(video_file)[0]
+    return os.path.join(output_dir, f"{file_name_without_extension}_car_compatible.mp4")
+
+
+def _convert_with_journal(journal, input_path, output_path, threads, batch_progress=None):
+    journal.mark_running(input_path, output_path)
+    progress = None
+    if batch_progress is not None:
+        progress = batch_progress.start(os.path.basename(input_path))
+    try:
+        status = convert_for_car(input_path, output_path, threads, progress)
+    except Exception as e:
+        journal.mark_failed(input_path, ffmpeg_utils.ffmpeg_error_message(e))
+        raise
+    finally:
+        if batch_progress is not None:
+            batch_progress.finish(os.path.basename(input_path))
+    journal.mark_done(input_path, output_path)
+    return status
+
+
+def iter_batch_convert(input_dir, output_dir, jobs=1, resume=False, progress=None):
+    """Convierte los videos de ``input_dir`` con hasta ``jobs`` conversiones simultáneas.
+
+    Genera una tupla ``(archivo, estado, error)`` por cada video a medida que
+    termina, donde ``estado`` es ``SKIPPED``, ``FAILED`` o el plan aplicado
+    (``COPIED``, ``REMUXED``, ``AUDIO_TRANSCODED`` o ``CONVERTED``).
+
+    Args:
+        input_dir (str): Directorio con los videos originales.
+        output_dir (str): Directorio de salida (también guarda el registro del lote).
+        jobs (int): Número máximo de conversiones simultáneas.
+        resume (bool): Si es True, el registro decide qué falta: se repiten los
+            videos que fallaron, los que no terminaron, los que cambiaron y los
+            que perdieron su salida. Si es False, basta con que exista la salida.
+        progress (BatchProgress): Recibe el progreso de las conversiones pendientes.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    journal = conversion_journal.ConversionJournal.for_output_dir(output_dir)
+    pending = []
+    for video_file in list_videos(input_dir):
+        input_path = os.path.join(input_dir, video_file)
+        output_path = car_output_path(output_dir, video_file)
+        if resume:
+            already_done = journal.is_done(input_path, output_path)
+        else:
+            already_done = os.path.exists(output_path)
+        if already_done:
+            yield video_file, SKIPPED, None
+        else:
+            pending.append((video_file, input_path, output_path))
+
+    if not pending:
+        return
+
+    if progress is not None:
+        progress.total = len(pending)
+    jobs = max(1, min(jobs, len(pending)))
+    threads = threads_per_job(jobs)
+    # Cada conversión es un proceso de FFmpeg; los hilos de Python solo esperan
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        # Las conversiones cuentan en las métricas de la tarea que lanzó el lote
+        futures = {
+            metrics.run_in_context(
+                executor,
+                _convert_with_journal,
+                journal,
+                input_path,
+                output_path,
+                threads,
+                progress,
+            ): video_file
+            for video_file, input_path, output_path in pending
+        }
+        for future in as_completed(futures):
+            video_file = futures[future]
+            try:
+                yield video_file, future.result(), None
+            except Exception as e:
+                yield video_file, FAILED, ffmpeg_utils.ffmpeg_error_message(e)
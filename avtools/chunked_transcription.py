@@ -0,0 +1,387 @@
+# -*- coding: utf-8 -*-
+"""
+Transcripción paralela de archivos largos por fragmentos.
+
+El audio se corta en fragmentos de aproximadamente N minutos, buscando para cada
+corte el silencio más cercano (filtro ``silencedetect`` de FFmpeg). Cada fragmento
+se transcribe en un proceso independiente con un pequeño solapamiento a ambos
+lados; al unir los resultados, cada fragmento solo aporta las palabras que empiezan
+dentro de su propio tramo, de modo que las palabras del solapamiento no se repiten.
+"""
+
+import contextlib
+import os
+import re
+import subprocess
+import threading
+
+from avtools import audio_cache
+
+SAMPLE_RATE = 16000
+
+# Segundos de audio extra que se decodifican a cada lado del fragmento
+CHUNK_PADDING = 1.0
+
+# Margen (segundos) alrededor de cada corte ideal donde se busca un silencio
+SILENCE_SEARCH_WINDOW = 60.0
+
+_SILENCE_START_RE = re.compile(r"silence_start:\s*(-?[\d.]+)")
+_SILENCE_END_RE = re.compile(r"silence_end:\s*(-?[\d.]+)")
+
+_pool = None
+_pool_workers = 0
+_pool_users = 0
+_pool_lock = threading.Lock()
+
+
+def _available_ram_mb():
+    """RAM disponible en MB, o None si el sistema no la expone (p. ej. Windows)."""
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") // (1024 * 1024)
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def default_workers(model_name):
+    """Procesos que caben en la RAM disponible: cada uno carga su propia copia del modelo.
+
+    Nunca más que núcleos ni menos de uno.
+    """
+    from avtools import whisper_models
+
+    cpus = os.cpu_count() or 1
+    model_mb = whisper_models.APPROX_MODEL_MB.get(model_name)
+    available_mb = _available_ram_mb()
+    if not model_mb or available_mb is None:
+        return cpus
+    return max(1, min(cpus, available_mb // model_mb))
+
+
+def detect_silences(path, noise_db=-35, min_silence=0.5):
+    """Detecta los tramos de silencio de un archivo sin decodificarlo en Python.
+
+    Args:
+        path (str): Ruta del archivo de audio o video.
+        noise_db (int): Nivel (dBFS) por debajo del cual se considera silencio.
+        min_silence (float): Duración mínima de un silencio en segundos.
+
+    Returns:
+        list: Tuplas (inicio, fin) en segundos.
+    """
+    cmd = [
+        "ffmpeg",
+        "-hide_banner",
+        "-nostats",
+        "-i",
+        path,
+        "-vn",
+        "-af",
+        f"silencedetect=noise={noise_db}dB:d={min_silence}",
+        "-f",
+        "null",
+        "-",
+    ]
+    completed = subprocess.run(cmd, capture_output=True, check=True)
+    silences = []
+    start = None
+    for line in completed.stderr.decode("utf-8", errors="replace").splitlines():
+        match = _SILENCE_START_RE.search(line)
+        if match:
+            start = max(0.0, float(match.group(1)))
+            continue
+        match = _SILENCE_END_RE.search(line)
+        if match and start is not None:
+            silences.append((start, float(match.group(1))))
+            start = None
+    if start is not None:
+        silences.append((start, float("inf")))
+    return silences
+
+
+def plan_chunks(duration, silences, chunk_seconds, search_window=SILENCE_SEARCH_WINDOW):
+    """Calcula los límites de los fragmentos, cortando en silencios cuando es posible.
+
+    Returns:
+        list: Límites ordenados [0, c1, ..., duration]; el fragmento i va de
+        límites[i] a límites[i + 1].
+    """
+    midpoints = [(start + min(end, duration)) / 2 for start, end in silences]
+    boundaries = [0.0]
+    while duration - boundaries[-1] > chunk_seconds * 1.5:
+        target = boundaries[-1] + chunk_seconds
+        candidates = [
+            m
+            for m in midpoints
+            if abs(m - target) <= search_window and m > boundaries[-1] + chunk_seconds / 2
+        ]
+        cut = min(candidates, key=lambda m: abs(m - target)) if candidates else target
+        boundaries.append(cut)
+    boundaries.append(duration)
+    return boundaries
+
+
+def load_audio_range(path, start, duration):
+    """Decodifica un tramo del archivo a 16 kHz mono float32, como ``whisper.load_audio``.
+
+    Si ``path`` es un ``.npy`` de ``audio_cache``, el tramo se lee del archivo
+    mapeado en memoria sin decodificar nada.
+    """
+    import numpy as np
+
+    if path.endswith(".npy"):
+        audio = np.load(path, mmap_mode="r")
+        first = int(max(0.0, start) * SAMPLE_RATE)
+        return np.array(audio[first : first + int(duration * SAMPLE_RATE)])
+
+    cmd = [
+        "ffmpeg",
+        "-nostdin",
+        "-v",
+        "error",
+        "-ss",
+        f"{max(0.0, start):.3f}",
+        "-t",
+        f"{duration:.3f}",
+        "-i",
+        path,
+        "-f",
+        "s16le",
+        "-ac",
+        "1",
+        "-acodec",
+        "pcm_s16le",
+        "-ar",
+        str(SAMPLE_RATE),
+        "-",
+    ]
+    out = subprocess.run(cmd, capture_output=True, check=True).stdout
+    return np.frombuffer(out, np.int16).flatten().astype(np.float32) / 32768.0
+
+
+def _init_worker(torch_threads):
+    import torch
+
+    torch.set_num_threads(torch_threads)
+
+
+def _owned_segments(segments, own_start, own_end):
+    """Conserva solo las palabras (o segmentos) que empiezan dentro de [own_start, own_end)."""
+    kept = []
+    for segment in segments:
+        words = segment.get("words")
+        if not words:
+            middle = (segment["start"] + segment["end"]) / 2
+            if own_start <= middle < own_end:
+                kept.append(segment)
+            continue
+        words = [w for w in words if own_start <= w["start"] < own_end]
+        if not words:
+            continue
+        segment = dict(segment)
+        segment["words"] = words
+        segment["start"] = words[0]["start"]
+        segment["end"] = words[-1]["end"]
+        segment["text"] = "".join(w["word"] for w in words)
+        kept.append(segment)
+    return kept
+
+
+def _shift_segment(segment, offset):
+    segment = dict(segment)
+    segment["start"] += offset
+    segment["end"] += offset
+    if segment.get("words"):
+        segment["words"] = [
+            dict(w, start=w["start"] + offset, end=w["end"] + offset)
+            for w in segment["words"]
+        ]
+    return segment
+
+
+def transcribe_range(
+    path,
+    model_name,
+    language,
+    own_start,
+    own_end,
+    padding=CHUNK_PADDING,
+    vad_backend=None,
+):
+    """Transcribe el tramo [own_start, own_end) de ``path`` y devuelve sus segmentos.
+
+    Los tiempos devueltos son absolutos (referidos al archivo completo). Con
+    ``vad_backend``, solo se transcriben los tramos con voz del fragmento.
+    """
+    from avtools import vad
+    from avtools import whisper_models
+
+    start = max(0.0, own_start - padding)
+    audio = load_audio_range(path, start, own_end - start + padding)
+    with whisper_models.use_model(model_name) as model:
+        if vad_backend:
+            result = vad.transcribe_speech(
+                model, audio, vad_backend, language=language, word_timestamps=True
+            )
+        else:
+            result = model.transcribe(audio, language=language, word_timestamps=True)
+    segments = [_shift_segment(s, start) for s in result["segments"]]
+    return _owned_segments(segments, own_start, own_end)
+
+
+def _normalize_word(word):
+    return re.sub(r"[^\w]", "", word["word"].lower())
+
+
+def _drop_repeated_edge_words(previous, following, max_words=3, tolerance=1.0):
+    """Elimina del inicio de ``following`` las palabras que repiten el final de ``previous``."""
+    prev_words = previous.get("words") or []
+    next_words = following.get("words") or []
+    for k in range(min(max_words, len(prev_words), len(next_words)), 0, -1):
+        tail = [_normalize_word(w) for w in prev_words[-k:]]
+        head = [_normalize_word(w) for w in next_words[:k]]
+        if tail == head and next_words[0]["start"] - prev_words[-k]["start"] <= tolerance:
+            remaining = next_words[k:]
+            following["words"] = remaining
+            following["text"] = "".join(w["word"] for w in remaining)
+            if remaining:
+                following["start"] = remaining[0]["start"]
+            return k
+    return 0
+
+
+def merge_chunk_segments(chunks):
+    """Une los segmentos de fragmentos consecutivos en un resultado tipo ``transcribe``."""
+    merged = []
+    for segments in chunks:
+        segments = [dict(s) for s in segments]
+        if merged and segments:
+            _drop_repeated_edge_words(merged[-1], segments[0])
+        merged.extend(s for s in segments if s["text"].strip())
+    for i, segment in enumerate(merged):
+        segment["id"] = i
+    return {"text": "".join(s["text"] for s in merged), "segments": merged}
+
+
+@contextlib.contextmanager
+def _use_pool(workers):
+    """Pool de procesos compartido con ``workers`` procesos, mientras dura el bloque.
+
+    Cada proceso hijo carga torch y el modelo, así que el pool se conserva entre
+    llamadas. Solo se recrea cuando se pide otro tamaño y nadie lo está usando;
+    si otra tarea sigue enviándole fragmentos, se reutiliza con su tamaño actual
+    (cada llamada limita sus fragmentos en curso con ``_map_bounded``).
+    """
+    # multiprocessing solo se importa si se llega a transcribir por fragmentos
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    global _pool, _pool_workers, _pool_users
+    with _pool_lock:
+        if _pool is not None and _pool_workers != workers and not _pool_users:
+            _pool.shutdown(wait=True)
+            _pool = None
+        if _pool is None:
+            torch_threads = max(1, (os.cpu_count() or 1) // workers)
+            # "spawn" evita heredar hilos de Streamlit/torch en los procesos hijos
+            _pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(torch_threads,),
+            )
+            _pool_workers = workers
+        _pool_users += 1
+        pool = _pool
+        pool_workers = _pool_workers
+    try:
+        yield pool, pool_workers
+    finally:
+        with _pool_lock:
+            _pool_users -= 1
+
+
+def _map_bounded(pool, fn, calls, limit):
+    """Ejecuta ``fn(*args, **kwargs)`` para cada llamada con ``limit`` como máximo en curso.
+
+    Returns:
+        list: Los resultados en el orden de ``calls``.
+    """
+    from concurrent.futures import FIRST_COMPLETED
+    from concurrent.futures import wait
+
+    results = [None] * len(calls)
+    pending = {}
+    queued = iter(enumerate(calls))
+    for index, (args, kwargs) in queued:
+        pending[pool.submit(fn, *args, **kwargs)] = index
+        if len(pending) >= limit:
+            break
+    while pending:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            results[pending.pop(future)] = future.result()
+            for index, (args, kwargs) in queued:
+                pending[pool.submit(fn, *args, **kwargs)] = index
+                break
+    return results
+
+
+def transcribe_in_chunks(
+    path,
+    model_name,
+    language,
+    chunk_minutes=10,
+    workers=None,
+    digest=None,
+    vad_backend=None,
+):
+    """Transcribe un archivo largo repartiendo sus fragmentos entre varios procesos.
+
+    Cada proceso mantiene su propia copia del modelo, así que la memoria necesaria
+    crece con el número de procesos.
+
+    Args:
+        path (str): Ruta del archivo de audio o video.
+        model_name (str): Modelo de Whisper.
+        language (str): Código de idioma.
+        chunk_minutes (float): Duración aproximada de cada fragmento.
+        workers (int): Procesos y fragmentos en curso a la vez (por defecto,
+            ``default_workers``: los que caben en la RAM disponible).
+        digest (str): SHA-256 del archivo, si ya se conoce (evita volver a leerlo).
+        vad_backend (str): Detector de voz de ``vad`` (None = transcribir todo).
+
+    Returns:
+        dict: Resultado con las claves "text", "segments" y "language".
+    """
+    # El audio se decodifica una vez; cada proceso lee su tramo del .npy en caché
+    cached_audio = audio_cache.audio_path(path, digest)
+    duration = audio_cache.duration(cached_audio)
+    chunk_seconds = chunk_minutes * 60
+    boundaries = plan_chunks(duration, detect_silences(path), chunk_seconds)
+    ranges = list(zip(boundaries[:-1], boundaries[1:]))
+
+    if len(ranges) == 1:
+        from avtools import whisper_models
+
+        from avtools import vad
+
+        audio = audio_cache.load_audio(path, digest)
+        with whisper_models.use_model(model_name) as model:
+            if vad_backend:
+                return vad.transcribe_speech(model, audio, vad_backend, language=language)
+            return model.transcribe(audio, language=language)
+
+    workers = workers or default_workers(model_name)
+    with _use_pool(workers) as (pool, pool_workers):
+        chunks = _map_bounded(
+            pool,
+            transcribe_range,
+            [
+                ((cached_audio, model_name, language, start, end), {"vad_backend": vad_backend})
+                for start, end in ranges
+            ],
+            min(workers, pool_workers, len(ranges)),
+        )
+    result = merge_chunk_segments(chunks)
+    result["language"] = language
+    return result
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+Registro persistente de las conversiones por lotes.
+
+Cada video de origen tiene una fila con su tamaño, fecha de modificación y hash,
+el archivo de salida con su tamaño y hash, y el estado de la conversión
+(``running``, ``done`` o ``failed``). La fila se marca ``running`` antes de
+empezar y ``done`` solo después de que la salida se haya renombrado a su nombre
+final, así que tras una caída el registro indica exactamente qué videos hay que
+repetir. Con ``--resume`` se vuelve a convertir solo lo que falló, lo que no
+llegó a terminar y los originales que cambiaron desde entonces, sin consultar
+ffprobe para los demás.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+from avtools import result_cache
+
+JOURNAL_NAME = ".car_conversion_journal.sqlite"
+
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+def partial_path(output_path):
+    """Nombre temporal de una salida en construcción (conserva la extensión para FFmpeg)."""
+    base, extension = os.path.splitext(output_path)
+    return f"{base}.part{extension}"
+
+
+def is_partial(file_name):
+    return os.path.splitext(os.path.splitext(file_name)[0])[1] == ".part"
+
+
+class ConversionJournal:
+    """Registro SQLite de conversiones, compartido por los hilos de un lote.
+
+    Args:
+        path (str): Archivo SQLite del registro (None = solo memoria del proceso).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    @classmethod
+    def for_output_dir(cls, output_dir):
+        """Registro guardado junto a las salidas, para que viaje con ellas."""
+        return cls(os.path.join(output_dir, JOURNAL_NAME))
+
+    def _connection(self):
+        if self._conn is None:
+            db_path = self.path or ":memory:"
+            self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS conversions ("
+                "source TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, "
+                "source_hash TEXT, output TEXT, output_size INTEGER, "
+                "output_hash TEXT, status TEXT, error TEXT, updated_at REAL)"
+            )
+        return self._conn
+
+    def get(self, source):
+        """Devuelve la fila de ``source`` como diccionario, o None si no hay registro."""
+        with self._lock:
+            cursor = self._connection().execute(
+                "SELECT * FROM conversions WHERE source = ?", (os.path.abspath(source),)
+            )
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            return dict(zip([c[0] for c in cursor.description], row))
+
+    def _write(self, source, **fields):
+        fields["updated_at"] = time.time()
+        columns = ", ".join(fields)
+        placeholders = ", ".join("?" for _ in fields)
+        updates = ", ".join(f"{c} = excluded.{c}" for c in fields)
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                f"INSERT INTO conversions (source, {columns}) VALUES (?, {placeholders}) "
+                f"ON CONFLICT(source) DO UPDATE SET {updates}",
+                (os.path.abspath(source), *fields.values()),
+            )
+            conn.commit()
+
+    def mark_running(self, source, output):
+        stat = os.stat(source)
+        self._write(
+            source,
+            size=stat.st_size,
+            mtime_ns=stat.st_mtime_ns,
+            source_hash=None,
+            output=os.path.abspath(output),
+            output_size=None,
+            output_hash=None,
+            status=RUNNING,
+            error=None,
+        )
+
+    def mark_done(self, source, output, source_hash=None):
+        """Marca la conversión como terminada y guarda los hashes de origen y salida."""
+        stat = os.stat(source)
+        self._write(
+            source,
+            size=stat.st_size,
+            mtime_ns=stat.st_mtime_ns,
+            source_hash=source_hash or result_cache.hash_file(source),
+            output=os.path.abspath(output),
+            output_size=os.path.getsize(output),
+            output_hash=result_cache.hash_file(output),
+            status=DONE,
+            error=None,
+        )
+
+    def mark_failed(self, source, error):
+        self._write(source, status=FAILED, error=str(error))
+
+    def is_done(self, source, output):
+        """Indica si ``source`` ya se convirtió y ni el origen ni la salida cambiaron.
+
+        Solo usa ``stat``; el hash del origen se calcula únicamente si cambió su
+        fecha de modificación pero no su tamaño (por ejemplo, tras copiarlo).
+        """
+        entry = self.get(source)
+        if entry is None or entry["status"] != DONE:
+            return False
+        if entry["output"] != os.path.abspath(output):
+            return False
+        try:
+            if os.path.getsize(output) != entry["output_size"]:
+                return False
+            stat = os.stat(source)
+        except OSError:
+            return False
+        if stat.st_size != entry["size"]:
+            return False
+        if stat.st_mtime_ns != entry["mtime_ns"]:
+            if result_cache.hash_file(source) != entry["source_hash"]:
+                return False
+            self._write(source, mtime_ns=stat.st_mtime_ns)
+        return True
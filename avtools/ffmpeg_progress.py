@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+"""
+Progreso de FFmpeg leído de ``-progress pipe:1``.
+
+Con ``-progress``, FFmpeg escribe cada ~0,5 s un bloque de líneas ``clave=valor``
+(``frame``, ``fps``, ``out_time_us``, ``speed``...) terminado en
+``progress=continue`` o ``progress=end``. ``ffmpeg_utils.run_ffmpeg`` lee esa
+salida en un hilo aparte y la entrega a un ``FfmpegProgress``, cuyo estado
+consultan la interfaz (barra, ETA, fps, velocidad) o la línea de comandos.
+"""
+
+import sys
+import threading
+import time
+
+
+def format_clock(seconds):
+    """Segundos como ``H:MM:SS`` (o ``--:--`` si se desconocen)."""
+    if seconds is None:
+        return "--:--"
+    seconds = int(round(seconds))
+    return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def _parse_float(value):
+    try:
+        return float(value.rstrip("x"))
+    except (AttributeError, ValueError):
+        return None
+
+
+def _parse_out_time(block):
+    # out_time_ms también está en microsegundos (error histórico de FFmpeg)
+    for key in ("out_time_us", "out_time_ms"):
+        value = _parse_float(block.get(key))
+        if value is not None and value >= 0:
+            return value / 1_000_000
+    out_time = block.get("out_time")
+    if out_time and ":" in out_time:
+        try:
+            hours, minutes, seconds = out_time.split(":")
+            return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+        except ValueError:
+            return None
+    return None
+
+
+class FfmpegProgress:
+    """Estado del progreso de una ejecución de FFmpeg.
+
+    Args:
+        duration (float): Duración del medio de entrada en segundos, si se conoce;
+            sin ella no hay porcentaje ni ETA.
+        on_update (callable): Se llama con este objeto tras cada bloque de progreso.
+    """
+
+    def __init__(self, duration=None, on_update=None):
+        self.duration = duration
+        self.on_update = on_update
+        self.out_seconds = 0.0
+        self.frame = 0
+        self.fps = None
+        self.speed = None
+        self.total_size = 0
+        self.done = False
+        self.started_at = None
+        self.finished_at = None
+        self._block = {}
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            self.started_at = time.perf_counter()
+            self.finished_at = None
+            self.done = False
+            self._block = {}
+
+    def feed(self, line):
+        """Procesa una línea de ``-progress``; aplica el bloque al llegar ``progress=``."""
+        key, sep, value = line.strip().partition("=")
+        if not sep:
+            return
+        if key != "progress":
+            self._block[key] = value.strip()
+            return
+
+        block, self._block = self._block, {}
+        with self._lock:
+            out_seconds = _parse_out_time(block)
+            if out_seconds is not None:
+                self.out_seconds = out_seconds
+            self.frame = int(_parse_float(block.get("frame")) or self.frame)
+            self.fps = _parse_float(block.get("fps")) or self.fps
+            self.speed = _parse_float(block.get("speed")) or self.speed
+            self.total_size = int(_parse_float(block.get("total_size")) or self.total_size)
+            if value.strip() == "end":
+                self.done = True
+                self.finished_at = time.perf_counter()
+        if self.on_update is not None:
+            self.on_update(self)
+
+    @property
+    def elapsed(self):
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.perf_counter()) - self.started_at
+
+    @property
+    def fraction(self):
+        """Fracción completada (0-1), o None si no se conoce la duración."""
+        if self.done:
+            return 1.0
+        if not self.duration:
+            return None
+        return min(self.out_seconds / self.duration, 1.0)
+
+    @property
+    def eta(self):
+        """Segundos restantes estimados con la velocidad actual, o None."""
+        if self.done:
+            return 0.0
+        if not self.duration:
+            return None
+        remaining = max(self.duration - self.out_seconds, 0.0)
+        if self.speed:
+            return remaining / self.speed
+        fraction = self.fraction
+        if fraction:
+            return self.elapsed * (1 - fraction) / fraction
+        return None
+
+    @property
+    def average_speed(self):
+        """Segundos de medio codificados por segundo real en toda la ejecución."""
+        elapsed = self.elapsed
+        return self.out_seconds / elapsed if elapsed else None
+
+    @property
+    def average_fps(self):
+        elapsed = self.elapsed
+        return self.frame / elapsed if elapsed else None
+
+    def format_line(self):
+        """Línea compacta: ``42% 0:01:10/0:02:47 48 fps 1.9x ETA 0:00:51``."""
+        parts = []
+        if self.fraction is not None:
+            parts.append(f"{self.fraction:4.0%}")
+        parts.append(f"{format_clock(self.out_seconds)}/{format_clock(self.duration)}")
+        if self.fps:
+            parts.append(f"{self.fps:.0f} fps")
+        if self.speed:
+            parts.append(f"{self.speed:.2f}x")
+        parts.append(f"ETA {format_clock(self.eta)}")
+        return " ".join(parts)
+
+
+class BatchProgress:
+    """Progreso de un lote: archivos terminados y conversiones en curso.
+
+    Args:
+        on_update (callable): Se llama con este objeto cada vez que cambia algo.
+    """
+
+    def __init__(self, on_update=None):
+        self.on_update = on_update
+        self.total = 0
+        self.finished = 0
+        self.running = {}
+        self._lock = threading.Lock()
+
+    def _notify(self, *_):
+        if self.on_update is not None:
+            self.on_update(self)
+
+    def start(self, name, duration=None):
+        """Registra la conversión de ``name`` y devuelve su ``FfmpegProgress``."""
+        progress = FfmpegProgress(duration, on_update=self._notify)
+        with self._lock:
+            self.running[name] = progress
+        self._notify()
+        return progress
+
+    def finish(self, name):
+        with self._lock:
+            self.running.pop(name, None)
+            self.finished += 1
+        self._notify()
+
+    @property
+    def fraction(self):
+        if not self.total:
+            return None
+        with self._lock:
+            partial = sum(p.fraction or 0.0 for p in self.running.values())
+        return min((self.finished + partial) / self.total, 1.0)
+
+    def format_line(self):
+        with self._lock:
+            running = list(self.running.values())
+        line = f"{self.finished}/{self.total} videos"
+        if self.fraction is not None:
+            line += f" ({self.fraction:.0%})"
+        speeds = [p.speed for p in running if p.speed]
+        if speeds:
+            line += f" | {len(running)} en curso, {sum(speeds):.2f}x en total"
+        return line
+
+
+def print_progress_line(progress, stream=None):
+    """``on_update`` para la línea de comandos: reescribe una sola línea en la terminal."""
+    stream = stream or sys.stderr
+    done = getattr(progress, "done", False)
+    stream.write("\r" + progress.format_line().ljust(60) + ("\n" if done else ""))
+    stream.flush()
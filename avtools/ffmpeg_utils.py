@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+Utilidades para invocar FFmpeg/FFprobe directamente, sin pasar los fotogramas por Python.
+"""
+
+import os
+import subprocess
+import threading
+
+from avtools import metrics
+
+# Códecs de audio que cada contenedor admite sin recodificar / Audio codecs each container accepts as-is
+AUDIO_COPY_COMPATIBLE = {
+    ".mp4": {"aac", "mp3", "alac", "ac3", "eac3", "opus"},
+    ".m4v": {"aac", "mp3", "alac", "ac3", "eac3"},
+    ".mov": {"aac", "mp3", "alac", "ac3", "pcm_s16le", "pcm_s24le"},
+    ".3gp": {"aac", "amr_nb", "amr_wb"},
+    ".3g2": {"aac", "amr_nb", "amr_wb"},
+    ".f4v": {"aac", "mp3"},
+    ".flv": {"aac", "mp3"},
+    ".avi": {"mp3", "ac3", "aac", "pcm_s16le"},
+    ".ts": {"aac", "mp3", "mp2", "ac3", "eac3"},
+    ".mpg": {"mp2", "mp3", "ac3"},
+    ".mpeg": {"mp2", "mp3", "ac3"},
+    ".mpe": {"mp2", "mp3", "ac3"},
+    ".m2v": {"mp2", "mp3", "ac3"},
+    ".vob": {"mp2", "ac3"},
+    ".wmv": {"wmav1", "wmav2", "mp3"},
+    ".asf": {"wmav1", "wmav2", "mp3"},
+}
+
+# Contenedores que no admiten H.264; la salida se escribe en MP4
+NON_H264_CONTAINERS = {".webm", ".ogv"}
+
+
+def can_copy_audio(audio_codec, extension):
+    """Indica si ``audio_codec`` puede copiarse tal cual a un contenedor ``extension``."""
+    extension = extension.lower()
+    if extension in (".mkv", ".mka"):
+        return audio_codec is not None
+    return audio_codec in AUDIO_COPY_COMPATIBLE.get(extension, set())
+
+
+def _read_progress(pipe, progress):
+    for line in iter(pipe.readline, b""):
+        progress.feed(line.decode("utf-8", errors="replace"))
+
+
+def run_process(cmd, progress=None):
+    """Ejecuta ``cmd`` capturando su salida y anota su CPU en las métricas de la tarea.
+
+    El proceso se espera con ``os.wait4``, que devuelve el uso de recursos de
+    ese hijo concreto (y no el de todos los hijos del servidor, como
+    ``RUSAGE_CHILDREN``). Donde no existe (Windows), se espera con ``wait``.
+
+    Args:
+        cmd (list): Comando y argumentos.
+        progress (FfmpegProgress): Si se indica, la salida estándar se lee línea a
+            línea en un hilo aparte y se entrega a ``progress.feed``.
+
+    Raises:
+        subprocess.CalledProcessError: Si el proceso termina con error.
+    """
+    with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE) as process:
+        # Cada tubería se lee en su propio hilo para que ninguna se llene y bloquee al hijo
+        output = {}
+        readers = [
+            threading.Thread(
+                target=lambda: output.__setitem__("stderr", process.stderr.read())
+            )
+        ]
+        if progress is not None:
+            progress.start()
+            readers.append(
+                threading.Thread(target=_read_progress, args=(process.stdout, progress))
+            )
+        else:
+            readers.append(
+                threading.Thread(
+                    target=lambda: output.__setitem__("stdout", process.stdout.read())
+                )
+            )
+        for reader in readers:
+            reader.start()
+        for reader in readers:
+            reader.join()
+        if hasattr(os, "wait4"):
+            _, status, usage = os.wait4(process.pid, 0)
+            process.returncode = os.waitstatus_to_exitcode(status)
+            metrics.record_subprocess(usage)
+        else:
+            process.wait()
+
+    stdout, stderr = output.get("stdout", b""), output.get("stderr", b"")
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, cmd, stdout, stderr)
+    if progress is not None:
+        metrics.record_encode(progress)
+    return subprocess.CompletedProcess(cmd, process.returncode, stdout, stderr)
+
+
+def run_ffmpeg(args, progress=None):
+    """Ejecuta ``ffmpeg`` con ``args`` sobrescribiendo la salida.
+
+    Args:
+        args (list): Argumentos de FFmpeg (sin el ejecutable).
+        progress (FfmpegProgress): Recibe el progreso de ``-progress pipe:1``.
+
+    Raises:
+        subprocess.CalledProcessError: Si FFmpeg termina con error; ``stderr``
+            contiene el mensaje de FFmpeg.
+    """
+    cmd = ["ffmpeg", "-hide_banner", "-nostdin", "-y", "-loglevel", "error"]
+    if progress is not None:
+        cmd += ["-progress", "pipe:1", "-nostats"]
+    return run_process(cmd + list(args), progress)
+
+
+def ffmpeg_error_message(error):
+    """Texto legible de un ``CalledProcessError`` lanzado por ``run_ffmpeg``."""
+    if getattr(error, "stderr", None):
+        return error.stderr.decode("utf-8", errors="replace").strip()
+    return str(error)
+
@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+"""
+Planificador global de trabajos compartido por todas las sesiones de Streamlit.
+
+Cada tarea pesada (Whisper, codificación con FFmpeg) se envía al planificador en
+lugar de ejecutarse en el hilo del script de la sesión. Cada clase de recurso
+tiene un número fijo de hilos de trabajo; los trabajos en espera se reparten por
+turnos entre sesiones (cada sesión mantiene su propia cola FIFO), de modo que un
+usuario que encola varios trabajos no bloquea a los demás. Cuando la cola de un
+recurso está llena, ``submit`` rechaza el trabajo con ``SchedulerFullError``.
+
+Un trabajo que lanza varios procesos a la vez (la conversión por lotes con
+``jobs`` conversiones simultáneas) se envía con ``weight`` igual a ese número y
+ocupa otros tantos hilos del recurso mientras se ejecuta.
+"""
+
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+# Clases de recurso y sus hilos de trabajo / Resource classes and their worker slots
+TRANSCRIPTION = "transcription"
+VIDEO = "video"
+
+DEFAULT_SLOTS = {
+    TRANSCRIPTION: int(os.environ.get("TRANSCRIPTORAV_TRANSCRIPTION_SLOTS", "1")),
+    VIDEO: int(os.environ.get("TRANSCRIPTORAV_VIDEO_SLOTS", "2")),
+}
+DEFAULT_MAX_QUEUED = int(os.environ.get("TRANSCRIPTORAV_MAX_QUEUED", "8"))
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class SchedulerFullError(Exception):
+    """El recurso solicitado no admite más trabajos en espera."""
+
+
+class Job:
+    """Trabajo enviado al planificador.
+
+    Atributos públicos: ``state``, ``result`` (valor devuelto por la función) y
+    ``error`` (texto de la excepción si falló).
+    """
+
+    _ids = itertools.count(1)
+
+    def __init__(self, scheduler, session_id, resource, fn, args, kwargs, weight=1):
+        self.id = next(self._ids)
+        self.session_id = session_id
+        self.resource = resource
+        self.weight = weight
+        self.state = QUEUED
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._scheduler = scheduler
+        self._fn = fn
+        self._args = args
+        self._kwargs = kwargs
+        self._done = threading.Event()
+
+    @property
+    def finished(self):
+        return self.state in (DONE, FAILED, CANCELLED)
+
+    def position(self):
+        """Posición en la cola (1 = el siguiente en ejecutarse), o 0 si ya no está en espera."""
+        return self._scheduler.position(self)
+
+    def cancel(self):
+        """Retira el trabajo de la cola. No interrumpe un trabajo en ejecución."""
+        return self._scheduler.cancel(self)
+
+    def wait(self, timeout=None):
+        """Espera a que el trabajo termine y devuelve ``result``."""
+        self._done.wait(timeout)
+        return self.result
+
+
+class JobScheduler:
+    """Reparte trabajos entre hilos de trabajo acotados por clase de recurso.
+
+    Args:
+        slots (dict): Hilos de trabajo por clase de recurso.
+        max_queued (int): Trabajos en espera admitidos por clase de recurso.
+    """
+
+    def __init__(self, slots=None, max_queued=DEFAULT_MAX_QUEUED):
+        self.slots = dict(slots or DEFAULT_SLOTS)
+        self.max_queued = max_queued
+        self._cond = threading.Condition()
+        # recurso -> sesión -> cola FIFO; el orden del OrderedDict es el turno
+        self._queues = {resource: OrderedDict() for resource in self.slots}
+        self._running = {resource: 0 for resource in self.slots}
+        # Hilos ocupados por recurso: la suma de los pesos de los trabajos en ejecución
+        self._busy = {resource: 0 for resource in self.slots}
+        self._started = False
+
+    def _start_workers(self):
+        if self._started:
+            return
+        self._started = True
+        for resource, count in self.slots.items():
+            for i in range(count):
+                threading.Thread(
+                    target=self._worker,
+                    args=(resource,),
+                    name=f"job-{resource}-{i}",
+                    daemon=True,
+                ).start()
+
+    def _queued_count(self, resource):
+        return sum(len(queue) for queue in self._queues[resource].values())
+
+    def submit(self, session_id, resource, fn, *args, weight=1, **kwargs):
+        """Encola ``fn(*args, **kwargs)`` para la sesión ``session_id``.
+
+        Args:
+            weight (int): Hilos del recurso que ocupa el trabajo (como mucho, todos).
+
+        Raises:
+            SchedulerFullError: Si la cola del recurso está llena.
+        """
+        with self._cond:
+            if self._queued_count(resource) >= self.max_queued:
+                raise SchedulerFullError(resource)
+            weight = max(1, min(weight, self.slots[resource]))
+            job = Job(self, session_id, resource, fn, args, kwargs, weight)
+            self._queues[resource].setdefault(session_id, deque()).append(job)
+            self._start_workers()
+            self._cond.notify_all()
+            return job
+
+    def _ordered_queue(self, resource):
+        """Orden en que se ejecutarán los trabajos en espera (turnos entre sesiones)."""
+        queues = [list(queue) for queue in self._queues[resource].values()]
+        ordered = []
+        for round_jobs in itertools.zip_longest(*queues):
+            ordered.extend(job for job in round_jobs if job is not None)
+        return ordered
+
+    def position(self, job):
+        with self._cond:
+            if job.state != QUEUED:
+                return 0
+            return self._ordered_queue(job.resource).index(job) + 1
+
+    def cancel(self, job):
+        with self._cond:
+            if job.state != QUEUED:
+                return False
+            sessions = self._queues[job.resource]
+            sessions[job.session_id].remove(job)
+            if not sessions[job.session_id]:
+                del sessions[job.session_id]
+            job.state = CANCELLED
+            job._done.set()
+            return True
+
+    def _can_start(self, resource):
+        """Hay trabajo en espera y el siguiente cabe en los hilos libres.
+
+        El siguiente turno espera a que quepa (los trabajos ligeros no lo
+        adelantan), así que uno pesado no se queda esperando indefinidamente.
+        """
+        sessions = self._queues[resource]
+        if not sessions:
+            return False
+        job = next(iter(sessions.values()))[0]
+        return self._busy[resource] + job.weight <= self.slots[resource]
+
+    def _next_job(self, resource):
+        sessions = self._queues[resource]
+        session_id, queue = next(iter(sessions.items()))
+        job = queue.popleft()
+        # La sesión pasa al final del turno; si no le quedan trabajos, sale de la rotación
+        del sessions[session_id]
+        if queue:
+            sessions[session_id] = queue
+        return job
+
+    def _worker(self, resource):
+        while True:
+            with self._cond:
+                while not self._can_start(resource):
+                    self._cond.wait()
+                job = self._next_job(resource)
+                job.state = RUNNING
+                job.started_at = time.time()
+                self._running[resource] += 1
+                self._busy[resource] += job.weight
+
+            try:
+                job.result = job._fn(*job._args, **job._kwargs)
+                job.state = DONE
+            except Exception as e:
+                job.error = str(e)
+                job.state = FAILED
+            finally:
+                job.finished_at = time.time()
+                with self._cond:
+                    self._running[resource] -= 1
+                    self._busy[resource] -= job.weight
+                    # Un trabajo en espera que no cabía puede empezar ahora
+                    self._cond.notify_all()
+                job._done.set()
+
+    def stats(self):
+        """Trabajos en ejecución y en espera por clase de recurso."""
+        with self._cond:
+            return {
+                resource: {
+                    "running": self._running[resource],
+                    "busy_slots": self._busy[resource],
+                    "queued": self._queued_count(resource),
+                    "slots": self.slots[resource],
+                }
+                for resource in self.slots
+            }
+
+
+# Planificador único del proceso / Process-wide scheduler
+scheduler = JobScheduler()
+
+
+def submit(session_id, resource, fn, *args, weight=1, **kwargs):
+    """Atajo para ``scheduler.submit``."""
+    return scheduler.submit(session_id, resource, fn, *args, weight=weight, **kwargs)
@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""
+Consulta de metadatos multimedia con una sola llamada a ffprobe y caché persistente.
+
+``probe(path)`` lee todos los flujos y el contenedor en una única invocación JSON
+de ffprobe y devuelve un ``MediaInfo`` compacto. El resultado se guarda en una
+base SQLite indexada por ruta absoluta, tamaño y fecha de modificación, así que
+volver a recorrer un directorio ya analizado cuesta un ``stat`` por archivo.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+
+from avtools import ffmpeg_utils
+from avtools import metrics
+
+DEFAULT_CACHE_PATH = os.environ.get(
+    "TRANSCRIPTORAV_PROBE_CACHE",
+    os.path.join(os.path.expanduser("~"), ".cache", "transcriptorav", "probe.sqlite"),
+)
+DEFAULT_MAX_ROWS = int(os.environ.get("TRANSCRIPTORAV_PROBE_CACHE_ROWS", "100000"))
+
+
+class MediaInfo:
+    """Metadatos del contenedor y de los primeros flujos de video y audio."""
+
+    __slots__ = (
+        "format_name",
+        "duration",
+        "size",
+        "bit_rate",
+        "video_codec",
+        "width",
+        "height",
+        "fps",
+        "audio_codec",
+        "audio_channels",
+        "sample_rate",
+        "audio_bit_rate",
+    )
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields.get(name))
+
+    @property
+    def has_video(self):
+        return self.video_codec is not None
+
+    @property
+    def has_audio(self):
+        return self.audio_codec is not None
+
+    @property
+    def resolution(self):
+        """Resolución en formato "anchoxalto" (como la devolvía ``obtener_info_video``)."""
+        if self.width is None or self.height is None:
+            return None
+        return f"{self.width}x{self.height}"
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        fields = ", ".join(f"{k}={v!r}" for k, v in self.to_dict().items() if v is not None)
+        return f"MediaInfo({fields})"
+
+
+def _parse_rate(rate):
+    """Convierte una tasa "num/den" de ffprobe en un número decimal."""
+    if not rate or rate == "0/0":
+        return None
+    if "/" in rate:
+        num, den = map(int, rate.split("/"))
+        return round(num / den, 2) if den else None
+    return float(rate)
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_ffprobe_json(data):
+    """Construye un ``MediaInfo`` a partir de la salida JSON de ffprobe."""
+    fmt = data.get("format", {})
+    streams = data.get("streams", [])
+    video = next(
+        (
+            s
+            for s in streams
+            if s.get("codec_type") == "video"
+            and not s.get("disposition", {}).get("attached_pic")
+        ),
+        {},
+    )
+    audio = next((s for s in streams if s.get("codec_type") == "audio"), {})
+    return MediaInfo(
+        format_name=fmt.get("format_name"),
+        duration=_to_float(fmt.get("duration")),
+        size=_to_int(fmt.get("size")),
+        bit_rate=_to_int(fmt.get("bit_rate")),
+        video_codec=video.get("codec_name"),
+        width=_to_int(video.get("width")),
+        height=_to_int(video.get("height")),
+        fps=_parse_rate(video.get("r_frame_rate")),
+        audio_codec=audio.get("codec_name"),
+        audio_channels=_to_int(audio.get("channels")),
+        sample_rate=_to_int(audio.get("sample_rate")),
+        audio_bit_rate=_to_int(audio.get("bit_rate")),
+    )
+
+
+def run_ffprobe(path):
+    """Ejecuta ffprobe una sola vez y devuelve sus flujos y formato como diccionario."""
+    output = ffmpeg_utils.run_process(
+        [
+            "ffprobe",
+            "-v",
+            "error",
+            "-print_format",
+            "json",
+            "-show_format",
+            "-show_streams",
+            path,
+        ]
+    ).stdout
+    return json.loads(output.decode("utf-8"))
+
+
+class ProbeCache:
+    """Caché persistente de ``MediaInfo`` indexada por ruta, tamaño y fecha de modificación.
+
+    Args:
+        path (str): Archivo SQLite de la caché (None = solo memoria del proceso).
+        max_rows (int): Filas que se conservan; al superarlas se borran las
+            escritas hace más tiempo.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_rows=DEFAULT_MAX_ROWS):
+        self.path = path
+        self.max_rows = max_rows
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connection(self):
+        if self._conn is None:
+            db_path = self.path or ":memory:"
+            if self.path:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS probes ("
+                "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, info TEXT)"
+            )
+        return self._conn
+
+    def forget_dir(self, directory):
+        """Borra las filas de los archivos dentro de ``directory`` (p. ej. una sesión borrada)."""
+        prefix = os.path.join(os.path.abspath(directory), "")
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM probes WHERE substr(path, 1, ?) = ?", (len(prefix), prefix))
+            conn.commit()
+
+    def get(self, path, stat):
+        with self._lock:
+            row = (
+                self._connection()
+                .execute(
+                    "SELECT info FROM probes WHERE path = ? AND size = ? AND mtime_ns = ?",
+                    (path, stat.st_size, stat.st_mtime_ns),
+                )
+                .fetchone()
+            )
+        return MediaInfo(**json.loads(row[0])) if row else None
+
+    def put(self, path, stat, info):
+        with self._lock:
+            conn = self._connection()
+            cursor = conn.execute(
+                "INSERT OR REPLACE INTO probes VALUES (?, ?, ?, ?)",
+                (path, stat.st_size, stat.st_mtime_ns, json.dumps(info.to_dict())),
+            )
+            # Cada escritura recibe un rowid nuevo: se conservan las ``max_rows``
+            # más recientes (las subidas temporales dejan filas que no se vuelven a leer)
+            conn.execute(
+                "DELETE FROM probes WHERE rowid <= ?", (cursor.lastrowid - self.max_rows,)
+            )
+            conn.commit()
+
+
+default_cache = ProbeCache()
+
+
+def probe(path, cache=None):
+    """Devuelve los metadatos de ``path`` consultando ffprobe solo si el archivo cambió.
+
+    Args:
+        path (str): Ruta del archivo multimedia.
+        cache (ProbeCache): Caché a utilizar (por defecto, la compartida del proceso).
+
+    Raises:
+        subprocess.CalledProcessError: Si ffprobe no puede leer el archivo.
+    """
+    cache = cache or default_cache
+    path = os.path.abspath(path)
+    with metrics.stage("probe"):
+        stat = os.stat(path)
+        try:
+            info = cache.get(path, stat)
+        except (sqlite3.Error, OSError):
+            info = None
+        if info is None:
+            info = parse_ffprobe_json(run_ffprobe(path))
+            try:
+                cache.put(path, stat, info)
+            except (sqlite3.Error, OSError) as e:
+                print(f"No se pudo guardar la información de {path} en la caché: {str(e)}")
+    # La primera consulta de una tarea es la de su entrada
+    metrics.set_media_seconds(info.duration)
+    return info
@@ -0,0 +1,477 @@
+# -*- coding: utf-8 -*-
+"""
+Métricas por tarea: duración de cada etapa, bytes, factor de tiempo real, CPU
+de los subprocesos y velocidad de codificación de FFmpeg.
+
+Cada tarea se envuelve con ``tracked`` (o ``track``), que crea un ``TaskMetrics``
+y lo deja como tarea actual del hilo. Los módulos de ``avtools`` anotan sus
+etapas con ``stage("...")`` sin recibir el objeto: si no hay tarea actual, las
+llamadas no hacen nada. El tiempo de una etapa es exclusivo: mientras se
+ejecuta una etapa anidada (p. ej. ``probe`` dentro de ``encode``), el reloj de
+la exterior se detiene, así que la suma de las etapas nunca supera la duración
+total.
+
+Al terminar, cada tarea se escribe como una línea JSON en
+``<directorio>/metrics.jsonl`` y se actualiza ``<directorio>/<origen>.prom`` en
+formato de texto de Prometheus (apto para el recolector ``textfile`` de
+node_exporter). El directorio se configura con ``TRANSCRIPTORAV_METRICS_DIR``.
+"""
+
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+
+DEFAULT_METRICS_DIR = os.environ.get(
+    "TRANSCRIPTORAV_METRICS_DIR", "/tmp/transcriptorav-metrics"
+)
+LOG_NAME = "metrics.jsonl"
+
+# Duraciones recientes por tarea con las que se calculan los cuantiles
+RECENT_SAMPLES = 500
+
+QUANTILES = (0.5, 0.95)
+
+OK = "ok"
+ERROR = "error"
+
+_current = contextvars.ContextVar("transcriptorav_task_metrics", default=None)
+
+
+class TaskMetrics:
+    """Métricas de una ejecución de una tarea.
+
+    Args:
+        task (str): Nombre de la tarea.
+        **labels: Datos adicionales que se guardan con el registro.
+    """
+
+    def __init__(self, task, **labels):
+        self.task = task
+        self.labels = dict(labels)
+        self.status = OK
+        self.stages = defaultdict(float)
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.media_seconds = None
+        self.subprocess_cpu = 0.0
+        self.subprocesses = 0
+        self.encoded_seconds = 0.0
+        self.encoded_frames = 0
+        self.encode_wall = 0.0
+        self.started_at = time.time()
+        self.wall = None
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        # Etapas abiertas de cada hilo: [nombre, inicio del tramo en curso]
+        self._open = threading.local()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Mide el bloque como etapa ``name`` (tiempo exclusivo de etapas anidadas)."""
+        stack = self._open.__dict__.setdefault("stack", [])
+        now = time.perf_counter()
+        if stack:
+            outer = stack[-1]
+            self._add_stage(outer[0], now - outer[1])
+        stack.append([name, now])
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            inner = stack.pop()
+            self._add_stage(inner[0], now - inner[1])
+            if stack:
+                stack[-1][1] = now
+
+    def _add_stage(self, name, seconds):
+        with self._lock:
+            self.stages[name] += seconds
+
+    def add_bytes(self, bytes_in=0, bytes_out=0):
+        with self._lock:
+            self.bytes_in += bytes_in
+            self.bytes_out += bytes_out
+
+    def add_subprocess(self, usage):
+        """Suma el uso de CPU (``resource.struct_rusage``) de un subproceso terminado."""
+        with self._lock:
+            self.subprocess_cpu += usage.ru_utime + usage.ru_stime
+            self.subprocesses += 1
+
+    def add_encode(self, media_seconds, frames, seconds):
+        """Suma una codificación de FFmpeg terminada (segundos de medio, fotogramas, tiempo real)."""
+        with self._lock:
+            self.encoded_seconds += media_seconds
+            self.encoded_frames += frames
+            self.encode_wall += seconds
+
+    def finish(self):
+        self.wall = time.perf_counter() - self._start
+
+    def to_record(self):
+        """Registro serializable de la ejecución."""
+        rtf = None
+        if self.media_seconds and self.wall is not None:
+            rtf = round(self.wall / self.media_seconds, 4)
+        encode = {}
+        if self.encode_wall:
+            encode = {
+                "encode_speed_x": round(self.encoded_seconds / self.encode_wall, 3),
+                "encode_fps": round(self.encoded_frames / self.encode_wall, 2),
+            }
+        return {
+            "ts": round(self.started_at, 3),
+            "task": self.task,
+            "status": self.status,
+            "wall_s": round(self.wall or 0.0, 4),
+            "stages": {name: round(s, 4) for name, s in self.stages.items()},
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "media_seconds": self.media_seconds,
+            "rtf": rtf,
+            "subprocess_cpu_s": round(self.subprocess_cpu, 4),
+            "subprocesses": self.subprocesses,
+            **encode,
+            **self.labels,
+        }
+
+
+def current():
+    """``TaskMetrics`` de la tarea en curso en este hilo, o None."""
+    return _current.get()
+
+
+def stage(name):
+    """Mide un bloque como etapa de la tarea actual (no hace nada fuera de una tarea)."""
+    recorder = _current.get()
+    if recorder is None:
+        return contextlib.nullcontext()
+    return recorder.stage(name)
+
+
+def add_bytes(bytes_in=0, bytes_out=0):
+    recorder = _current.get()
+    if recorder is not None:
+        recorder.add_bytes(bytes_in, bytes_out)
+
+
+def set_media_seconds(seconds, overwrite=False):
+    """Duración del medio de entrada, para el factor de tiempo real.
+
+    Solo la primera duración conocida cuenta (la de la entrada), salvo con ``overwrite``.
+    """
+    recorder = _current.get()
+    if recorder is not None and seconds and (overwrite or recorder.media_seconds is None):
+        recorder.media_seconds = float(seconds)
+
+
+def set_label(name, value):
+    recorder = _current.get()
+    if recorder is not None:
+        recorder.labels[name] = value
+
+
+def record_subprocess(usage):
+    recorder = _current.get()
+    if recorder is not None:
+        recorder.add_subprocess(usage)
+
+
+def record_encode(progress):
+    """Anota la velocidad final de una codificación (``FfmpegProgress`` terminado)."""
+    recorder = _current.get()
+    if recorder is not None:
+        recorder.add_encode(progress.out_seconds, progress.frame, progress.elapsed)
+
+
+def _output_size(outputs):
+    if outputs is None:
+        return 0
+    if isinstance(outputs, str):
+        outputs = [outputs]
+    total = 0
+    for path in outputs:
+        try:
+            total += os.path.getsize(path)
+        except OSError:
+            pass
+    return total
+
+
+@contextlib.contextmanager
+def track(task, sink=None, **labels):
+    """Registra el bloque como una ejecución de ``task`` y la emite al terminar.
+
+    Una excepción marca la ejecución como fallida y se propaga.
+    """
+    recorder = TaskMetrics(task, **labels)
+    token = _current.set(recorder)
+    try:
+        yield recorder
+    except BaseException:
+        recorder.status = ERROR
+        raise
+    finally:
+        _current.reset(token)
+        recorder.finish()
+        (sink or default_sink()).emit(recorder.to_record())
+
+
+def tracked(task, outputs=None):
+    """Decorador que registra cada llamada a la función como una ejecución de ``task``.
+
+    Args:
+        task (str): Nombre de la tarea.
+        outputs (callable): Recibe el valor devuelto y devuelve la ruta (o lista
+            de rutas) de salida, o None si la tarea no produjo nada; en ese caso
+            la ejecución cuenta como fallida. Sin ``outputs``, solo una excepción
+            marca la ejecución como fallida.
+    """
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with track(task) as recorder:
+                result = fn(*args, **kwargs)
+                if outputs is not None:
+                    paths = outputs(result)
+                    if not paths:
+                        recorder.status = ERROR
+                    recorder.add_bytes(bytes_out=_output_size(paths))
+                return result
+
+        return wrapper
+
+    return decorator
+
+
+def run_in_context(executor, fn, *args):
+    """``executor.submit`` que conserva la tarea actual en el hilo de trabajo."""
+    return executor.submit(contextvars.copy_context().run, fn, *args)
+
+
+def percentile(values, q):
+    """Percentil ``q`` (0-1) con interpolación lineal; None si no hay valores."""
+    values = sorted(values)
+    if not values:
+        return None
+    position = (len(values) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+class MetricsSink:
+    """Destino de los registros: JSONL compartido y archivo Prometheus del proceso.
+
+    Args:
+        directory (str): Directorio de las métricas.
+        source (str): Origen de los registros (``app``, ``cli``...). Da nombre al
+            archivo ``.prom`` y se añade como etiqueta, para que varios procesos
+            puedan escribir en el mismo directorio.
+    """
+
+    def __init__(self, directory=DEFAULT_METRICS_DIR, source="app"):
+        self.directory = directory
+        self.source = source
+        self.log_path = os.path.join(directory, LOG_NAME)
+        self.prom_path = os.path.join(directory, f"{source}.prom")
+        self._lock = threading.Lock()
+        self._runs = defaultdict(int)
+        self._wall_sum = defaultdict(float)
+        self._stage_sum = defaultdict(float)
+        self._bytes_in = defaultdict(int)
+        self._bytes_out = defaultdict(int)
+        self._cpu = defaultdict(float)
+        self._recent_wall = defaultdict(lambda: deque(maxlen=RECENT_SAMPLES))
+        self._recent_rtf = defaultdict(lambda: deque(maxlen=RECENT_SAMPLES))
+        self._recent_speed = defaultdict(lambda: deque(maxlen=RECENT_SAMPLES))
+
+    def emit(self, record):
+        """Guarda ``record``. Nunca lanza excepciones: las métricas no deben romper una tarea."""
+        record = dict(record, source=self.source)
+        task = record["task"]
+        with self._lock:
+            self._runs[(task, record["status"])] += 1
+            self._wall_sum[task] += record["wall_s"]
+            for name, seconds in record["stages"].items():
+                self._stage_sum[(task, name)] += seconds
+            self._bytes_in[task] += record["bytes_in"]
+            self._bytes_out[task] += record["bytes_out"]
+            self._cpu[task] += record["subprocess_cpu_s"]
+            if record["status"] == OK:
+                self._recent_wall[task].append(record["wall_s"])
+                if record["rtf"] is not None:
+                    self._recent_rtf[task].append(record["rtf"])
+                if record.get("encode_speed_x") is not None:
+                    self._recent_speed[task].append(record["encode_speed_x"])
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                self._write_prometheus()
+            except OSError as e:
+                print(f"No se pudieron guardar las métricas: {str(e)}")
+
+    def _write_prometheus(self):
+        source = self.source
+        lines = [
+            "# HELP transcriptorav_task_runs_total Ejecuciones terminadas por tarea y estado.",
+            "# TYPE transcriptorav_task_runs_total counter",
+        ]
+        for (task, status), count in sorted(self._runs.items()):
+            lines.append(
+                f"transcriptorav_task_runs_total{_labels(source=source, task=task, status=status)} {count}"
+            )
+
+        lines += [
+            "# HELP transcriptorav_task_seconds Duración de las ejecuciones correctas recientes.",
+            "# TYPE transcriptorav_task_seconds summary",
+        ]
+        for task in sorted(self._wall_sum):
+            for q in QUANTILES:
+                value = percentile(self._recent_wall[task], q)
+                if value is not None:
+                    lines.append(
+                        f"transcriptorav_task_seconds{_labels(source=source, task=task, quantile=q)} {value:.6f}"
+                    )
+            count = sum(c for (t, _), c in self._runs.items() if t == task)
+            labels = _labels(source=source, task=task)
+            lines.append(f"transcriptorav_task_seconds_sum{labels} {self._wall_sum[task]:.6f}")
+            lines.append(f"transcriptorav_task_seconds_count{labels} {count}")
+
+        for metric, recent, help_text in (
+            (
+                "transcriptorav_realtime_factor",
+                self._recent_rtf,
+                "Tiempo de proceso dividido por la duración del medio.",
+            ),
+            (
+                "transcriptorav_encode_speed",
+                self._recent_speed,
+                "Segundos de medio codificados por FFmpeg por segundo real.",
+            ),
+        ):
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} gauge"]
+            for task in sorted(recent):
+                for q in QUANTILES:
+                    value = percentile(recent[task], q)
+                    if value is not None:
+                        lines.append(
+                            f"{metric}{_labels(source=source, task=task, quantile=q)} {value:.6f}"
+                        )
+
+        lines += [
+            "# HELP transcriptorav_stage_seconds_total Tiempo acumulado por etapa.",
+            "# TYPE transcriptorav_stage_seconds_total counter",
+        ]
+        for (task, name), seconds in sorted(self._stage_sum.items()):
+            lines.append(
+                f"transcriptorav_stage_seconds_total{_labels(source=source, task=task, stage=name)} {seconds:.6f}"
+            )
+
+        for metric, values, help_text in (
+            ("transcriptorav_bytes_in_total", self._bytes_in, "Bytes de entrada."),
+            ("transcriptorav_bytes_out_total", self._bytes_out, "Bytes de salida."),
+            (
+                "transcriptorav_subprocess_cpu_seconds_total",
+                self._cpu,
+                "CPU (usuario + sistema) de los subprocesos de FFmpeg/ffprobe.",
+            ),
+        ):
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+            for task, value in sorted(values.items()):
+                lines.append(f"{metric}{_labels(source=source, task=task)} {value}")
+
+        # Se escribe aparte y se renombra: el recolector nunca lee un archivo a medias
+        staging = f"{self.prom_path}.{os.getpid()}.tmp"
+        with open(staging, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(staging, self.prom_path)
+
+
+_sink = None
+_sink_lock = threading.Lock()
+
+
+def configure(directory=None, source=None):
+    """Sustituye el destino del proceso (por ejemplo, ``source="cli"`` en la línea de comandos)."""
+    global _sink
+    with _sink_lock:
+        _sink = MetricsSink(directory or DEFAULT_METRICS_DIR, source or "app")
+    return _sink
+
+
+def default_sink():
+    global _sink
+    with _sink_lock:
+        if _sink is None:
+            _sink = MetricsSink()
+        return _sink
+
+
+def read_log(path=None, limit=5000):
+    """Últimos ``limit`` registros del JSONL (se ignoran las líneas dañadas)."""
+    path = path or os.path.join(DEFAULT_METRICS_DIR, LOG_NAME)
+    records = deque(maxlen=limit)
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue
+    except OSError:
+        return []
+    return list(records)
+
+
+def summarize(records):
+    """Resumen por tarea: ejecuciones, errores, p50/p95 de la duración y de cada etapa.
+
+    Returns:
+        list: Un diccionario por tarea, ordenado por nombre.
+    """
+    by_task = defaultdict(list)
+    for record in records:
+        by_task[record["task"]].append(record)
+
+    rows = []
+    for task, task_records in sorted(by_task.items()):
+        ok = [r for r in task_records if r["status"] == OK]
+        walls = [r["wall_s"] for r in ok]
+        rtfs = [r["rtf"] for r in ok if r.get("rtf") is not None]
+        stage_names = sorted({name for r in ok for name in r["stages"]})
+        row = {
+            "task": task,
+            "runs": len(task_records),
+            "errors": len(task_records) - len(ok),
+            "p50_s": percentile(walls, 0.5),
+            "p95_s": percentile(walls, 0.95),
+            "rtf_p50": percentile(rtfs, 0.5),
+            "encode_speed_x_p50": percentile(
+                [r["encode_speed_x"] for r in ok if r.get("encode_speed_x") is not None], 0.5
+            ),
+            "subprocess_cpu_s_p50": percentile([r["subprocess_cpu_s"] for r in ok], 0.5),
+            "mb_in": round(sum(r["bytes_in"] for r in ok) / 1e6, 1),
+            "mb_out": round(sum(r["bytes_out"] for r in ok) / 1e6, 1),
+        }
+        for name in stage_names:
+            values = [r["stages"].get(name, 0.0) for r in ok]
+            row[f"{name}_p50_s"] = percentile(values, 0.5)
+            row[f"{name}_p95_s"] = percentile(values, 0.95)
+        rows.append(row)
+    return rows
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+Emparejamiento de videos originales con sus versiones convertidas.
+
+Los scripts de limpieza comparaban cada original con cada convertido (subcadenas
+y palabras clave), lo que con bibliotecas grandes es O(n×m) y, peor aún, daba por
+buena cualquier coincidencia de una sola palabra antes de borrar. Aquí los
+nombres de un lado se indexan una vez:
+
+* un diccionario por nombre normalizado resuelve las coincidencias exactas en O(1);
+* un índice invertido palabra → nombres limita las coincidencias parciales a los
+  candidatos que comparten alguna palabra, puntuados con un Jaccard ponderado
+  (las palabras raras pesan más que las que aparecen en media biblioteca).
+
+Antes de borrar nada, ``durations_match`` confirma la pareja comparando la
+duración de ambos archivos con ``media_probe`` (cacheada por ruta, tamaño y
+fecha de modificación, así que repetir la limpieza no vuelve a llamar a ffprobe).
+"""
+
+import math
+import os
+import re
+import unicodedata
+
+from avtools import media_probe
+
+CONVERTED_SUFFIX = "_car_compatible"
+
+# Puntuación mínima (Jaccard ponderado, 0-1) para aceptar una coincidencia parcial
+MIN_SCORE = 0.5
+
+# Diferencia de puntuación mínima con el segundo candidato; si no, es ambigua
+MIN_MARGIN = 0.1
+
+# Palabras presentes en más nombres que este número no abren candidatos (p. ej. "video")
+MAX_BUCKET = 200
+
+# Diferencia de duración tolerada al confirmar una pareja: el mayor de ambos valores
+DURATION_TOLERANCE_SECONDS = 1.0
+DURATION_TOLERANCE_RATIO = 0.005
+
+EXACT = "exact"
+PARTIAL = "partial"
+
+
+def base_name(file_name):
+    """Extrae el nombre base del archivo sin información técnica."""
+    # Eliminar extensión
+    nombre = os.path.splitext(file_name)[0]
+
+    # Eliminar sufijo _car_compatible
+    nombre = nombre.replace(CONVERTED_SUFFIX, "")
+
+    # Eliminar información técnica entre paréntesis
+    nombre = re.sub(r"\([^)]*\)", "", nombre)
+
+    # Eliminar patrones de resolución y codec
+    nombre = re.sub(r"\d+p_\d+fps_[^-_\s]*", "", nombre)
+
+    return nombre.strip()
+
+
+def _fold(text):
+    """Minúsculas y sin acentos, para que "Canción" y "cancion" coincidan."""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def normalize_name(file_name):
+    """Clave de coincidencia exacta: nombre base sin espacios, guiones ni signos."""
+    return re.sub(r"[\W_]+", "", _fold(base_name(file_name)))
+
+
+def tokens(file_name):
+    """Palabras significativas (más de 3 caracteres) del nombre base."""
+    return {word for word in re.split(r"[\W_]+", _fold(base_name(file_name))) if len(word) > 3}
+
+
+class Match:
+    """Pareja propuesta entre un nombre consultado y uno indexado."""
+
+    __slots__ = ("name", "kind", "score")
+
+    def __init__(self, name, kind, score):
+        self.name = name
+        self.kind = kind
+        self.score = score
+
+    def __repr__(self):
+        return f"Match({self.name!r}, {self.kind!r}, {self.score:.2f})"
+
+
+class NameMatcher:
+    """Índice de nombres de archivo para emparejar originales y convertidos.
+
+    Args:
+        names (iterable): Nombres de archivo a indexar (sin directorio).
+        min_score (float): Puntuación mínima de una coincidencia parcial.
+        min_margin (float): Ventaja mínima del mejor candidato sobre el segundo.
+        max_bucket (int): Tamaño máximo de la lista de una palabra para usarla
+            como fuente de candidatos.
+    """
+
+    def __init__(self, names, min_score=MIN_SCORE, min_margin=MIN_MARGIN, max_bucket=MAX_BUCKET):
+        self.names = list(names)
+        self.min_score = min_score
+        self.min_margin = min_margin
+        self.max_bucket = max_bucket
+        self._exact = {}
+        self._tokens = []
+        self._index = {}
+        for i, name in enumerate(self.names):
+            self._exact.setdefault(normalize_name(name), []).append(i)
+            name_tokens = tokens(name)
+            self._tokens.append(name_tokens)
+            for token in name_tokens:
+                self._index.setdefault(token, []).append(i)
+
+    def __len__(self):
+        return len(self.names)
+
+    def _weight(self, token):
+        """Peso IDF de una palabra: las que aparecen en menos nombres pesan más."""
+        return math.log(1 + (len(self.names) + 1) / (1 + len(self._index.get(token, ()))))
+
+    def _score(self, query_tokens, candidate_tokens):
+        common = query_tokens & candidate_tokens
+        if not common:
+            return 0.0
+        union = query_tokens | candidate_tokens
+        return sum(self._weight(t) for t in common) / sum(self._weight(t) for t in union)
+
+    def match(self, file_name, exclude=()):
+        """Busca el nombre indexado que corresponde a ``file_name``.
+
+        Args:
+            file_name (str): Nombre de archivo a emparejar.
+            exclude (set): Nombres indexados ya emparejados, que no se proponen otra vez.
+
+        Returns:
+            Match: La mejor pareja, o None si no hay ninguna clara.
+        """
+        for i in self._exact.get(normalize_name(file_name), ()):
+            if self.names[i] not in exclude:
+                return Match(self.names[i], EXACT, 1.0)
+
+        query_tokens = tokens(file_name)
+        candidates = set()
+        for token in query_tokens:
+            bucket = self._index.get(token, ())
+            if len(bucket) <= self.max_bucket:
+                candidates.update(bucket)
+
+        scored = sorted(
+            (
+                (self._score(query_tokens, self._tokens[i]), self.names[i])
+                for i in candidates
+                if self.names[i] not in exclude
+            ),
+            reverse=True,
+        )
+        if not scored or scored[0][0] < self.min_score:
+            return None
+        if len(scored) > 1 and scored[0][0] - scored[1][0] < self.min_margin:
+            return None
+        return Match(scored[0][1], PARTIAL, scored[0][0])
+
+
+def list_videos(directory, converted):
+    """Lista (una sola vez) los ``.mp4`` originales o convertidos de ``directory``."""
+    suffix = CONVERTED_SUFFIX + ".mp4"
+    return sorted(
+        name
+        for name in os.listdir(directory)
+        if name.endswith(".mp4") and name.endswith(suffix) == converted
+    )
+
+
+def durations_match(
+    first_path,
+    second_path,
+    tolerance=DURATION_TOLERANCE_SECONDS,
+    ratio=DURATION_TOLERANCE_RATIO,
+    cache=None,
+):
+    """Confirma una pareja comparando la duración de ambos archivos.
+
+    Args:
+        first_path (str): Primer archivo (normalmente el original).
+        second_path (str): Segundo archivo (normalmente el convertido).
+        tolerance (float): Diferencia máxima en segundos.
+        ratio (float): Diferencia máxima relativa a la duración del primero; se usa
+            la mayor de ambas tolerancias.
+        cache (ProbeCache): Caché de ``media_probe`` (None = la predeterminada).
+
+    Returns:
+        bool: True solo si ambas duraciones se conocen y coinciden; si no se pueden
+        leer, la pareja no se considera confirmada.
+    """
+    try:
+        first = media_probe.probe(first_path, cache=cache).duration
+        second = media_probe.probe(second_path, cache=cache).duration
+    except Exception:
+        return False
+    if not first or not second:
+        return False
+    return abs(first - second) <= max(tolerance, first * ratio)
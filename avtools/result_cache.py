@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+"""
+Caché en disco de resultados direccionada por contenido.
+
+La clave de cada entrada combina el hash SHA-256 del archivo subido con el nombre
+de la tarea y sus parámetros, así que el mismo archivo procesado con las mismas
+opciones (por este u otro usuario) devuelve el resultado anterior al instante.
+
+Estructura del directorio:
+    <raíz>/<k[:2]>/<clave>/<archivo de salida>
+    <raíz>/.tmp/   (entradas en construcción y entradas expulsadas)
+
+Cada entrada se construye en ``.tmp`` y se publica con un único ``os.rename`` del
+directorio, que es atómico: varias réplicas de la aplicación pueden compartir la
+misma raíz sin ver nunca una entrada a medio escribir. El orden LRU se lleva con
+la fecha de modificación del directorio de cada entrada, que se actualiza en
+cada acierto.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from avtools import metrics
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    "TRANSCRIPTORAV_CACHE_DIR", "/tmp/transcriptorav-cache"
+)
+DEFAULT_CACHE_MB = int(os.environ.get("TRANSCRIPTORAV_CACHE_MB", "10240"))
+
+# Cambiar este valor invalida todas las entradas existentes
+CACHE_FORMAT = 1
+
+_BLOCK_SIZE = 1024 * 1024
+
+# Hashes de archivos subidos ya calculados (LRU acotada: los identificadores de
+# Streamlit no se reutilizan, así que sin límite crecería con cada subida)
+_DIGESTS_MAX = 4096
+_digests = OrderedDict()
+_digests_lock = threading.Lock()
+
+
+def hash_stream(fileobj, block_size=_BLOCK_SIZE):
+    """Calcula el SHA-256 de un objeto tipo archivo leyéndolo por bloques."""
+    digest = hashlib.sha256()
+    fileobj.seek(0)
+    while True:
+        block = fileobj.read(block_size)
+        if not block:
+            break
+        digest.update(block)
+    fileobj.seek(0)
+    return digest.hexdigest()
+
+
+def hash_file(path, block_size=_BLOCK_SIZE):
+    """Calcula el SHA-256 de un archivo en disco leyéndolo por bloques."""
+    with open(path, "rb") as f:
+        return hash_stream(f, block_size)
+
+
+def upload_digest(uploaded_file):
+    """Hash de un archivo subido con Streamlit, memorizado por identificador de archivo."""
+    memo_key = (getattr(uploaded_file, "file_id", None), uploaded_file.name, uploaded_file.size)
+    if memo_key[0] is not None:
+        with _digests_lock:
+            if memo_key in _digests:
+                _digests.move_to_end(memo_key)
+                return _digests[memo_key]
+    digest = hash_stream(uploaded_file)
+    if memo_key[0] is not None:
+        with _digests_lock:
+            _digests[memo_key] = digest
+            while len(_digests) > _DIGESTS_MAX:
+                _digests.popitem(last=False)
+    return digest
+
+
+def cache_key(content_digest, task, params):
+    """Combina el hash del contenido, la tarea y sus parámetros en una clave de caché."""
+    payload = json.dumps(
+        {
+            "format": CACHE_FORMAT,
+            "content": content_digest,
+            "task": task,
+            "params": params,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _link_or_copy(source, destination):
+    """Enlaza ``source`` en ``destination`` sin copiar datos; copia si están en distintos discos."""
+    if os.path.exists(destination):
+        os.remove(destination)
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination)
+
+
+def _tree_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class ResultCache:
+    """Caché de resultados con límite de tamaño y expulsión LRU.
+
+    Args:
+        directory (str): Raíz de la caché (puede compartirse entre réplicas).
+        max_mb (int): Tamaño máximo aproximado de la caché en MB.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_mb=DEFAULT_CACHE_MB):
+        self.directory = directory
+        self.max_bytes = max_mb * 1024 * 1024
+        self._tmp_dir = os.path.join(directory, ".tmp")
+        # Tamaño aproximado de la caché: se mide una vez recorriendo el directorio y
+        # después se suma cada entrada publicada; solo al superar el límite se
+        # vuelve a recorrer todo para expulsar (y corregir lo que hayan cambiado
+        # otras réplicas)
+        self._size = None
+        self._size_lock = threading.Lock()
+
+    def _entry_dir(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key, destination):
+        """Enlaza el resultado de ``key`` en ``destination``.
+
+        El archivo toma el nombre que pide quien consulta, no el que tenía al
+        guardarse (que puede ser el de otro usuario).
+
+        Returns:
+            str: ``destination``, o None si no está en caché.
+        """
+        with metrics.stage("cache_lookup"):
+            destination = self._get(key, destination)
+        metrics.set_label("cache_hit", destination is not None)
+        return destination
+
+    def _get(self, key, destination):
+        entry_dir = self._entry_dir(key)
+        try:
+            names = os.listdir(entry_dir)
+            os.utime(entry_dir)
+        except OSError:
+            return None
+        if len(names) != 1:
+            return None
+
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        try:
+            _link_or_copy(os.path.join(entry_dir, names[0]), destination)
+        except OSError:
+            # La entrada fue expulsada por otra réplica mientras se leía
+            return None
+        return destination
+
+    def put(self, key, path):
+        """Publica ``path`` como resultado de ``key``. Nunca lanza excepciones."""
+        with metrics.stage("cache_store"):
+            self._put(key, path)
+
+    def _put(self, key, path):
+        try:
+            os.makedirs(self._tmp_dir, exist_ok=True)
+            staging = os.path.join(self._tmp_dir, uuid.uuid4().hex)
+            os.makedirs(staging)
+            _link_or_copy(path, os.path.join(staging, os.path.basename(path)))
+
+            entry_dir = self._entry_dir(key)
+            os.makedirs(os.path.dirname(entry_dir), exist_ok=True)
+            try:
+                os.rename(staging, entry_dir)
+            except OSError:
+                # Otra réplica publicó la misma clave primero
+                shutil.rmtree(staging, ignore_errors=True)
+                return
+            with self._size_lock:
+                if self._size is None:
+                    self._size = self._scan()[1]
+                    self._purge_stale_staging()
+                else:
+                    self._size += _tree_size(entry_dir)
+                over_limit = self._size > self.max_bytes
+            if over_limit:
+                self.evict()
+        except OSError as e:
+            print(f"No se pudo guardar el resultado en la caché: {str(e)}")
+
+    def _scan(self):
+        """Recorre la caché: ``([(mtime, tamaño, directorio), ...], tamaño total)``."""
+        entries = []
+        total = 0
+        for prefix in os.listdir(self.directory):
+            prefix_dir = os.path.join(self.directory, prefix)
+            if prefix == ".tmp" or not os.path.isdir(prefix_dir):
+                continue
+            for key in os.listdir(prefix_dir):
+                entry_dir = os.path.join(prefix_dir, key)
+                try:
+                    mtime = os.stat(entry_dir).st_mtime
+                except OSError:
+                    continue
+                size = _tree_size(entry_dir)
+                entries.append((mtime, size, entry_dir))
+                total += size
+        return entries, total
+
+    def evict(self):
+        """Expulsa las entradas menos usadas recientemente hasta respetar el tamaño máximo."""
+        entries, total = self._scan()
+        entries.sort()
+        for _, size, entry_dir in entries:
+            if total <= self.max_bytes:
+                break
+            # Renombrar primero hace la expulsión atómica para las demás réplicas
+            trash = os.path.join(self._tmp_dir, f"evicted-{uuid.uuid4().hex}")
+            try:
+                os.rename(entry_dir, trash)
+            except OSError:
+                continue
+            shutil.rmtree(trash, ignore_errors=True)
+            total -= size
+        with self._size_lock:
+            self._size = total
+
+        self._purge_stale_staging()
+
+    def _purge_stale_staging(self, max_age=24 * 3600):
+        """Borra restos en ``.tmp`` de procesos que murieron a mitad de una publicación."""
+        now = time.time()
+        try:
+            names = os.listdir(self._tmp_dir)
+        except OSError:
+            return
+        for name in names:
+            path = os.path.join(self._tmp_dir, name)
+            try:
+                if now - os.stat(path).st_mtime > max_age:
+                    shutil.rmtree(path, ignore_errors=True)
+            except OSError:
+                pass
+
+
+# Caché compartida por el proceso / Process-wide cache
+default_cache = ResultCache()
+
+
+def task_key(uploaded_file, task, params):
+    """Clave de caché para ``task`` aplicada a un archivo subido con Streamlit."""
+    return cache_key(upload_digest(uploaded_file), task, params)
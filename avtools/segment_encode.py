@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""
+Codificación de un solo video por tramos en paralelo.
+
+x264 apenas escala más allá de 8-12 hilos, así que un video largo en una máquina
+grande deja la mitad de los núcleos libres. Aquí el video se corta sin
+recodificar en ``segments`` tramos que empiezan en un fotograma clave (el
+muxer ``segment`` de FFmpeg corta en el primer fotograma clave tras cada
+instante pedido), cada tramo se codifica en su propio proceso con los mismos
+argumentos, el audio se codifica aparte de una sola vez y al final el demuxer
+``concat`` une los tramos con ``-c copy`` y añade el audio. Como el audio
+nunca se corta, no hay desfases ni chasquidos en las uniones.
+
+Cada tramo necesita espacio temporal en disco (la copia del original más su
+versión codificada) junto al archivo de salida.
+"""
+
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from avtools import ffmpeg_progress
+from avtools import ffmpeg_utils
+from avtools import metrics
+
+# Tramos por video en la aplicación (1 = un solo proceso de FFmpeg, como siempre)
+DEFAULT_SEGMENTS = int(os.environ.get("TRANSCRIPTORAV_ENCODE_SEGMENTS", "1"))
+
+# Por debajo de esta duración por tramo, el coste de cortar y unir no compensa
+MIN_SEGMENT_SECONDS = 60
+
+
+def segment_count(duration, segments, min_segment_seconds=MIN_SEGMENT_SECONDS):
+    """Número de tramos a usar para un video de ``duration`` segundos (1 = no cortar)."""
+    if not duration or segments <= 1:
+        return 1
+    return max(1, min(segments, int(duration // min_segment_seconds)))
+
+
+def split_times(duration, segments):
+    """Instantes (en segundos) en los que se pide cortar: ``segments`` tramos iguales."""
+    return [duration * i / segments for i in range(1, segments)]
+
+
+def _read_segment_list(list_path, directory):
+    """Lee la lista CSV del muxer ``segment``: ``[(ruta, duración), ...]``."""
+    pieces = []
+    with open(list_path, encoding="utf-8") as f:
+        for line in f:
+            name, start, end = line.strip().rsplit(",", 2)
+            pieces.append((os.path.join(directory, name), float(end) - float(start)))
+    return pieces
+
+
+def split_at_keyframes(input_path, directory, times):
+    """Corta el primer flujo de video de ``input_path`` sin recodificar.
+
+    Returns:
+        list: ``[(ruta, duración), ...]`` de cada tramo, en orden.
+    """
+    list_path = os.path.join(directory, "tramos.csv")
+    ffmpeg_utils.run_ffmpeg(
+        [
+            "-i",
+            input_path,
+            "-map",
+            "0:v:0",
+            "-c",
+            "copy",
+            "-f",
+            "segment",
+            "-segment_times",
+            ",".join(f"{t:.3f}" for t in times),
+            "-segment_list",
+            list_path,
+            "-segment_list_type",
+            "csv",
+            "-reset_timestamps",
+            "1",
+            os.path.join(directory, "origen_%03d.mkv"),
+        ]
+    )
+    return _read_segment_list(list_path, directory)
+
+
+def _combine_progress(progress, pieces):
+    """Un ``FfmpegProgress`` por tramo que vuelca la suma de todos en ``progress``."""
+
+    def update(_):
+        running = [p for p in children if p.started_at is not None and not p.done]
+        progress.out_seconds = sum(p.out_seconds for p in children)
+        progress.frame = sum(p.frame for p in children)
+        # La velocidad conjunta es la suma de la de los tramos que siguen en curso
+        progress.fps = sum(p.fps or 0 for p in running) or None
+        progress.speed = sum(p.speed or 0 for p in running) or None
+        if progress.on_update is not None:
+            progress.on_update(progress)
+
+    children = [ffmpeg_progress.FfmpegProgress(duration, on_update=update) for _, duration in pieces]
+    return children
+
+
+def encode_in_segments(
+    input_path,
+    output_path,
+    video_args,
+    audio_args,
+    segments,
+    duration,
+    has_audio=True,
+    threads=0,
+    progress=None,
+):
+    """Codifica ``input_path`` en ``segments`` tramos simultáneos y los une en ``output_path``.
+
+    Args:
+        input_path (str): Video de entrada.
+        output_path (str): Archivo de salida; su extensión decide el contenedor de
+            los tramos codificados.
+        video_args (list): Argumentos de codificación del video (códec, filtros,
+            ``-r``...), idénticos para todos los tramos.
+        audio_args (list): Argumentos de codificación del audio.
+        segments (int): Número de tramos.
+        duration (float): Duración de ``input_path`` en segundos.
+        has_audio (bool): Si la entrada tiene audio.
+        threads (int): Hilos de FFmpeg para todo el trabajo (0 = todos los núcleos);
+            se reparten entre los tramos.
+        progress (FfmpegProgress): Recibe el progreso conjunto de los tramos.
+
+    Raises:
+        subprocess.CalledProcessError: Si alguna ejecución de FFmpeg falla.
+    """
+    extension = os.path.splitext(output_path)[1]
+    work_dir = tempfile.mkdtemp(
+        prefix=".tramos-", dir=os.path.dirname(os.path.abspath(output_path))
+    )
+    try:
+        if progress is not None:
+            progress.start()
+            progress.duration = progress.duration or duration
+
+        with metrics.stage("segment_split"):
+            pieces = split_at_keyframes(input_path, work_dir, split_times(duration, segments))
+
+        # Mismo reparto de hilos que las conversiones por lotes simultáneas
+        piece_threads = max(1, (threads or os.cpu_count() or 1) // len(pieces))
+        children = _combine_progress(progress, pieces) if progress is not None else None
+        encoded = [os.path.join(work_dir, f"tramo_{i:03d}{extension}") for i in range(len(pieces))]
+        audio_path = os.path.join(work_dir, f"audio{extension}")
+
+        # -t evita que el redondeo al cambiar de fps (``-r``) añada un fotograma por tramo
+        piece_args = [
+            ["-i", piece, *video_args, "-an", "-t", f"{piece_duration:.3f}",
+             "-threads", str(piece_threads), target]
+            for (piece, piece_duration), target in zip(pieces, encoded)
+        ]
+        with ThreadPoolExecutor(max_workers=len(pieces) + 1) as executor:
+            futures = [
+                metrics.run_in_context(
+                    executor,
+                    ffmpeg_utils.run_ffmpeg,
+                    args,
+                    children[i] if children else None,
+                )
+                for i, args in enumerate(piece_args)
+            ]
+            if has_audio:
+                futures.append(
+                    metrics.run_in_context(
+                        executor,
+                        ffmpeg_utils.run_ffmpeg,
+                        ["-i", input_path, "-map", "0:a:0", "-vn", *audio_args, audio_path],
+                    )
+                )
+            for future in futures:
+                future.result()
+
+        concat_list = os.path.join(work_dir, "tramos.txt")
+        with open(concat_list, "w", encoding="utf-8") as f:
+            for path in encoded:
+                escaped = path.replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+
+        args = ["-f", "concat", "-safe", "0", "-i", concat_list]
+        if has_audio:
+            args += ["-i", audio_path, "-map", "0:v:0", "-map", "1:a:0"]
+        with metrics.stage("segment_concat"):
+            ffmpeg_utils.run_ffmpeg(args + ["-c", "copy", output_path])
+
+        if progress is not None:
+            progress.done = True
+            progress.finished_at = time.perf_counter()
+            if progress.on_update is not None:
+                progress.on_update(progress)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
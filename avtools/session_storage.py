@@ -0,0 +1,396 @@
+# -*- coding: utf-8 -*-
+"""
+Almacenamiento temporal de las sesiones con cuotas, caducidad y un conserje en segundo plano.
+
+Cada sesión de Streamlit guarda su copia del archivo subido y sus resultados en
+``SESSION_ROOT/<session_id>``. Antes, esos directorios solo se borraban cuando el
+usuario vaciaba el cargador de archivos: una pestaña cerrada dejaba gigas en
+disco hasta llenarlo. Este módulo:
+
+- Lleva la cuenta de los bytes de cada sesión y aplica una cuota por sesión y
+  otra global al volcar cada archivo subido (``reserve``). Si la global no
+  alcanza, primero se expulsan las sesiones inactivas menos usadas.
+- Ejecuta un conserje (``start_janitor``) que cada minuto borra las sesiones
+  inactivas más antiguas que ``TTL`` y expulsa por LRU mientras el total supere
+  la cuota global. Las sesiones con un trabajo en curso (``holding``) no se tocan.
+- Opcionalmente, coloca en tmpfs (``TRANSCRIPTORAV_TMPFS_ROOT``) las sesiones
+  con archivos pequeños mientras quede espacio; lo demás va a disco.
+- Borra sin bloquear: el directorio se renombra al instante y el conserje lo
+  elimina después, reintentando si algún archivo sigue en uso.
+"""
+
+import contextlib
+import functools
+import os
+import shutil
+import threading
+import time
+import uuid
+
+MB = 1024 * 1024
+
+SESSION_ROOT = os.environ.get(
+    "TRANSCRIPTORAV_SESSION_ROOT", "/tmp/transcriptorav-sessions"
+)
+SESSION_QUOTA_MB = int(os.environ.get("TRANSCRIPTORAV_SESSION_QUOTA_MB", "5120"))
+TOTAL_QUOTA_MB = int(os.environ.get("TRANSCRIPTORAV_STORAGE_QUOTA_MB", "51200"))
+SESSION_TTL_MINUTES = float(os.environ.get("TRANSCRIPTORAV_SESSION_TTL_MINUTES", "120"))
+# tmpfs opcional para los archivos pequeños (por ejemplo, /dev/shm/transcriptorav)
+TMPFS_ROOT = os.environ.get("TRANSCRIPTORAV_TMPFS_ROOT") or None
+TMPFS_MB = int(os.environ.get("TRANSCRIPTORAV_TMPFS_MB", "1024"))
+TMPFS_FILE_MB = int(os.environ.get("TRANSCRIPTORAV_TMPFS_FILE_MB", "100"))
+
+JANITOR_INTERVAL = 60
+
+_TRASH_PREFIX = ".borrar-"
+
+
+class QuotaExceededError(Exception):
+    """Un archivo no cabe en la cuota de la sesión ni en la global."""
+
+
+def _is_session_name(name):
+    # Solo se gestionan directorios con nombre de UUID: la raíz puede ser compartida
+    try:
+        uuid.UUID(name)
+    except ValueError:
+        return False
+    return True
+
+
+def _tree_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class SessionStorage:
+    """Directorios temporales de las sesiones, con cuotas y expulsión TTL/LRU.
+
+    Args:
+        root (str): Directorio en disco de las sesiones.
+        session_quota_mb (int): Máximo por sesión.
+        total_quota_mb (int): Máximo entre todas las sesiones (disco y tmpfs).
+        ttl_minutes (float): Inactividad tras la que se borra una sesión.
+        tmpfs_root (str): Directorio en tmpfs para archivos pequeños, o None.
+        tmpfs_mb (int): Espacio de ``tmpfs_root`` disponible para las sesiones.
+        tmpfs_file_mb (int): Tamaño máximo de un archivo que va a tmpfs.
+    """
+
+    def __init__(
+        self,
+        root=SESSION_ROOT,
+        session_quota_mb=SESSION_QUOTA_MB,
+        total_quota_mb=TOTAL_QUOTA_MB,
+        ttl_minutes=SESSION_TTL_MINUTES,
+        tmpfs_root=TMPFS_ROOT,
+        tmpfs_mb=TMPFS_MB,
+        tmpfs_file_mb=TMPFS_FILE_MB,
+    ):
+        self.root = root
+        self.session_quota = session_quota_mb * MB
+        self.total_quota = total_quota_mb * MB
+        self.ttl = ttl_minutes * 60
+        self.tmpfs_root = tmpfs_root
+        self.tmpfs_capacity = tmpfs_mb * MB
+        self.tmpfs_file_limit = tmpfs_file_mb * MB
+        # Se llaman con cada directorio borrado (p. ej. upload_spool.forget)
+        self.remove_callbacks = []
+        self._last_access = {}
+        # (sesión, archivo) -> directorio elegido por session_dir
+        self._chosen_dirs = {}
+        self._holds = {}
+        self._lock = threading.RLock()
+        self._janitor = None
+
+    def _roots(self):
+        return [r for r in (self.root, self.tmpfs_root) if r]
+
+    def _dirs(self, session_id):
+        return [
+            path
+            for path in (os.path.join(r, str(session_id)) for r in self._roots())
+            if os.path.isdir(path)
+        ]
+
+    def session_dir(self, session_id, size_hint=None, key=None):
+        """Directorio de la sesión para un archivo de ``size_hint`` bytes (se crea si no existe).
+
+        Con tmpfs configurado, los archivos pequeños van a tmpfs mientras quepan;
+        los grandes, o cuando tmpfs está lleno, al directorio en disco.
+
+        Args:
+            key: Identifica el archivo (p. ej. su ``file_id``). La elección se
+                recuerda por sesión y archivo, así que las llamadas siguientes
+                devuelven el mismo directorio aunque el archivo ya volcado en tmpfs
+                cuente ahora en su ocupación.
+        """
+        session_id = str(session_id)
+        self.touch(session_id)
+        if key is not None:
+            with self._lock:
+                path = self._chosen_dirs.get((session_id, key))
+            if path is not None and os.path.isdir(path):
+                return path
+        root = self.root
+        if self.tmpfs_root and size_hint is not None and size_hint <= self.tmpfs_file_limit:
+            # Se cuenta el doble: el archivo subido y lo que se genere a partir de él.
+            # La capacidad se comprueba para cada archivo nuevo, aunque la sesión ya
+            # tenga directorio en tmpfs: si no, uno grande podría llenar la RAM
+            if self.tmpfs_usage() + 2 * size_hint <= self.tmpfs_capacity:
+                root = self.tmpfs_root
+        path = os.path.join(root, session_id)
+        os.makedirs(path, exist_ok=True)
+        if key is not None:
+            with self._lock:
+                self._chosen_dirs[(session_id, key)] = path
+        return path
+
+    def touch(self, session_id):
+        """Marca la sesión como usada ahora (la aleja de la caducidad y del LRU)."""
+        with self._lock:
+            self._last_access[str(session_id)] = time.time()
+
+    def _last_used(self, session_id):
+        with self._lock:
+            last_access = self._last_access.get(session_id)
+        if last_access is not None:
+            return last_access
+        # Sesiones de una ejecución anterior del servidor: la fecha del directorio
+        times = []
+        for path in self._dirs(session_id):
+            try:
+                times.append(os.stat(path).st_mtime)
+            except OSError:
+                pass
+        return max(times, default=0.0)
+
+    @contextlib.contextmanager
+    def hold(self, session_id):
+        """Protege la sesión de la expulsión mientras dura el bloque."""
+        session_id = str(session_id)
+        with self._lock:
+            self._holds[session_id] = self._holds.get(session_id, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._holds[session_id] -= 1
+                if not self._holds[session_id]:
+                    del self._holds[session_id]
+            self.touch(session_id)
+
+    def holding(self, session_id, fn):
+        """``fn`` envuelta en ``hold(session_id)`` (para enviarla al planificador)."""
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with self.hold(session_id):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    def _is_held(self, session_id):
+        with self._lock:
+            return session_id in self._holds
+
+    def sessions(self):
+        """Identificadores de todas las sesiones con directorio en disco o en tmpfs."""
+        found = set()
+        for root in self._roots():
+            try:
+                names = os.listdir(root)
+            except OSError:
+                continue
+            found.update(n for n in names if _is_session_name(n))
+        return found
+
+    def usage(self, session_id):
+        """Bytes que ocupa la sesión (disco y tmpfs)."""
+        return sum(_tree_size(path) for path in self._dirs(str(session_id)))
+
+    def tmpfs_usage(self):
+        if not self.tmpfs_root:
+            return 0
+        return sum(
+            _tree_size(os.path.join(self.tmpfs_root, session_id))
+            for session_id in self.sessions()
+        )
+
+    def total_usage(self):
+        return sum(self.usage(session_id) for session_id in self.sessions())
+
+    def reserve(self, session_id, nbytes):
+        """Comprueba que caben ``nbytes`` más en la sesión, haciendo sitio si hace falta.
+
+        Si la cuota global no alcanza, se expulsan sesiones inactivas (nunca la
+        propia ni las que tienen un trabajo en curso) de la menos a la más usada.
+
+        Raises:
+            QuotaExceededError: Si no caben ni tras expulsar.
+        """
+        session_id = str(session_id)
+        self.touch(session_id)
+        if self.usage(session_id) + nbytes > self.session_quota:
+            raise QuotaExceededError(
+                f"El archivo supera el espacio disponible para la sesión "
+                f"({self.session_quota // MB} MB); borre los archivos anteriores"
+            )
+        if self.total_usage() + nbytes > self.total_quota:
+            self.evict(self.total_quota - nbytes, keep=session_id)
+            if self.total_usage() + nbytes > self.total_quota:
+                raise QuotaExceededError(
+                    "El servidor no tiene espacio temporal suficiente; inténtelo más tarde"
+                )
+
+    def claim(self, session_id, path):
+        """Cuenta en la cuota un archivo ya escrito en la sesión.
+
+        El tamaño de las salidas (y de los enlaces a la caché de resultados) no se
+        conoce hasta tenerlas, así que se comprueban al terminar con ``reserve``:
+        si la sesión supera su cuota, ``path`` se borra.
+
+        Raises:
+            QuotaExceededError: Si el archivo no cabe ni tras expulsar otras sesiones.
+        """
+        try:
+            self.reserve(session_id, 0)
+        except QuotaExceededError:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            raise
+
+    def remove(self, session_id):
+        """Borra los directorios de la sesión sin bloquear.
+
+        El directorio se renombra al instante (la sesión queda vacía) y el borrado
+        real se hace en un hilo aparte o, si algo sigue en uso, en la siguiente
+        pasada del conserje.
+        """
+        session_id = str(session_id)
+        for path in self._dirs(session_id):
+            self.remove_dir(path)
+        with self._lock:
+            self._last_access.pop(session_id, None)
+            for chosen_key in [k for k in self._chosen_dirs if k[0] == session_id]:
+                del self._chosen_dirs[chosen_key]
+
+    def remove_dir(self, path):
+        """Borra sin bloquear un directorio de sesión; las demás rutas se ignoran."""
+        path = os.path.abspath(path)
+        parent, name = os.path.split(path)
+        if not _is_session_name(name) or parent not in map(os.path.abspath, self._roots()):
+            return False
+        trash = os.path.join(parent, f"{_TRASH_PREFIX}{name}-{uuid.uuid4().hex[:8]}")
+        try:
+            os.rename(path, trash)
+        except FileNotFoundError:
+            return False
+        except OSError:
+            # Windows no renombra directorios con archivos abiertos; el conserje lo
+            # borrará cuando la sesión caduque
+            return False
+        with self._lock:
+            for chosen_key in [k for k, v in self._chosen_dirs.items() if v == path]:
+                del self._chosen_dirs[chosen_key]
+        for callback in self.remove_callbacks:
+            callback(path)
+        threading.Thread(
+            target=shutil.rmtree, args=(trash,), kwargs={"ignore_errors": True}, daemon=True
+        ).start()
+        return True
+
+    def evict(self, target_bytes, keep=None):
+        """Expulsa sesiones inactivas, de la menos usada a la más, hasta ocupar ``target_bytes``."""
+        candidates = []
+        total = 0
+        for session_id in self.sessions():
+            size = self.usage(session_id)
+            total += size
+            if session_id != keep and not self._is_held(session_id):
+                candidates.append((self._last_used(session_id), size, session_id))
+        candidates.sort()
+        evicted = []
+        for _, size, session_id in candidates:
+            if total <= target_bytes:
+                break
+            self.remove(session_id)
+            total -= size
+            evicted.append(session_id)
+        return evicted
+
+    def sweep(self, now=None):
+        """Una pasada del conserje: caducidad, cuota global y restos por borrar.
+
+        Returns:
+            list: Sesiones borradas.
+        """
+        now = now or time.time()
+        removed = []
+        for session_id in self.sessions():
+            if self._is_held(session_id):
+                continue
+            if now - self._last_used(session_id) > self.ttl:
+                self.remove(session_id)
+                removed.append(session_id)
+        if self.total_usage() > self.total_quota:
+            removed += self.evict(self.total_quota)
+        self._purge_trash()
+        return removed
+
+    def _purge_trash(self):
+        for root in self._roots():
+            try:
+                names = os.listdir(root)
+            except OSError:
+                continue
+            for name in names:
+                if name.startswith(_TRASH_PREFIX):
+                    shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+    def stats(self):
+        """Sesiones y espacio ocupado frente a las cuotas (en MB)."""
+        sessions = self.sessions()
+        with self._lock:
+            held = len(self._holds)
+        return {
+            "sessions": len(sessions),
+            "busy_sessions": held,
+            "total_mb": round(sum(self.usage(s) for s in sessions) / MB, 1),
+            "total_quota_mb": self.total_quota // MB,
+            "session_quota_mb": self.session_quota // MB,
+            "tmpfs_mb": round(self.tmpfs_usage() / MB, 1) if self.tmpfs_root else None,
+            "ttl_minutes": self.ttl / 60,
+        }
+
+    def _janitor_loop(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"Error al limpiar los archivos temporales de las sesiones: {str(e)}")
+
+    def start_janitor(self, interval=JANITOR_INTERVAL):
+        """Arranca (una sola vez por proceso) el hilo del conserje."""
+        with self._lock:
+            if self._janitor is not None:
+                return
+            self._janitor = threading.Thread(
+                target=self._janitor_loop,
+                args=(interval,),
+                name="session-janitor",
+                daemon=True,
+            )
+            self._janitor.start()
+
+
+# Almacenamiento compartido por todas las sesiones del proceso / Process-wide storage
+default_storage = SessionStorage()
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+Transcripción incremental: los segmentos se entregan a medida que se decodifican.
+
+El archivo se recorre en piezas de hasta 30 segundos (una ventana de Whisper),
+cortando cada pieza en el tramo más silencioso de sus últimos segundos. El texto
+de la pieza anterior se pasa como ``initial_prompt`` para conservar el contexto.
+La transcripción corre fuera del hilo del script de Streamlit (``start`` o el
+planificador de trabajos), de modo que la interfaz puede mostrar y descargar el
+resultado parcial en cualquier momento sin interrumpirla.
+"""
+
+import threading
+
+from avtools import audio_cache
+from avtools import media_probe
+from avtools.chunked_transcription import SAMPLE_RATE, _shift_segment, load_audio_range
+
+# Duración máxima de cada pieza y margen final donde se busca el corte (segundos)
+PIECE_SECONDS = 30.0
+CUT_SEARCH_SECONDS = 5.0
+
+# Tamaño de trama (muestras) para localizar el tramo más silencioso
+_FRAME = SAMPLE_RATE // 50
+
+
+def _quietest_cut(audio, piece_seconds, search_seconds):
+    """Devuelve el índice de muestra de menor energía dentro del margen final de la pieza."""
+    import numpy as np
+
+    start = int((piece_seconds - search_seconds) * SAMPLE_RATE)
+    region = audio[start : int(piece_seconds * SAMPLE_RATE)]
+    frames = region[: region.size // _FRAME * _FRAME].reshape(-1, _FRAME)
+    if frames.size == 0:
+        return audio.size
+    energy = np.square(frames).mean(axis=1)
+    return start + int(np.argmin(energy)) * _FRAME + _FRAME // 2
+
+
+def iter_segments(path, model_name, language, duration=None):
+    """Genera los segmentos de la transcripción de ``path`` con tiempos absolutos."""
+    from avtools import whisper_models
+
+    if duration is None:
+        duration = media_probe.probe(path).duration
+    position = 0.0
+    prompt = None
+    while position < duration - 0.05:
+        length = min(PIECE_SECONDS, duration - position)
+        audio = load_audio_range(path, position, length)
+        if audio.size == 0:
+            break
+        if position + length < duration - 0.05:
+            cut = _quietest_cut(audio, PIECE_SECONDS, CUT_SEARCH_SECONDS)
+        else:
+            cut = audio.size
+        piece_seconds = cut / SAMPLE_RATE
+
+        # El bloqueo del modelo se libera entre piezas para no acaparar el modelo compartido
+        with whisper_models.use_model(model_name) as model:
+            result = model.transcribe(
+                audio[:cut], language=language, initial_prompt=prompt
+            )
+
+        for segment in result["segments"]:
+            segment = dict(segment, end=min(segment["end"], piece_seconds))
+            yield _shift_segment(segment, position)
+
+        prompt = result["text"][-200:] or None
+        position += piece_seconds
+
+
+class TranscriptionStream:
+    """Transcripción en segundo plano con resultados parciales consultables.
+
+    Args:
+        path (str): Ruta del archivo a transcribir.
+        model_name (str): Modelo de Whisper.
+        language (str): Código de idioma.
+        digest (str): SHA-256 del archivo; si su audio ya está en ``audio_cache``,
+            las piezas se leen de allí en lugar de decodificarse.
+    """
+
+    def __init__(self, path, model_name, language, digest=None):
+        self.path = path
+        self.digest = digest
+        self.model_name = model_name
+        self.language = language
+        self.duration = None
+        self.done = False
+        self.error = None
+        self._segments = []
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        """Ejecuta ``run`` en un hilo propio y devuelve la instancia."""
+        self._thread = threading.Thread(
+            target=self.run, name="transcription-stream", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def run(self):
+        """Transcribe el archivo completo en el hilo actual."""
+        try:
+            self.duration = media_probe.probe(self.path).duration
+            # No se decodifica el archivo completo por adelantado: eso retrasaría la
+            # primera pieza. Solo se aprovecha el audio si ya estaba en caché.
+            source = self.path
+            if self.digest and audio_cache.default_cache.peek(self.digest) is not None:
+                source = audio_cache.default_cache.audio_path(self.path, self.digest)
+            for segment in iter_segments(
+                source, self.model_name, self.language, self.duration
+            ):
+                with self._lock:
+                    self._segments.append(segment)
+        except Exception as e:
+            self.error = str(e)
+        finally:
+            self.done = True
+
+    def segments(self):
+        """Copia de los segmentos decodificados hasta ahora."""
+        with self._lock:
+            return list(self._segments)
+
+    def progress(self):
+        """Fracción completada según el fin del último segmento sobre la duración."""
+        if self.done:
+            return 1.0
+        segments = self.segments()
+        if not segments or not self.duration:
+            return 0.0
+        return min(1.0, segments[-1]["end"] / self.duration)
+
+    def result(self):
+        """Resultado en el formato de ``model.transcribe`` con lo decodificado hasta ahora."""
+        segments = self.segments()
+        for i, segment in enumerate(segments):
+            segment["id"] = i
+        return {
+            "text": "".join(segment["text"] for segment in segments),
+            "segments": segments,
+            "language": self.language,
+        }
@@ -0,0 +1,383 @@
+# -*- coding: utf-8 -*-
+"""
+Almacén compacto de segmentos de transcripción y generación bajo demanda de sus formatos.
+
+Antes, cada transcripción escribía en disco los cinco formatos del CLI de Whisper
+(json, srt, tsv, txt y vtt) y los comprimía, aunque casi siempre se quería uno
+solo. Ahora el resultado se guarda una vez como ``SegmentStore``: inicios, fines
+y desplazamientos del texto en arreglos (``array``) sobre una sola cadena, más
+los tokens y las palabras con sus tiempos si el modelo los devolvió. Cada
+formato se genera solo al descargarlo, con las opciones elegidas (ancho máximo
+de línea, párrafos unidos), sin volver a ejecutar el modelo.
+
+Varias transcripciones con nombre se guardan juntas en un archivo
+``.transcripts``: una línea mágica, una cabecera JSON y los arreglos en binario.
+"""
+
+import io
+import json
+import os
+import struct
+import sys
+import textwrap
+import zipfile
+from array import array
+
+FORMATS = ("txt", "srt", "vtt", "tsv", "json")
+
+BUNDLE_EXTENSION = ".transcripts"
+
+# Pausa mínima (segundos) entre dos segmentos para empezar un párrafo nuevo
+PARAGRAPH_GAP = 1.5
+
+_MAGIC = b"TAVSEG1\n"
+
+
+def _offsets(pieces):
+    offsets = array("q", [0])
+    for piece in pieces:
+        offsets.append(offsets[-1] + len(piece))
+    return offsets
+
+
+class SegmentStore:
+    """Segmentos de una transcripción guardados en arreglos.
+
+    Se construye con ``from_segments`` o ``from_result``; la iteración devuelve
+    cada segmento como el diccionario de ``model.transcribe``.
+
+    Atributos públicos: ``language``, ``starts``, ``ends`` y ``text`` (el texto de
+    todos los segmentos seguido; ``text_offsets`` marca dónde empieza cada uno).
+    ``tokens`` y ``words`` son None si los segmentos no los traían.
+    """
+
+    def __init__(self, language=None):
+        self.language = language
+        self.starts = array("d")
+        self.ends = array("d")
+        self.text = ""
+        self.text_offsets = array("q", [0])
+        # Tokens: ids seguidos y, por segmento, dónde empiezan
+        self.tokens = None
+        self.token_offsets = None
+        # Palabras: tiempos, probabilidad y texto seguidos, y por segmento dónde empiezan
+        self.words = None
+
+    @classmethod
+    def from_segments(cls, segments, language=None):
+        store = cls(language)
+        texts = [segment["text"] for segment in segments]
+        store.starts = array("d", (segment["start"] for segment in segments))
+        store.ends = array("d", (segment["end"] for segment in segments))
+        store.text = "".join(texts)
+        store.text_offsets = _offsets(texts)
+
+        if segments and all("tokens" in segment for segment in segments):
+            store.tokens = array("q")
+            for segment in segments:
+                store.tokens.extend(segment["tokens"])
+            store.token_offsets = _offsets([segment["tokens"] for segment in segments])
+
+        if segments and any(segment.get("words") for segment in segments):
+            words = [segment.get("words") or [] for segment in segments]
+            flat = [word for segment_words in words for word in segment_words]
+            store.words = {
+                "starts": array("d", (w["start"] for w in flat)),
+                "ends": array("d", (w["end"] for w in flat)),
+                "probabilities": array("d", (w.get("probability", 0.0) for w in flat)),
+                "text": "".join(w["word"] for w in flat),
+                "text_offsets": _offsets([w["word"] for w in flat]),
+                "offsets": _offsets(words),
+            }
+        return store
+
+    @classmethod
+    def from_result(cls, result):
+        """Almacén a partir del resultado de ``model.transcribe``."""
+        return cls.from_segments(result["segments"], result.get("language"))
+
+    def __len__(self):
+        return len(self.starts)
+
+    def segment_text(self, i):
+        return self.text[self.text_offsets[i] : self.text_offsets[i + 1]]
+
+    def segment_words(self, i):
+        if self.words is None:
+            return []
+        w = self.words
+        return [
+            {
+                "word": w["text"][w["text_offsets"][j] : w["text_offsets"][j + 1]],
+                "start": w["starts"][j],
+                "end": w["ends"][j],
+                "probability": w["probabilities"][j],
+            }
+            for j in range(w["offsets"][i], w["offsets"][i + 1])
+        ]
+
+    def segment(self, i):
+        segment = {
+            "id": i,
+            "start": self.starts[i],
+            "end": self.ends[i],
+            "text": self.segment_text(i),
+        }
+        if self.tokens is not None:
+            segment["tokens"] = self.tokens[
+                self.token_offsets[i] : self.token_offsets[i + 1]
+            ].tolist()
+        if self.words is not None:
+            segment["words"] = self.segment_words(i)
+        return segment
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.segment(i)
+
+    def to_result(self):
+        """Resultado en el formato de ``model.transcribe`` (sin las métricas de decodificación)."""
+        return {"text": self.text, "segments": list(self), "language": self.language}
+
+    def paragraphs(self, gap=PARAGRAPH_GAP):
+        """Nuevo almacén con los segmentos unidos en párrafos.
+
+        Un párrafo termina cuando la pausa hasta el siguiente segmento llega a ``gap``
+        segundos.
+        """
+        groups = []
+        for i in range(len(self)):
+            if groups and self.starts[i] - self.ends[i - 1] < gap:
+                groups[-1].append(i)
+            else:
+                groups.append([i])
+
+        merged = []
+        for group in groups:
+            segment = {
+                "start": self.starts[group[0]],
+                "end": self.ends[group[-1]],
+                "text": " " + " ".join(self.segment_text(i).strip() for i in group),
+            }
+            if self.tokens is not None:
+                segment["tokens"] = [
+                    t for i in group for t in self.tokens[self.token_offsets[i] : self.token_offsets[i + 1]]
+                ]
+            if self.words is not None:
+                segment["words"] = [w for i in group for w in self.segment_words(i)]
+            merged.append(segment)
+        return SegmentStore.from_segments(merged, self.language)
+
+
+def format_timestamp(seconds, always_include_hours=True, decimal_marker=","):
+    """Formatea segundos como HH:MM:SS,mmm (SRT) o [HH:]MM:SS.mmm (VTT)."""
+    milliseconds = int(round(seconds * 1000))
+    hours, milliseconds = divmod(milliseconds, 3_600_000)
+    minutes, milliseconds = divmod(milliseconds, 60_000)
+    secs, milliseconds = divmod(milliseconds, 1000)
+    hours_marker = f"{hours:02d}:" if always_include_hours or hours > 0 else ""
+    return f"{hours_marker}{minutes:02d}:{secs:02d}{decimal_marker}{milliseconds:03d}"
+
+
+def _wrap(text, max_line_width):
+    if not max_line_width:
+        return text
+    # Las palabras más largas que el ancho quedan en su propia línea, sin partir
+    lines = textwrap.wrap(
+        text, max_line_width, break_long_words=False, break_on_hyphens=False
+    )
+    return "\n".join(lines) or text
+
+
+def _cues(store, max_line_width):
+    for i in range(len(store)):
+        text = store.segment_text(i).strip().replace("-->", "->")
+        yield store.starts[i], store.ends[i], _wrap(text, max_line_width)
+
+
+def render(store, output_format, max_line_width=None, paragraphs=False):
+    """Genera el texto de ``store`` en ``output_format`` (mismo formato que el CLI de Whisper).
+
+    Args:
+        store (SegmentStore): Transcripción.
+        output_format (str): Uno de ``FORMATS``.
+        max_line_width (int): Ancho máximo de línea de txt, srt y vtt (None = sin límite).
+        paragraphs (bool): Unir los segmentos en párrafos (ver ``SegmentStore.paragraphs``).
+
+    Returns:
+        str: El contenido del archivo.
+
+    Raises:
+        ValueError: Si el formato no existe.
+    """
+    if paragraphs:
+        store = store.paragraphs()
+    if output_format == "txt":
+        separator = "\n\n" if paragraphs else "\n"
+        return "".join(
+            _wrap(store.segment_text(i).strip(), max_line_width) + separator
+            for i in range(len(store))
+        )
+    if output_format == "srt":
+        return "".join(
+            f"{i}\n{format_timestamp(start)} --> {format_timestamp(end)}\n{text}\n\n"
+            for i, (start, end, text) in enumerate(_cues(store, max_line_width), start=1)
+        )
+    if output_format == "vtt":
+        return "WEBVTT\n\n" + "".join(
+            f"{format_timestamp(start, False, '.')} --> {format_timestamp(end, False, '.')}\n{text}\n\n"
+            for start, end, text in _cues(store, max_line_width)
+        )
+    if output_format == "tsv":
+        return "start\tend\ttext\n" + "".join(
+            f"{round(1000 * store.starts[i])}\t{round(1000 * store.ends[i])}\t"
+            f"{store.segment_text(i).strip().replace(chr(9), ' ')}\n"
+            for i in range(len(store))
+        )
+    if output_format == "json":
+        return json.dumps(store.to_result(), ensure_ascii=False)
+    raise ValueError(f"Formato de transcripción desconocido: {output_format}")
+
+
+def zip_bytes(bundle, formats, max_line_width=None, paragraphs=False):
+    """Zip en memoria con cada transcripción de ``bundle`` en cada uno de ``formats``.
+
+    Args:
+        bundle (dict): Nombre -> ``SegmentStore``; los archivos son ``nombre.formato``.
+    """
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zipf:
+        for name, store in bundle.items():
+            for output_format in formats:
+                zipf.writestr(
+                    f"{name}.{output_format}",
+                    render(store, output_format, max_line_width, paragraphs),
+                )
+    return buffer.getvalue()
+
+
+# Arreglos de un almacén en el orden en que se escriben: (campo, arreglo)
+def _store_arrays(store):
+    fields = [
+        ("starts", store.starts),
+        ("ends", store.ends),
+        ("text_offsets", store.text_offsets),
+    ]
+    if store.tokens is not None:
+        fields += [("tokens", store.tokens), ("token_offsets", store.token_offsets)]
+    if store.words is not None:
+        fields += [
+            (f"words.{key}", store.words[key])
+            for key in ("starts", "ends", "probabilities", "text_offsets", "offsets")
+        ]
+    return fields
+
+
+def unique_names(names):
+    """Nombres de transcripción sin repetidos (``a.mp3`` y ``a.wav`` darían ``a`` dos veces).
+
+    El primero se conserva y los siguientes reciben ``_2``, ``_3``... sin chocar
+    con ningún otro nombre de la lista.
+    """
+    taken = set(names)
+    seen = set()
+    result = []
+    for name in names:
+        unique = name
+        n = 2
+        while unique in seen or (unique != name and unique in taken):
+            unique = f"{name}_{n}"
+            n += 1
+        seen.add(unique)
+        result.append(unique)
+    return result
+
+
+def save_bundle(path, bundle):
+    """Guarda varias transcripciones con nombre en ``path`` (se escribe y se renombra).
+
+    Args:
+        bundle (dict): Nombre -> ``SegmentStore``.
+    """
+    header = []
+    blobs = []
+    for name, store in bundle.items():
+        entry = {"name": name, "language": store.language, "arrays": [], "texts": []}
+        for field, values in _store_arrays(store):
+            if sys.byteorder != "little":
+                values = array(values.typecode, values)
+                values.byteswap()
+            data = values.tobytes()
+            entry["arrays"].append([field, values.typecode, len(data)])
+            blobs.append(data)
+        texts = [("text", store.text)]
+        if store.words is not None:
+            texts.append(("words.text", store.words["text"]))
+        for field, text in texts:
+            data = text.encode("utf-8")
+            entry["texts"].append([field, len(data)])
+            blobs.append(data)
+        header.append(entry)
+
+    header_bytes = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    partial = f"{path}.part"
+    with open(partial, "wb") as f:
+        f.write(_MAGIC)
+        f.write(struct.pack("<I", len(header_bytes)))
+        f.write(header_bytes)
+        for data in blobs:
+            f.write(data)
+    os.replace(partial, path)
+
+
+def _read_header(f, path):
+    if f.read(len(_MAGIC)) != _MAGIC:
+        raise ValueError(f"{path} no es un archivo de transcripciones")
+    (header_size,) = struct.unpack("<I", f.read(4))
+    return json.loads(f.read(header_size).decode("utf-8"))
+
+
+def bundle_names(path):
+    """Nombres de las transcripciones de ``path`` (solo lee la cabecera)."""
+    with open(path, "rb") as f:
+        return [entry["name"] for entry in _read_header(f, path)]
+
+
+def load_bundle(path):
+    """Lee un archivo de ``save_bundle``.
+
+    Returns:
+        dict: Nombre -> ``SegmentStore``, en el orden en que se guardaron.
+
+    Raises:
+        ValueError: Si el archivo no es un ``.transcripts`` válido.
+    """
+    with open(path, "rb") as f:
+        header = _read_header(f, path)
+
+        bundle = {}
+        for entry in header:
+            fields = {}
+            for field, typecode, size in entry["arrays"]:
+                values = array(typecode)
+                values.frombytes(f.read(size))
+                if sys.byteorder != "little":
+                    values.byteswap()
+                fields[field] = values
+            for field, size in entry["texts"]:
+                fields[field] = f.read(size).decode("utf-8")
+
+            store = SegmentStore(entry["language"])
+            store.starts = fields["starts"]
+            store.ends = fields["ends"]
+            store.text = fields["text"]
+            store.text_offsets = fields["text_offsets"]
+            store.tokens = fields.get("tokens")
+            store.token_offsets = fields.get("token_offsets")
+            if "words.text" in fields:
+                store.words = {
+                    key: fields[f"words.{key}"]
+                    for key in ("starts", "ends", "probabilities", "text", "text_offsets", "offsets")
+                }
+            bundle[entry["name"]] = store
+    return bundle
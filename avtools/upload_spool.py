@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+Volcado a disco de los archivos subidos, una sola vez por sesión y archivo.
+
+Streamlit ya mantiene cada archivo subido en memoria; escribirlo de nuevo en cada
+botón pulsado duplicaba el trabajo y, con ``getbuffer()``, el pico de memoria.
+``spool_upload`` copia el archivo por bloques la primera vez que una sesión lo
+necesita y las tareas siguientes (y las recargas de la página) reutilizan la
+misma ruta mientras el identificador del archivo no cambie.
+
+Los directorios de sesión y sus cuotas los gestiona ``session_storage``.
+"""
+
+import os
+import shutil
+import sqlite3
+import threading
+
+from avtools import media_probe
+from avtools import metrics
+from avtools import session_storage
+
+_BLOCK_SIZE = 1024 * 1024
+
+# (directorio de sesión, file_id) -> ruta del archivo volcado
+_spooled = {}
+_spooled_lock = threading.Lock()
+
+
+def session_dir(session_id, size_hint=None, key=None):
+    """Directorio temporal de una sesión (se crea si no existe).
+
+    Args:
+        size_hint (int): Tamaño del archivo que se va a procesar; los pequeños
+            pueden ir a tmpfs (ver ``session_storage``).
+        key: Identificador del archivo; el mismo archivo recibe siempre el mismo
+            directorio.
+    """
+    return session_storage.default_storage.session_dir(session_id, size_hint, key)
+
+
+def upload_dir(session_id, *uploaded_files):
+    """Directorio de la sesión para procesar ``uploaded_files`` (siempre el mismo para ellos)."""
+    return session_dir(
+        session_id,
+        sum(f.size for f in uploaded_files),
+        tuple(getattr(f, "file_id", None) or f.name for f in uploaded_files),
+    )
+
+
+def _claim_path(directory, uploaded_file):
+    """Ruta de ``uploaded_file`` en ``directory``, sin pisar la de otro archivo subido.
+
+    Dos archivos con el mismo nombre en una sesión reciben ``nombre_2.ext``,
+    ``nombre_3.ext``...
+
+    Returns:
+        tuple: ``(ruta, ya_asignada)``; ``ya_asignada`` indica que la ruta es de
+        este mismo archivo desde una llamada anterior.
+    """
+    file_id = getattr(uploaded_file, "file_id", None)
+    memo_key = (directory, file_id)
+    with _spooled_lock:
+        if file_id is not None and memo_key in _spooled:
+            return _spooled[memo_key], True
+        taken = {p for (d, _), p in _spooled.items() if d == directory}
+        stem, extension = os.path.splitext(uploaded_file.name)
+        path = os.path.join(directory, uploaded_file.name)
+        n = 2
+        while path in taken:
+            path = os.path.join(directory, f"{stem}_{n}{extension}")
+            n += 1
+        if file_id is not None:
+            _spooled[memo_key] = path
+    return path, False
+
+
+def spool_upload(uploaded_file, directory):
+    """Devuelve la ruta en disco de ``uploaded_file``, escribiéndolo solo si hace falta.
+
+    Args:
+        uploaded_file: Archivo subido con Streamlit (``UploadedFile``).
+        directory (str): Directorio de la sesión.
+
+    Returns:
+        str: Ruta del archivo dentro de ``directory`` (con sufijo ``_2``, ``_3``...
+        si otro archivo de la sesión ya usa ese nombre).
+
+    Raises:
+        OSError: Si no se puede escribir el archivo.
+        session_storage.QuotaExceededError: Si el archivo no cabe en la cuota.
+    """
+    metrics.add_bytes(bytes_in=uploaded_file.size)
+    path, claimed_before = _claim_path(directory, uploaded_file)
+    if claimed_before and os.path.exists(path) and os.path.getsize(path) == uploaded_file.size:
+        return path
+
+    session_storage.default_storage.reserve(os.path.basename(directory), uploaded_file.size)
+
+    # Se escribe con otro nombre y se renombra, para que una tarea en curso de la
+    # misma sesión nunca lea un archivo a medio copiar
+    partial = f"{path}.upload"
+    uploaded_file.seek(0)
+    try:
+        with metrics.stage("upload_write"), open(partial, "wb") as f:
+            shutil.copyfileobj(uploaded_file, f, _BLOCK_SIZE)
+        os.replace(partial, path)
+    finally:
+        uploaded_file.seek(0)
+        if os.path.exists(partial):
+            os.remove(partial)
+    return path
+
+
+def forget(directory):
+    """Olvida los archivos volcados en ``directory`` (por ejemplo, tras borrarlo)."""
+    with _spooled_lock:
+        for memo_key in [k for k in _spooled if k[0] == directory]:
+            del _spooled[memo_key]
+    # Sus metadatos en la caché de ffprobe tampoco volverán a usarse
+    try:
+        media_probe.default_cache.forget_dir(directory)
+    except (sqlite3.Error, OSError) as e:
+        print(f"No se pudo limpiar la caché de metadatos de {directory}: {str(e)}")
+
+
+session_storage.default_storage.remove_callbacks.append(forget)
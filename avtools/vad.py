@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""
+Detección de actividad de voz (VAD) antes de transcribir.
+
+Las grabaciones de clases y reuniones suelen tener largos tramos de silencio o
+música. Whisper procesa igualmente esas ventanas (y a veces inventa texto en
+ellas), así que se detectan los tramos con voz, se transcribe solo el audio
+concatenado de esos tramos y los tiempos del resultado se devuelven a la línea
+de tiempo original.
+
+El detector por defecto (``energy``) usa la energía y la tasa de cruces por cero
+de tramas de 30 ms, calculadas de forma vectorizada con NumPy. Pueden
+registrarse otros detectores con ``register_backend``; si el paquete
+``silero-vad`` está instalado, queda disponible como ``silero``.
+"""
+
+import bisect
+
+SAMPLE_RATE = 16000
+
+FRAME_SECONDS = 0.03
+
+# Margen (dB) sobre el ruido de fondo estimado para considerar una trama como voz
+ENERGY_MARGIN_DB = 12.0
+
+# Energía mínima absoluta (dBFS) de una trama con voz
+MIN_ENERGY_DB = -50.0
+
+# Tasa de cruces por cero por encima de la cual una trama se considera ruido
+MAX_ZCR = 0.45
+
+MIN_SPEECH_SECONDS = 0.25
+MIN_SILENCE_SECONDS = 0.5
+SPEECH_PAD_SECONDS = 0.2
+
+
+def energy_zcr_regions(audio, sample_rate=SAMPLE_RATE):
+    """Tramos con voz según la energía y los cruces por cero de cada trama.
+
+    Args:
+        audio (np.ndarray): Audio mono float32.
+        sample_rate (int): Frecuencia de muestreo.
+
+    Returns:
+        list: Tuplas (inicio, fin) en segundos, sin solaparse y ordenadas.
+    """
+    import numpy as np
+
+    frame = int(FRAME_SECONDS * sample_rate)
+    n_frames = len(audio) // frame
+    if n_frames == 0:
+        return []
+    frames = np.asarray(audio[: n_frames * frame], dtype=np.float32).reshape(n_frames, frame)
+
+    energy_db = 10 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+    signs = np.signbit(frames)
+    zcr = np.mean(signs[:, 1:] != signs[:, :-1], axis=1)
+
+    noise_floor = np.percentile(energy_db, 10)
+    threshold = max(noise_floor + ENERGY_MARGIN_DB, MIN_ENERGY_DB)
+    speech = (energy_db > threshold) & (zcr < MAX_ZCR)
+
+    # Bordes de las rachas de tramas con voz
+    edges = np.diff(np.concatenate(([0], speech.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1) * FRAME_SECONDS
+    ends = np.flatnonzero(edges == -1) * FRAME_SECONDS
+    return smooth_regions(list(zip(starts, ends)), len(audio) / sample_rate)
+
+
+def smooth_regions(
+    regions,
+    duration,
+    min_speech=MIN_SPEECH_SECONDS,
+    min_silence=MIN_SILENCE_SECONDS,
+    pad=SPEECH_PAD_SECONDS,
+):
+    """Une los tramos separados por silencios cortos, descarta los muy breves y añade margen."""
+    merged = []
+    for start, end in regions:
+        if merged and start - merged[-1][1] < min_silence:
+            merged[-1][1] = end
+        else:
+            merged.append([start, end])
+
+    padded = []
+    for start, end in merged:
+        if end - start < min_speech:
+            continue
+        start, end = max(0.0, start - pad), min(duration, end + pad)
+        if padded and start <= padded[-1][1]:
+            padded[-1] = (padded[-1][0], end)
+        else:
+            padded.append((float(start), float(end)))
+    return padded
+
+
+def _silero_regions(audio, sample_rate=SAMPLE_RATE):
+    import torch
+    from silero_vad import get_speech_timestamps, load_silero_vad
+
+    timestamps = get_speech_timestamps(
+        torch.from_numpy(audio.copy()),
+        load_silero_vad(),
+        sampling_rate=sample_rate,
+        return_seconds=True,
+    )
+    return [(t["start"], t["end"]) for t in timestamps]
+
+
+BACKENDS = {
+    "energy": energy_zcr_regions,
+    "silero": _silero_regions,
+}
+
+
+def register_backend(name, detector):
+    """Registra un detector ``detector(audio, sample_rate) -> [(inicio, fin), ...]``."""
+    BACKENDS[name] = detector
+
+
+def detect_speech(audio, backend="energy", sample_rate=SAMPLE_RATE):
+    """Tramos con voz de ``audio`` según el detector ``backend``."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Detector de voz desconocido: {backend}")
+    return BACKENDS[backend](audio, sample_rate)
+
+
+class TimelineMap:
+    """Correspondencia entre el audio concatenado de los tramos con voz y el original.
+
+    Args:
+        regions (list): Tramos (inicio, fin) del audio original, en segundos.
+    """
+
+    def __init__(self, regions):
+        self.regions = list(regions)
+        self._offsets = []
+        position = 0.0
+        for start, end in self.regions:
+            self._offsets.append(position)
+            position += end - start
+        self.speech_seconds = position
+
+    def to_original(self, seconds, is_end=False):
+        """Convierte un instante del audio concatenado al instante del audio original.
+
+        Un fin que cae justo en la unión de dos tramos se asigna al tramo anterior.
+        """
+        if not self.regions:
+            return seconds
+        if is_end:
+            index = bisect.bisect_left(self._offsets, seconds) - 1
+        else:
+            index = bisect.bisect_right(self._offsets, seconds) - 1
+        index = min(max(index, 0), len(self.regions) - 1)
+        start, end = self.regions[index]
+        return min(start + seconds - self._offsets[index], end)
+
+    def remap_segment(self, segment):
+        segment = dict(segment)
+        segment["start"] = self.to_original(segment["start"])
+        segment["end"] = self.to_original(segment["end"], is_end=True)
+        if segment.get("words"):
+            segment["words"] = [
+                dict(
+                    w,
+                    start=self.to_original(w["start"]),
+                    end=self.to_original(w["end"], is_end=True),
+                )
+                for w in segment["words"]
+            ]
+        return segment
+
+
+def speech_only(audio, regions, sample_rate=SAMPLE_RATE):
+    """Concatena los tramos con voz de ``audio`` y devuelve (audio, ``TimelineMap``)."""
+    import numpy as np
+
+    pieces = [
+        np.asarray(audio[int(start * sample_rate) : int(end * sample_rate)])
+        for start, end in regions
+    ]
+    speech = np.concatenate(pieces) if pieces else np.zeros(0, dtype=np.float32)
+    # Los límites se recalculan con las muestras reales para que el mapa sea exacto
+    exact = []
+    for (start, _), piece in zip(regions, pieces):
+        first = int(start * sample_rate) / sample_rate
+        exact.append((first, first + len(piece) / sample_rate))
+    return speech, TimelineMap(exact)
+
+
+def transcribe_speech(model, audio, backend="energy", **transcribe_options):
+    """Transcribe solo los tramos con voz de ``audio`` con tiempos del audio original.
+
+    Args:
+        model: Modelo de Whisper cargado.
+        audio (np.ndarray): Audio a 16 kHz mono float32.
+        backend (str): Detector de voz registrado en ``BACKENDS``.
+        **transcribe_options: Opciones para ``model.transcribe``.
+
+    Returns:
+        dict: Resultado tipo ``transcribe`` con la clave adicional ``speech_ratio``
+        (fracción del audio que se llegó a transcribir).
+    """
+    regions = detect_speech(audio, backend)
+    total_seconds = len(audio) / SAMPLE_RATE
+    language = transcribe_options.get("language")
+    if not regions:
+        return {"text": "", "segments": [], "language": language, "speech_ratio": 0.0}
+
+    speech, timeline = speech_only(audio, regions)
+    result = model.transcribe(speech, **transcribe_options)
+    result["segments"] = [timeline.remap_segment(s) for s in result["segments"]]
+    result["speech_ratio"] = timeline.speech_seconds / total_seconds if total_seconds else 0.0
+    return result
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+Compresión de video con FFmpeg a una tasa de bits objetivo.
+"""
+
+from avtools import ffmpeg_utils
+from avtools import media_probe
+from avtools import segment_encode
+
+# Tasa de bits de video según el nivel de compresión elegido en la interfaz
+COMPRESSION_BITRATES = {
+    "bajo": "2000k",
+    "medio": "1000k",
+    "alto": "500k",
+}
+
+
+def bitrate_for_level(compression_level):
+    """Tasa de bits del nivel ``compression_level`` (cualquier otro valor = "alto")."""
+    return COMPRESSION_BITRATES.get(compression_level, COMPRESSION_BITRATES["alto"])
+
+
+def build_video_args(bitrate):
+    return ["-b:v", bitrate, "-bufsize", bitrate]
+
+
+def build_compress_args(input_path, output_path, bitrate):
+    return ["-i", input_path, *build_video_args(bitrate), output_path]
+
+
+def compress_video(input_path, output_path, bitrate, progress=None, segments=1):
+    """Recodifica ``input_path`` a ``bitrate`` con los códecs por defecto del contenedor.
+
+    Args:
+        progress (FfmpegProgress): Recibe el progreso de FFmpeg.
+        segments (int): Si es mayor que 1 y el video es lo bastante largo, se
+            codifica por tramos simultáneos (ver ``segment_encode``).
+
+    Raises:
+        subprocess.CalledProcessError: Si FFmpeg falla.
+    """
+    if segments > 1:
+        info = media_probe.probe(input_path)
+        segments = segment_encode.segment_count(info.duration, segments)
+        if segments > 1:
+            # El audio se codifica con el códec por defecto del contenedor, como en un solo proceso
+            segment_encode.encode_in_segments(
+                input_path,
+                output_path,
+                build_video_args(bitrate),
+                [],
+                segments,
+                info.duration,
+                has_audio=info.has_audio,
+                progress=progress,
+            )
+            return
+    ffmpeg_utils.run_ffmpeg(
+        build_compress_args(input_path, output_path, bitrate), progress
+    )
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+Cambio de resolución con un grafo de filtros de FFmpeg.
+
+El escalado, el relleno y la codificación ocurren dentro de FFmpeg; ningún
+fotograma pasa por Python. La relación de aspecto se conserva igual que en la
+conversión para reproductores de carro: se escala hasta caber en el tamaño pedido
+y se rellena con bandas negras centradas.
+"""
+
+import os
+
+from avtools import ffmpeg_utils
+from avtools import media_probe
+
+# Algoritmos de escalado de FFmpeg (swscale) ofrecidos en la interfaz
+SCALERS = ("bicubic", "bilinear", "lanczos", "area", "fast_bilinear")
+
+# Presets de x264, del más rápido al más lento
+X264_PRESETS = (
+    "ultrafast",
+    "superfast",
+    "veryfast",
+    "faster",
+    "fast",
+    "medium",
+    "slow",
+    "slower",
+    "veryslow",
+)
+
+
+def resize_filter(width, height, scaler="bicubic"):
+    """Filtro que escala dentro de ``width``x``height`` y rellena el resto con negro."""
+    return (
+        f"scale={width}:{height}:force_original_aspect_ratio=decrease"
+        f":force_divisible_by=2:flags={scaler},"
+        f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1"
+    )
+
+
+def output_extension(input_path):
+    """Extensión de salida: la del original, salvo contenedores que no admiten H.264."""
+    extension = os.path.splitext(input_path)[1].lower()
+    return ".mp4" if extension in ffmpeg_utils.NON_H264_CONTAINERS else extension
+
+
+def build_resize_args(
+    input_path,
+    output_path,
+    width,
+    height,
+    scaler="bicubic",
+    preset="medium",
+    threads=0,
+    audio_codec=None,
+):
+    """Argumentos de FFmpeg para cambiar la resolución de ``input_path``.
+
+    Args:
+        audio_codec (str): Códec de audio del original; si el contenedor de salida
+            lo admite se copia sin recodificar, si no se convierte a AAC.
+        threads (int): Hilos de x264 (0 = automático).
+    """
+    args = [
+        "-i",
+        input_path,
+        "-vf",
+        resize_filter(width, height, scaler),
+        "-c:v",
+        "libx264",
+        "-preset",
+        preset,
+        "-threads",
+        str(threads),
+    ]
+    extension = os.path.splitext(output_path)[1]
+    if audio_codec is None:
+        args += ["-an"]
+    elif ffmpeg_utils.can_copy_audio(audio_codec, extension):
+        args += ["-c:a", "copy"]
+    else:
+        args += ["-c:a", "aac", "-b:a", "128k"]
+    return args + [output_path]
+
+
+def resize_video(
+    input_path,
+    output_path,
+    width,
+    height,
+    scaler="bicubic",
+    preset="medium",
+    threads=0,
+    progress=None,
+):
+    """Cambia la resolución de ``input_path`` y escribe el resultado en ``output_path``.
+
+    Args:
+        progress (FfmpegProgress): Recibe el progreso de FFmpeg.
+    """
+    info = media_probe.probe(input_path)
+    audio_codec = info.audio_codec
+    if progress is not None and progress.duration is None:
+        progress.duration = info.duration
+    ffmpeg_utils.run_ffmpeg(
+        build_resize_args(
+            input_path,
+            output_path,
+            width,
+            height,
+            scaler,
+            preset,
+            threads,
+            audio_codec,
+        ),
+        progress,
+    )
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+Registro de modelos de Whisper residentes en memoria.
+
+Cargar un modelo desde disco tarda más que transcribir un clip corto, así que el
+registro mantiene los modelos cargados durante toda la vida del proceso, con
+expulsión LRU cuando se supera el presupuesto de RAM configurado.
+
+Uso:
+    with use_model("small") as model:
+        result = model.transcribe(path, language="es")
+
+El modelo queda bloqueado mientras dura el bloque ``with``: los hooks de caché
+KV que Whisper instala durante la decodificación no admiten dos decodificaciones
+simultáneas sobre la misma instancia.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# Presupuesto de RAM para modelos residentes (MB) / RAM budget for resident models (MB)
+DEFAULT_RAM_BUDGET_MB = int(os.environ.get("TRANSCRIPTORAV_MODELS_RAM_MB", "4096"))
+
+# Tamaño aproximado en memoria (MB, fp32) para decidir expulsiones antes de cargar
+APPROX_MODEL_MB = {
+    "tiny": 151,
+    "base": 290,
+    "small": 967,
+    "medium": 3055,
+    "large": 6170,
+}
+
+
+class _ModelEntry:
+    __slots__ = ("model", "lock", "size_bytes", "users")
+
+    def __init__(self, model, size_bytes):
+        self.model = model
+        self.lock = threading.Lock()
+        self.size_bytes = size_bytes
+        self.users = 0
+
+
+def _model_size_bytes(model):
+    """Calcula los bytes ocupados por los parámetros y buffers de un modelo."""
+    total = 0
+    for tensor in list(model.parameters()) + list(model.buffers()):
+        total += tensor.numel() * tensor.element_size()
+    return total
+
+
+class ModelRegistry:
+    """Caché LRU de modelos de Whisper compartida por todo el proceso.
+
+    Args:
+        ram_budget_mb (int): Memoria máxima que pueden ocupar los modelos residentes.
+            Es un límite blando: si todos los modelos están en uso se carga igualmente.
+        device (str): Dispositivo donde cargar los modelos (None = automático).
+    """
+
+    def __init__(self, ram_budget_mb=DEFAULT_RAM_BUDGET_MB, device=None):
+        self.ram_budget_bytes = ram_budget_mb * 1024 * 1024
+        self.device = device
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self._warming = set()
+
+    def _load_lock(self, name):
+        with self._lock:
+            if name not in self._load_locks:
+                self._load_locks[name] = threading.Lock()
+            return self._load_locks[name]
+
+    def _used_bytes(self):
+        return sum(entry.size_bytes for entry in self._entries.values())
+
+    def _evict_for(self, incoming_bytes):
+        """Expulsa modelos sin usuarios, del menos al más reciente, hasta que quepa el nuevo."""
+        for name in list(self._entries):
+            if self._used_bytes() + incoming_bytes <= self.ram_budget_bytes:
+                break
+            entry = self._entries[name]
+            if entry.users == 0:
+                del self._entries[name]
+                print(f"Modelo de Whisper '{name}' expulsado de memoria.")
+
+    def _acquire_entry(self, name):
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None:
+                self._entries.move_to_end(name)
+                entry.users += 1
+                return entry
+
+        # Un solo hilo carga cada modelo; el resto espera y reutiliza el resultado
+        with self._load_lock(name):
+            with self._lock:
+                entry = self._entries.get(name)
+                if entry is not None:
+                    self._entries.move_to_end(name)
+                    entry.users += 1
+                    return entry
+                self._evict_for(APPROX_MODEL_MB.get(name, 0) * 1024 * 1024)
+
+            import whisper
+
+            print(f"Cargando modelo de Whisper '{name}'...")
+            model = whisper.load_model(name, device=self.device)
+            entry = _ModelEntry(model, _model_size_bytes(model))
+
+            with self._lock:
+                self._evict_for(entry.size_bytes)
+                self._entries[name] = entry
+                entry.users += 1
+                return entry
+
+    def _release_entry(self, entry):
+        with self._lock:
+            entry.users -= 1
+
+    @contextmanager
+    def use(self, name):
+        """Entrega el modelo ``name`` con uso exclusivo mientras dura el bloque."""
+        entry = self._acquire_entry(name)
+        try:
+            with entry.lock:
+                yield entry.model
+        finally:
+            self._release_entry(entry)
+
+    def warm_up(self, name):
+        """Carga ``name`` en segundo plano si todavía no está residente.
+
+        Returns:
+            bool: True si se inició una carga nueva.
+        """
+        with self._lock:
+            if name in self._entries or name in self._warming:
+                return False
+            self._warming.add(name)
+
+        def _worker():
+            try:
+                entry = self._acquire_entry(name)
+                self._release_entry(entry)
+            except Exception as e:
+                print(f"No se pudo precargar el modelo '{name}': {str(e)}")
+            finally:
+                # Si el modelo se expulsa más tarde, se podrá volver a precargar
+                with self._lock:
+                    self._warming.discard(name)
+
+        threading.Thread(target=_worker, name=f"whisper-warmup-{name}", daemon=True).start()
+        return True
+
+    def loaded_models(self):
+        """Lista los modelos residentes, del menos al más recientemente usado."""
+        with self._lock:
+            return list(self._entries)
+
+
+# Registro único del proceso / Process-wide registry
+registry = ModelRegistry()
+
+
+def use_model(name):
+    """Atajo para ``registry.use(name)``."""
+    return registry.use(name)
+
+
+def warm_up(name):
+    """Atajo para ``registry.warm_up(name)``."""
+    return registry.warm_up(name)
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Compara la transcripción de muchos archivos cortos uno a uno (``model.transcribe``
+por archivo) con la transcripción por lotes (avtools.batch_transcription).
+
+Uso:
+    python benchmarks/bench_batch_transcription.py --input notas/*.ogg --model tiny
+    python benchmarks/bench_batch_transcription.py --files 40   # genera clips de prueba
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from avtools import audio_cache
+from avtools import batch_transcription
+from avtools import whisper_models
+
+
+def generate_fixtures(work_dir, count, duration=12):
+    """Genera ``count`` clips cortos deterministas (tonos de distinta frecuencia)."""
+    paths = []
+    for i in range(count):
+        path = os.path.join(work_dir, f"clip_{i:03d}.wav")
+        subprocess.run(
+            [
+                "ffmpeg",
+                "-hide_banner",
+                "-loglevel",
+                "error",
+                "-y",
+                "-f",
+                "lavfi",
+                "-i",
+                f"sine=frequency={220 + 20 * i}:duration={duration}",
+                "-ar",
+                "16000",
+                path,
+            ],
+            check=True,
+        )
+        paths.append(path)
+    return paths
+
+
+def run_sequential(paths, model_name, language):
+    with whisper_models.use_model(model_name) as model:
+        for path in paths:
+            model.transcribe(audio_cache.load_audio(path), language=language)
+
+
+def run_batched(paths, model_name, language, batch_size):
+    batch_transcription.transcribe_files(paths, model_name, language, batch_size)
+
+
+def measure(name, fn, audio_seconds):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    return {
+        "engine": name,
+        "seconds": round(elapsed, 3),
+        "audio_seconds_per_second": round(audio_seconds / elapsed, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de transcripción por lotes")
+    parser.add_argument("--input", nargs="*", help="Archivos de entrada")
+    parser.add_argument("--files", type=int, default=40, help="Clips a generar")
+    parser.add_argument("--model", default="tiny")
+    parser.add_argument("--language", default="es")
+    parser.add_argument(
+        "--batch-size", type=int, default=batch_transcription.DEFAULT_BATCH_SIZE
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        paths = args.input or generate_fixtures(work_dir, args.files)
+        # Decodificar y cargar el modelo antes de medir, para comparar solo la inferencia
+        audio_seconds = sum(
+            len(audio_cache.load_audio(p)) / audio_cache.SAMPLE_RATE for p in paths
+        )
+        with whisper_models.use_model(args.model):
+            pass
+
+        results = [
+            measure(
+                "sequential",
+                lambda: run_sequential(paths, args.model, args.language),
+                audio_seconds,
+            ),
+            measure(
+                "batched",
+                lambda: run_batched(paths, args.model, args.language, args.batch_size),
+                audio_seconds,
+            ),
+        ]
+        results[1]["speedup"] = round(results[0]["seconds"] / results[1]["seconds"], 2)
+        print(json.dumps({"files": len(paths), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
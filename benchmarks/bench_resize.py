@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Compara los fotogramas por segundo del cambio de resolución con MoviePy (método
+anterior) y con el grafo de filtros de FFmpeg (avtools.video_resize).
+
+Uso:
+    python benchmarks/bench_resize.py --input video.mp4 --resolution 1280x720
+    python benchmarks/bench_resize.py            # genera un video de prueba 1080p
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from avtools import video_resize
+
+
+def generate_fixture(path, size="1920x1080", duration=20, rate=30):
+    """Genera un video de prueba determinista con testsrc2 y un tono senoidal."""
+    subprocess.run(
+        [
+            "ffmpeg",
+            "-hide_banner",
+            "-loglevel",
+            "error",
+            "-y",
+            "-f",
+            "lavfi",
+            "-i",
+            f"testsrc2=size={size}:rate={rate}:duration={duration}",
+            "-f",
+            "lavfi",
+            "-i",
+            f"sine=frequency=440:duration={duration}",
+            "-c:v",
+            "libx264",
+            "-preset",
+            "veryfast",
+            "-c:a",
+            "aac",
+            "-shortest",
+            path,
+        ],
+        check=True,
+    )
+
+
+def count_frames(path):
+    """Cuenta los paquetes de video sin decodificar."""
+    output = subprocess.check_output(
+        [
+            "ffprobe",
+            "-v",
+            "error",
+            "-select_streams",
+            "v:0",
+            "-count_packets",
+            "-show_entries",
+            "stream=nb_read_packets",
+            "-of",
+            "csv=p=0",
+            path,
+        ]
+    )
+    return int(output.decode("utf-8").strip())
+
+
+def run_moviepy(input_path, output_path, width, height):
+    from moviepy.editor import VideoFileClip
+
+    video = VideoFileClip(input_path)
+    resized_video = video.resize(newsize=(width, height))
+    resized_video.write_videofile(output_path, codec="libx264", logger=None)
+    video.close()
+    resized_video.close()
+
+
+def run_ffmpeg(input_path, output_path, width, height, scaler, preset, threads):
+    video_resize.resize_video(
+        input_path, output_path, width, height, scaler, preset, threads
+    )
+
+
+def measure(name, fn, frames):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    return {"engine": name, "seconds": round(elapsed, 3), "fps": round(frames / elapsed, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de cambio de resolución")
+    parser.add_argument("--input", help="Video de entrada (por defecto, uno generado)")
+    parser.add_argument("--resolution", default="1280x720")
+    parser.add_argument("--scaler", default="bicubic", choices=video_resize.SCALERS)
+    parser.add_argument(
+        "--preset", default="medium", choices=video_resize.X264_PRESETS
+    )
+    parser.add_argument("--threads", type=int, default=0)
+    parser.add_argument(
+        "--skip-moviepy", action="store_true", help="Medir solo el motor de FFmpeg"
+    )
+    args = parser.parse_args()
+
+    width, height = map(int, args.resolution.split("x"))
+    with tempfile.TemporaryDirectory() as work_dir:
+        input_path = args.input
+        if input_path is None:
+            input_path = os.path.join(work_dir, "fixture_1080p.mp4")
+            generate_fixture(input_path)
+        frames = count_frames(input_path)
+
+        results = []
+        if not args.skip_moviepy:
+            results.append(
+                measure(
+                    "moviepy",
+                    lambda: run_moviepy(
+                        input_path, os.path.join(work_dir, "moviepy.mp4"), width, height
+                    ),
+                    frames,
+                )
+            )
+        results.append(
+            measure(
+                "ffmpeg",
+                lambda: run_ffmpeg(
+                    input_path,
+                    os.path.join(work_dir, "ffmpeg.mp4"),
+                    width,
+                    height,
+                    args.scaler,
+                    args.preset,
+                    args.threads,
+                ),
+                frames,
+            )
+        )
+
+    for result in results:
+        print(f"{result['engine']:>8}: {result['seconds']:8.2f} s  {result['fps']:8.2f} fps")
+    if len(results) == 2:
+        print(f" speedup: {results[0]['seconds'] / results[1]['seconds']:.2f}x")
+    print(json.dumps({"frames": frames, "results": results}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Compara el tiempo real de la conversión para carro (recodificación completa) en un
+solo proceso de FFmpeg y por tramos simultáneos (avtools.segment_encode).
+
+Uso:
+    python benchmarks/bench_segment_encode.py --input video.mp4 --segments 2 4 8
+    python benchmarks/bench_segment_encode.py            # genera un video de prueba 1080p
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from avtools import car_conversion
+from avtools import ffmpeg_utils
+from avtools import segment_encode
+
+
+def generate_fixture(path, size="1920x1080", duration=120, rate=30):
+    """Genera un video de prueba determinista con testsrc2 y un tono senoidal."""
+    subprocess.run(
+        [
+            "ffmpeg",
+            "-hide_banner",
+            "-loglevel",
+            "error",
+            "-y",
+            "-f",
+            "lavfi",
+            "-i",
+            f"testsrc2=size={size}:rate={rate}:duration={duration}",
+            "-f",
+            "lavfi",
+            "-i",
+            f"sine=frequency=440:duration={duration}",
+            "-c:v",
+            "libx264",
+            "-preset",
+            "ultrafast",
+            "-g",
+            str(rate * 2),
+            "-c:a",
+            "aac",
+            "-shortest",
+            path,
+        ],
+        check=True,
+    )
+
+
+def video_args(preset):
+    return [preset if arg == "medium" else arg for arg in car_conversion.VIDEO_ARGS]
+
+
+def measure(name, fn, duration):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    return {"mode": name, "seconds": round(elapsed, 3), "rtf": round(elapsed / duration, 4)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de codificación por tramos")
+    parser.add_argument("--input", help="Video de entrada (por defecto, uno generado)")
+    parser.add_argument("--duration", type=float, default=120, help="Duración del video generado (s)")
+    parser.add_argument("--segments", type=int, nargs="+", default=[2, 4])
+    parser.add_argument("--preset", default="medium", help="Preset de x264 (el de la conversión es medium)")
+    args = parser.parse_args()
+
+    print(f"Núcleos: {os.cpu_count()}", file=sys.stderr)
+    with tempfile.TemporaryDirectory() as work_dir:
+        input_path = args.input
+        if input_path is None:
+            input_path = os.path.join(work_dir, "fixture_1080p.mp4")
+            generate_fixture(input_path, duration=int(args.duration))
+            duration = args.duration
+        else:
+            from avtools import media_probe
+
+            duration = media_probe.probe(input_path).duration
+
+        results = [
+            measure(
+                "single",
+                lambda: ffmpeg_utils.run_ffmpeg(
+                    [
+                        "-i",
+                        input_path,
+                        *video_args(args.preset),
+                        *car_conversion.AUDIO_ARGS,
+                        os.path.join(work_dir, "single.mp4"),
+                    ]
+                ),
+                duration,
+            )
+        ]
+        for segments in args.segments:
+            results.append(
+                measure(
+                    f"{segments} tramos",
+                    lambda: segment_encode.encode_in_segments(
+                        input_path,
+                        os.path.join(work_dir, f"tramos_{segments}.mp4"),
+                        video_args(args.preset),
+                        car_conversion.AUDIO_ARGS,
+                        segments,
+                        duration,
+                    ),
+                    duration,
+                )
+            )
+
+    single = results[0]["seconds"]
+    for result in results:
+        print(
+            f"{result['mode']:>10}: {result['seconds']:8.2f} s  RTF {result['rtf']:.3f}"
+            f"  speedup {single / result['seconds']:.2f}x"
+        )
+    print(json.dumps({"duration": duration, "cpu_count": os.cpu_count(), "results": results}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Comprueba el tiempo de arranque en frío de los puntos de entrada.
+
+Importa cada módulo en un intérprete nuevo con ``python -X importtime`` y falla
+(código de salida 1) si no se puede importar, si el tiempo acumulado supera el
+presupuesto o si se carga alguna dependencia pesada que solo deben importar las
+tareas que la usan (whisper, torch, NumPy, librosa, MoviePy...). Solo se omiten
+los puntos de entrada cuya dependencia opcional declarada no está instalada.
+
+Uso:
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --budget-ms textodesdeaudiovideo=150
+    python benchmarks/import_time.py --json
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Presupuesto de arranque (ms) de cada punto de entrada. El de la aplicación
+# incluye Streamlit, que por sí solo ocupa la mayor parte.
+DEFAULT_BUDGETS_MS = {
+    "textodesdeaudiovideo": 150,
+    "TranscriptorAV": 2500,
+}
+
+# Módulos que ningún punto de entrada debe importar al arrancar
+FORBIDDEN_MODULES = (
+    "whisper",
+    "torch",
+    "numpy",
+    "librosa",
+    "soundfile",
+    "pydub",
+    "moviepy",
+    "PIL",
+)
+
+# Excepciones por punto de entrada: ``st.image`` (el logo) hace que Streamlit
+# cargue NumPy y PIL por su cuenta
+ALLOWED_MODULES = {
+    "TranscriptorAV": ("numpy", "PIL"),
+}
+
+# Dependencias opcionales por punto de entrada: si faltan en este entorno, el
+# punto de entrada se omite en lugar de fallar. Cualquier otro error al importar
+# es un fallo.
+OPTIONAL_DEPENDENCIES = {
+    "TranscriptorAV": ("streamlit",),
+}
+
+_MISSING_RE = re.compile(r"ModuleNotFoundError: No module named '([^']+)'")
+
+_LINE_RE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+class ImportFailed(RuntimeError):
+    """El punto de entrada no se pudo importar.
+
+    Attributes:
+        missing (str): Paquete de primer nivel que no está instalado, si esa fue la causa.
+    """
+
+    def __init__(self, message, missing=None):
+        super().__init__(message)
+        self.missing = missing
+
+
+def measure_import(module):
+    """Importa ``module`` en un proceso nuevo.
+
+    Returns:
+        dict: Tiempo acumulado del módulo (ms) y módulos de primer nivel cargados.
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if completed.returncode != 0:
+        last_line = completed.stderr.strip().splitlines()[-1]
+        match = _MISSING_RE.search(last_line)
+        raise ImportFailed(last_line, match.group(1).split(".")[0] if match else None)
+
+    cumulative_us = None
+    loaded = set()
+    for line in completed.stderr.splitlines():
+        match = _LINE_RE.match(line)
+        if not match:
+            continue
+        name = match.group(4)
+        loaded.add(name.split(".")[0])
+        if name == module:
+            cumulative_us = int(match.group(2))
+    return {"module": module, "ms": round(cumulative_us / 1000, 1), "loaded": loaded}
+
+
+def parse_budgets(values):
+    budgets = dict(DEFAULT_BUDGETS_MS)
+    for value in values or []:
+        module, ms = value.split("=")
+        budgets[module] = float(ms)
+    return budgets
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Presupuesto de tiempo de importación")
+    parser.add_argument(
+        "--budget-ms",
+        action="append",
+        metavar="MODULO=MS",
+        help="Sustituye el presupuesto de un punto de entrada",
+    )
+    parser.add_argument(
+        "--module",
+        action="append",
+        help="Medir solo estos módulos (por defecto, todos los puntos de entrada)",
+    )
+    parser.add_argument("--json", action="store_true", help="Salida en JSON")
+    args = parser.parse_args()
+
+    budgets = parse_budgets(args.budget_ms)
+    failures = []
+    report = []
+    for module in args.module or list(budgets):
+        try:
+            result = measure_import(module)
+        except ImportFailed as e:
+            if e.missing is not None and e.missing in OPTIONAL_DEPENDENCIES.get(module, ()):
+                # Por ejemplo, Streamlit no está instalado en este entorno
+                report.append({"module": module, "skipped": str(e)})
+            else:
+                report.append({"module": module, "error": str(e)})
+                failures.append(f"{module} no se puede importar: {e}")
+            continue
+        loaded = result["loaded"] - set(ALLOWED_MODULES.get(module, ()))
+        forbidden = sorted(set(FORBIDDEN_MODULES) & loaded)
+        budget = budgets.get(module)
+        entry = {"module": module, "ms": result["ms"], "budget_ms": budget}
+        if forbidden:
+            entry["forbidden"] = forbidden
+            failures.append(f"{module} importa al arrancar: {', '.join(forbidden)}")
+        if budget is not None and result["ms"] > budget:
+            failures.append(f"{module}: {result['ms']} ms > {budget} ms")
+        report.append(entry)
+
+    if args.json:
+        print(json.dumps({"results": report, "failures": failures}, indent=2))
+    else:
+        for entry in report:
+            if "skipped" in entry:
+                print(f"{entry['module']}: omitido ({entry['skipped']})")
+            elif "error" in entry:
+                print(f"{entry['module']}: error al importar")
+            else:
+                print(f"{entry['module']}: {entry['ms']} ms (presupuesto {entry['budget_ms']} ms)")
+        for failure in failures:
+            print(f"FALLO: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
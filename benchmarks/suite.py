@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Suite de benchmarks reproducible con fixtures sintéticos.
+
+Los fixtures se generan sin conexión con las fuentes ``lavfi`` de FFmpeg
+(``testsrc2``, ``sine`` y ``anoisesrc`` con semilla fija), así que son idénticos
+en cada máquina. Cada operación se ejecuta en un proceso hijo nuevo y se mide
+con ``os.wait4``: tiempo real, tiempo de CPU (incluidos los procesos de FFmpeg
+que lance) y pico de memoria residente. El factor de tiempo real (RTF) es el
+tiempo real dividido por la duración del medio: menos de 1 es más rápido que
+la reproducción.
+
+Uso:
+    python benchmarks/suite.py run --output resultados.json
+    python benchmarks/suite.py run --quick --only split_audio enhance_audio
+    python benchmarks/suite.py compare base.json resultados.json --threshold 0.10
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_FIXTURES_DIR = os.path.join(tempfile.gettempdir(), "transcriptorav-bench-fixtures")
+
+# nombre -> (entradas lavfi, argumentos de codificación, extensión, duración en s)
+FIXTURES = {
+    "video_480p_mpeg4": (
+        ["testsrc2=size=854x480:rate=30", "sine=frequency=440"],
+        ["-c:v", "mpeg4", "-q:v", "5", "-c:a", "libmp3lame"],
+        ".avi",
+        30,
+    ),
+    "video_1080p_h264": (
+        ["testsrc2=size=1920x1080:rate=30", "sine=frequency=440"],
+        ["-c:v", "libx264", "-preset", "veryfast", "-c:a", "aac"],
+        ".mp4",
+        20,
+    ),
+    "video_4k_h264": (
+        ["testsrc2=size=3840x2160:rate=30", "sine=frequency=440"],
+        ["-c:v", "libx264", "-preset", "ultrafast", "-c:a", "aac"],
+        ".mp4",
+        5,
+    ),
+    "video_720p_vp9": (
+        ["testsrc2=size=1280x720:rate=25", "sine=frequency=330"],
+        ["-c:v", "libvpx-vp9", "-deadline", "realtime", "-c:a", "libopus"],
+        ".webm",
+        10,
+    ),
+    "audio_sine_mp3": (
+        ["sine=frequency=440:sample_rate=44100"],
+        ["-c:a", "libmp3lame", "-b:a", "128k"],
+        ".mp3",
+        600,
+    ),
+    "audio_noise_wav": (
+        ["anoisesrc=color=pink:seed=42:sample_rate=48000:amplitude=0.3"],
+        ["-c:a", "pcm_s16le"],
+        ".wav",
+        300,
+    ),
+    "audio_sine_ogg": (
+        ["sine=frequency=220:sample_rate=48000"],
+        ["-c:a", "libvorbis", "-q:a", "4"],
+        ".ogg",
+        120,
+    ),
+}
+
+# Con --quick, cada fixture dura como máximo esto (segundos)
+QUICK_MAX_SECONDS = 10
+
+VIDEO_FIXTURES = ["video_480p_mpeg4", "video_1080p_h264", "video_4k_h264", "video_720p_vp9"]
+AUDIO_FIXTURES = ["audio_sine_mp3", "audio_noise_wav", "audio_sine_ogg"]
+
+# operación -> fixtures sobre los que se mide ("*" = un lote con todos los videos)
+OPERATIONS = {
+    "split_audio": AUDIO_FIXTURES,
+    "enhance_audio": AUDIO_FIXTURES,
+    "transcribe_audio": ["audio_sine_ogg"],
+    "convert_video_to_audio": VIDEO_FIXTURES,
+    "convert_video_for_car": VIDEO_FIXTURES,
+    "compress_video": VIDEO_FIXTURES,
+    "change_video_resolution": VIDEO_FIXTURES,
+    "batch_convert_videos_for_car": ["*"],
+}
+
+
+def fixture_duration(name, quick):
+    duration = FIXTURES[name][3]
+    return min(duration, QUICK_MAX_SECONDS) if quick else duration
+
+
+def generate_fixture(name, fixtures_dir, quick=False):
+    """Genera (una sola vez) el fixture ``name`` y devuelve su ruta."""
+    sources, codec_args, extension, _ = FIXTURES[name]
+    duration = fixture_duration(name, quick)
+    path = os.path.join(fixtures_dir, f"{name}_{duration}s{extension}")
+    if os.path.exists(path):
+        return path
+    os.makedirs(fixtures_dir, exist_ok=True)
+    inputs = []
+    for source in sources:
+        inputs += ["-f", "lavfi", "-i", f"{source}:duration={duration}"]
+    partial = f"{path}.part{extension}"
+    subprocess.run(
+        ["ffmpeg", "-hide_banner", "-loglevel", "error", "-y", *inputs, *codec_args, "-shortest", partial],
+        check=True,
+    )
+    os.replace(partial, path)
+    return path
+
+
+def run_operation(operation, input_path, work_dir):
+    """Ejecuta una operación pública (se llama dentro del proceso hijo)."""
+    import textodesdeaudiovideo as cli
+    from avtools import video_compress
+    from avtools import video_resize
+
+    os.chdir(work_dir)
+    base_name = os.path.splitext(os.path.basename(input_path))[0]
+    if operation == "split_audio":
+        cli.split_audio(input_path, split_time=1)
+    elif operation == "enhance_audio":
+        cli.enhance_audio(input_path)
+    elif operation == "transcribe_audio":
+        cli.transcribe_audio(input_path, "tiny")
+    elif operation == "convert_video_to_audio":
+        cli.convert_video_to_audio(input_path, "mp3")
+    elif operation == "convert_video_for_car":
+        cli.convert_video_for_car(input_path, f"{base_name}_car_compatible.mp4")
+    elif operation == "compress_video":
+        video_compress.compress_video(
+            input_path, f"{base_name}_compressed.mp4", video_compress.bitrate_for_level("medio")
+        )
+    elif operation == "change_video_resolution":
+        video_resize.resize_video(input_path, f"{base_name}_1280x720.mp4", 1280, 720)
+    elif operation == "batch_convert_videos_for_car":
+        cli.batch_convert_videos_for_car(input_path, os.path.join(work_dir, "salida"), jobs=2)
+    else:
+        raise ValueError(f"Operación desconocida: {operation}")
+
+
+def isolated_env(work_dir):
+    """Entorno del hijo con todas las cachés dentro de su directorio de trabajo.
+
+    Cada repetición usa un directorio nuevo, así que ninguna reutiliza el audio
+    decodificado ni los metadatos de otra (ni las cachés reales del usuario).
+    """
+    cache_dir = os.path.join(work_dir, ".cache")
+    env = dict(os.environ)
+    env.update(
+        {
+            "TRANSCRIPTORAV_AUDIO_CACHE_DIR": os.path.join(cache_dir, "audio"),
+            "TRANSCRIPTORAV_CACHE_DIR": os.path.join(cache_dir, "resultados"),
+            "TRANSCRIPTORAV_PROBE_CACHE": os.path.join(cache_dir, "probe.sqlite"),
+            "TRANSCRIPTORAV_METRICS_DIR": os.path.join(cache_dir, "metricas"),
+        }
+    )
+    return env
+
+
+def measure(operation, input_path):
+    """Mide una ejecución de ``operation`` en un proceso hijo aislado."""
+    with tempfile.TemporaryDirectory() as work_dir, tempfile.TemporaryFile() as stderr_file:
+        output_dir = os.path.join(work_dir, "trabajo")
+        os.makedirs(output_dir)
+        started = time.perf_counter()
+        # stderr va a un archivo: un hijo muy verboso no puede llenar la tubería y bloquearse
+        process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "_child", operation, input_path, output_dir],
+            stdout=subprocess.DEVNULL,
+            stderr=stderr_file,
+            env=isolated_env(work_dir),
+        )
+        # wait4 devuelve el uso de recursos del hijo y de los procesos que este esperó
+        _, status, usage = os.wait4(process.pid, 0)
+        wall = time.perf_counter() - started
+        stderr_file.seek(0)
+        stderr = stderr_file.read().decode("utf-8", errors="replace")
+        if os.waitstatus_to_exitcode(status) != 0:
+            raise RuntimeError(stderr.strip().splitlines()[-1] if stderr.strip() else "error")
+        # Las funciones de la CLI informan de sus errores sin lanzar excepciones:
+        # una operación que no deja ningún archivo de salida ha fallado
+        if not any(files for _, _, files in os.walk(output_dir)):
+            raise RuntimeError("la operación no generó ningún archivo de salida")
+    return {
+        "wall_s": wall,
+        "cpu_s": usage.ru_utime + usage.ru_stime,
+        "peak_rss_mb": usage.ru_maxrss / 1024,
+    }
+
+
+def environment():
+    ffmpeg_version = subprocess.run(
+        ["ffmpeg", "-version"], capture_output=True, text=True
+    ).stdout.split("\n")[0]
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "ffmpeg": ffmpeg_version,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def command_run(args):
+    operations = args.only or list(OPERATIONS)
+    results = []
+    for operation in operations:
+        for fixture in OPERATIONS[operation]:
+            if fixture == "*":
+                batch_dir = os.path.join(args.fixtures_dir, "lote_quick" if args.quick else "lote")
+                os.makedirs(batch_dir, exist_ok=True)
+                for name in VIDEO_FIXTURES:
+                    source = generate_fixture(name, args.fixtures_dir, args.quick)
+                    link = os.path.join(batch_dir, os.path.basename(source))
+                    if not os.path.exists(link):
+                        os.link(source, link)
+                input_path = batch_dir
+                media_seconds = sum(fixture_duration(n, args.quick) for n in VIDEO_FIXTURES)
+                fixture = "all_videos"
+            else:
+                input_path = generate_fixture(fixture, args.fixtures_dir, args.quick)
+                media_seconds = fixture_duration(fixture, args.quick)
+
+            entry = {"operation": operation, "fixture": fixture, "media_seconds": media_seconds}
+            try:
+                runs = [measure(operation, input_path) for _ in range(args.repeat)]
+            except Exception as e:
+                entry["error"] = str(e)
+                print(f"{operation} [{fixture}]: ERROR {e}", file=sys.stderr)
+                results.append(entry)
+                continue
+            wall = statistics.median(r["wall_s"] for r in runs)
+            entry.update(
+                {
+                    "wall_s": round(wall, 3),
+                    "cpu_s": round(statistics.median(r["cpu_s"] for r in runs), 3),
+                    "peak_rss_mb": round(max(r["peak_rss_mb"] for r in runs), 1),
+                    "rtf": round(wall / media_seconds, 4),
+                    "repeat": args.repeat,
+                }
+            )
+            print(
+                f"{operation} [{fixture}]: {entry['wall_s']} s, CPU {entry['cpu_s']} s, "
+                f"{entry['peak_rss_mb']} MB, RTF {entry['rtf']}",
+                file=sys.stderr,
+            )
+            results.append(entry)
+
+    report = {"environment": environment(), "quick": args.quick, "results": results}
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+def command_compare(args):
+    """Compara dos informes y falla si alguna métrica empeora más del umbral."""
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = {(r["operation"], r["fixture"]): r for r in json.load(f)["results"]}
+    with open(args.current, encoding="utf-8") as f:
+        current = json.load(f)["results"]
+
+    regressions = []
+    for result in current:
+        key = (result["operation"], result["fixture"])
+        base = baseline.get(key)
+        if base is None or "error" in base or "error" in result:
+            continue
+        for metric in ("wall_s", "peak_rss_mb"):
+            if not base[metric]:
+                continue
+            change = (result[metric] - base[metric]) / base[metric]
+            flag = ""
+            if change > args.threshold:
+                flag = "  << REGRESIÓN"
+                regressions.append((key, metric, change))
+            print(
+                f"{key[0]:<30} {key[1]:<18} {metric:<12} "
+                f"{base[metric]:>10} -> {result[metric]:>10} ({change:+.1%}){flag}"
+            )
+    if regressions:
+        print(f"\n{len(regressions)} regresiones por encima del {args.threshold:.0%}")
+        sys.exit(1)
+
+
+def main():
+    if len(sys.argv) == 5 and sys.argv[1] == "_child":
+        run_operation(*sys.argv[2:])
+        return
+
+    parser = argparse.ArgumentParser(description="Suite de benchmarks de TranscriptorAV")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Ejecutar los benchmarks")
+    run_parser.add_argument("--output", help="Archivo JSON de resultados (por defecto, stdout)")
+    run_parser.add_argument("--only", nargs="+", choices=list(OPERATIONS))
+    run_parser.add_argument("--repeat", type=int, default=3)
+    run_parser.add_argument(
+        "--quick", action="store_true", help=f"Fixtures de {QUICK_MAX_SECONDS} s como máximo"
+    )
+    run_parser.add_argument("--fixtures-dir", default=DEFAULT_FIXTURES_DIR)
+    run_parser.set_defaults(func=command_run)
+
+    compare_parser = subparsers.add_parser("compare", help="Comparar con una línea base")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument(
+        "--threshold", type=float, default=0.10, help="Empeoramiento tolerado (0.10 = 10%%)"
+    )
+    compare_parser.set_defaults(func=command_compare)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
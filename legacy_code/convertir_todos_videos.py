@@ -6,37 +6,26 @@ guardarlos en 'videos_convertidos' y eliminar los originales una vez convertidos
 """
 
 import os
-import subprocess
 import shutil
 import sys
 from pathlib import Path
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from avtools import car_conversion
+from avtools import conversion_journal
+from avtools import ffmpeg_utils
+from avtools import media_probe
+
 
 def obtener_info_video(video_path):
     """Obtiene información del codec, resolución y framerate de un video."""
     try:
-        # Obtener codec
-        codec_cmd = f'ffprobe -v error -select_streams v:0 -show_entries stream=codec_name -of default=noprint_wrappers=1:nokey=1 "{video_path}"'
-        codec = subprocess.check_output(codec_cmd, shell=True).decode("utf-8").strip()
-
-        # Obtener resolución
-        resolution_cmd = f'ffprobe -v error -select_streams v:0 -show_entries stream=width,height -of csv=s=x:p=0 "{video_path}"'
-        resolution = (
-            subprocess.check_output(resolution_cmd, shell=True).decode("utf-8").strip()
-        )
-
-        # Obtener framerate
-        fps_cmd = f'ffprobe -v error -select_streams v:0 -show_entries stream=r_frame_rate -of default=noprint_wrappers=1:nokey=1 "{video_path}"'
-        fps_raw = subprocess.check_output(fps_cmd, shell=True).decode("utf-8").strip()
-
-        # Convertir framerate de formato "num/den" a decimal
-        if "/" in fps_raw:
-            num, den = map(int, fps_raw.split("/"))
-            fps = round(num / den, 2)
-        else:
-            fps = float(fps_raw)
-
-        return {"codec": codec, "resolution": resolution, "fps": fps}
+        # Una sola llamada a ffprobe; los archivos sin cambios se leen de la caché
+        info = media_probe.probe(video_path)
+        if not info.has_video:
+            return None
+        return {"codec": info.video_codec, "resolution": info.resolution, "fps": info.fps}
     except Exception as e:
         print(f"Error al obtener información del video {video_path}: {str(e)}")
         return None
@@ -65,21 +54,42 @@ def es_compatible_con_carro(info_video):
 
 def convertir_video(input_path, output_path):
     """Convierte un video a formato compatible con reproductores de carro."""
+    # Se escribe en un archivo temporal y se renombra al terminar: si el proceso
+    # se interrumpe, nunca queda un "_car_compatible.mp4" truncado
+    temporal = conversion_journal.partial_path(output_path)
     try:
         # Convertir el video a H.264 con resolución 1080p y framerate 25fps
-        cmd = f'ffmpeg -i "{input_path}" -c:v libx264 -profile:v high -level:v 4.0 -preset medium -crf 23 -vf "scale=1920:1080:force_original_aspect_ratio=decrease,pad=1920:1080:(ow-iw)/2:(oh-ih)/2" -r 25 -c:a aac -b:a 128k "{output_path}"'
-        subprocess.run(cmd, shell=True, check=True)
+        ffmpeg_utils.run_ffmpeg(car_conversion.build_car_args(input_path, temporal))
+        os.replace(temporal, output_path)
         return True
     except Exception as e:
-        print(f"Error al convertir el video {input_path}: {str(e)}")
+        print(
+            f"Error al convertir el video {input_path}: {ffmpeg_utils.ffmpeg_error_message(e)}"
+        )
         return False
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
 
 
-def procesar_videos(max_videos=None):
+def copiar_video(input_path, output_path):
+    """Copia un video ya compatible con el mismo esquema de archivo temporal."""
+    temporal = conversion_journal.partial_path(output_path)
+    try:
+        shutil.copy2(input_path, temporal)
+        os.replace(temporal, output_path)
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+
+
+def procesar_videos(max_videos=None, reanudar=False):
     """Procesa todos los videos en 'videos_originales', los convierte y mueve a 'videos_convertidos'.
 
     Args:
         max_videos: Número máximo de videos a procesar. Si es None, procesa todos.
+        reanudar: Si es True, el registro del lote decide qué videos ya están
+            convertidos, sin volver a analizar sus salidas con ffprobe.
     """
     # Crear directorios si no existen
     dir_originales = "videos_originales"
@@ -93,6 +103,8 @@ def procesar_videos(max_videos=None):
         os.makedirs(dir_convertidos)
         print(f"Directorio '{dir_convertidos}' creado.")
 
+    registro = conversion_journal.ConversionJournal.for_output_dir(dir_convertidos)
+
     # Obtener lista de videos en el directorio de originales
     extensiones_video = [
         ".mp4",
@@ -107,7 +119,11 @@ def procesar_videos(max_videos=None):
     videos = []
 
     for ext in extensiones_video:
-        videos.extend(list(Path(dir_originales).glob(f"*{ext}")))
+        videos.extend(
+            v
+            for v in Path(dir_originales).glob(f"*{ext}")
+            if not conversion_journal.is_partial(v.name)
+        )
 
     if not videos:
         print(f"No se encontraron videos en '{dir_originales}'.")
@@ -134,23 +150,34 @@ def procesar_videos(max_videos=None):
 
         print(f"\nProcesando: {video_name}")
 
-        # Verificar si el video ya existe en el directorio de convertidos
-        if os.path.exists(output_path):
+        # Con --reanudar, el registro basta para saber si la salida está completa
+        if reanudar and registro.is_done(video_path_str, output_path):
+            print(f"Ya convertido según el registro del lote.")
+            print(f"Eliminando original: {video_name}")
+            os.remove(video_path_str)
+            videos_eliminados += 1
+            videos_procesados += 1
+            continue
+
+        # Verificar si el video ya existe en el directorio de convertidos. Una salida
+        # existente solo se da por buena si el registro la marca como terminada para
+        # este mismo original: un archivo cualquiera con ese nombre (o una conversión
+        # de otra versión del original) puede pasar la comprobación de ffprobe
+        if not reanudar and os.path.exists(output_path):
             print(
-                f"El video ya existe en '{dir_convertidos}', verificando compatibilidad..."
+                f"El video ya existe en '{dir_convertidos}', verificando registro y compatibilidad..."
             )
-            info_convertido = obtener_info_video(output_path)
-
-            if es_compatible_con_carro(info_convertido):
+            if registro.is_done(video_path_str, output_path) and es_compatible_con_carro(
+                obtener_info_video(output_path)
+            ):
                 print(f"El video convertido es compatible con reproductores de carro.")
                 print(f"Eliminando original: {video_name}")
                 os.remove(video_path_str)
                 videos_eliminados += 1
                 videos_procesados += 1
                 continue
-            else:
-                print(f"El video convertido NO es compatible. Reconvirtiendo...")
-                os.remove(output_path)
+            # La nueva salida se escribe en un archivo temporal y sustituye a esta al terminar
+            print(f"El video convertido no consta como completo o NO es compatible. Reconvirtiendo...")
 
         # Obtener información del video original
         info_video = obtener_info_video(video_path_str)
@@ -165,7 +192,9 @@ def procesar_videos(max_videos=None):
             if es_compatible_con_carro(info_video):
                 print(f"El video ya es compatible con reproductores de carro.")
                 print(f"Copiando a '{dir_convertidos}'...")
-                shutil.copy2(video_path_str, output_path)
+                registro.mark_running(video_path_str, output_path)
+                copiar_video(video_path_str, output_path)
+                registro.mark_done(video_path_str, output_path)
                 print(f"Eliminando original: {video_name}")
                 os.remove(video_path_str)
                 videos_eliminados += 1
@@ -174,8 +203,10 @@ def procesar_videos(max_videos=None):
 
         # Convertir el video
         print(f"Convirtiendo video a formato compatible...")
+        registro.mark_running(video_path_str, output_path)
         if convertir_video(video_path_str, output_path):
             print(f"Conversión exitosa: {output_path}")
+            registro.mark_done(video_path_str, output_path)
 
             # Verificar que la conversión fue exitosa
             info_convertido = obtener_info_video(output_path)
@@ -192,6 +223,7 @@ def procesar_videos(max_videos=None):
                 videos_procesados += 1
         else:
             print(f"Error al convertir el video: {video_name}")
+            registro.mark_failed(video_path_str, "Error de FFmpeg")
 
     # Resumen
     print("\n" + "=" * 50)
@@ -209,8 +241,13 @@ if __name__ == "__main__":
         description="Convierte videos para reproductores de carro"
     )
     parser.add_argument("--max", type=int, help="Número máximo de videos a procesar")
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Repetir solo los videos fallidos, incompletos o modificados según el registro",
+    )
     args = parser.parse_args()
 
     print("Iniciando procesamiento de videos...")
-    procesar_videos(max_videos=args.max)
+    procesar_videos(max_videos=args.max, reanudar=args.resume)
     print("Procesamiento completado.")
@@ -5,6 +5,11 @@ Script para mover videos convertidos y eliminar originales
 """
 
 import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from avtools import name_matcher
 
 
 def main():
@@ -18,10 +23,7 @@ def main():
         return
 
     # Obtener lista de videos convertidos
-    videos_convertidos = []
-    for archivo in os.listdir("videos_convertidos"):
-        if archivo.endswith("_car_compatible.mp4"):
-            videos_convertidos.append(archivo)
+    videos_convertidos = name_matcher.list_videos("videos_convertidos", converted=True)
 
     if not videos_convertidos:
         print("No se encontraron videos convertidos.")
@@ -30,66 +32,48 @@ def main():
     print(f"Se encontraron {len(videos_convertidos)} videos convertidos.")
 
     videos_eliminados = 0
+    sin_confirmar = 0
 
-    # Crear un diccionario para mapear nombres de videos convertidos a sus originales
-    videos_originales = {}
-    for archivo in os.listdir("videos_originales"):
-        if archivo.endswith(".mp4") and not archivo.endswith("_car_compatible.mp4"):
-            # Guardar el nombre sin extensión
-            nombre_base = os.path.splitext(archivo)[0]
-            videos_originales[nombre_base] = archivo
+    # Indexar los originales una sola vez; cada convertido se busca en el índice
+    matcher = name_matcher.NameMatcher(
+        name_matcher.list_videos("videos_originales", converted=False)
+    )
+    emparejados = set()
 
     # Procesar cada video convertido
     for video_convertido in videos_convertidos:
-        # Obtener el nombre base del video convertido (sin el sufijo _car_compatible)
-        nombre_base = video_convertido.replace("_car_compatible.mp4", "")
-
-        # Buscar coincidencias exactas primero
-        if nombre_base in videos_originales:
-            archivo_original = videos_originales[nombre_base]
-            ruta_original = os.path.join("videos_originales", archivo_original)
+        coincidencia = matcher.match(video_convertido, exclude=emparejados)
+        if coincidencia is None:
+            continue
+
+        archivo_original = coincidencia.name
+        ruta_original = os.path.join("videos_originales", archivo_original)
+        tipo = "exacta" if coincidencia.kind == name_matcher.EXACT else "parcial"
+
+        # Confirmar con la duración antes de borrar nada
+        if not name_matcher.durations_match(
+            ruta_original, os.path.join("videos_convertidos", video_convertido)
+        ):
             print(
-                f"Eliminando video original (coincidencia exacta): {archivo_original}"
+                f"Conservando {archivo_original} (coincidencia {tipo} con "
+                f"{video_convertido}, pero la duración no coincide o no se pudo leer)"
             )
-            try:
-                os.remove(ruta_original)
-                videos_eliminados += 1
-                continue
-            except Exception as e:
-                print(f"Error al eliminar {archivo_original}: {str(e)}")
-
-        # Si no hay coincidencia exacta, buscar coincidencias parciales
-        for nombre_original, archivo_original in videos_originales.items():
-            # Comparar ignorando mayúsculas/minúsculas y algunos caracteres especiales
-            nombre_base_limpio = (
-                nombre_base.lower().replace(" ", "").replace("-", "").replace("_", "")
-            )
-            nombre_original_limpio = (
-                nombre_original.lower()
-                .replace(" ", "")
-                .replace("-", "")
-                .replace("_", "")
-            )
-
-            # Verificar si el nombre original está contenido en el nombre convertido o viceversa
-            if (
-                nombre_base_limpio in nombre_original_limpio
-                or nombre_original_limpio in nombre_base_limpio
-            ):
-                ruta_original = os.path.join("videos_originales", archivo_original)
-                print(
-                    f"Eliminando video original (coincidencia parcial): {archivo_original}"
-                )
-                try:
-                    os.remove(ruta_original)
-                    videos_eliminados += 1
-                    break
-                except Exception as e:
-                    print(f"Error al eliminar {archivo_original}: {str(e)}")
+            sin_confirmar += 1
+            continue
+
+        # Solo una pareja confirmada retira el original del resto de búsquedas
+        emparejados.add(archivo_original)
+        print(f"Eliminando video original (coincidencia {tipo}): {archivo_original}")
+        try:
+            os.remove(ruta_original)
+            videos_eliminados += 1
+        except Exception as e:
+            print(f"Error al eliminar {archivo_original}: {str(e)}")
 
     print(f"\nResumen:")
     print(f"  - Videos convertidos encontrados: {len(videos_convertidos)}")
     print(f"  - Videos originales eliminados: {videos_eliminados}")
+    print(f"  - Coincidencias sin confirmar (conservadas): {sin_confirmar}")
 
 
 if __name__ == "__main__":
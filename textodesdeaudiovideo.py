@@ -33,12 +33,24 @@ Nota: Asegúrese de tener una conexión estable a internet para la instalación
 
 import os
 import argparse
-import subprocess
-from pydub import AudioSegment
-import librosa
-import soundfile as sf
-import whisper
-from moviepy.editor import VideoFileClip
+
+from avtools import whisper_models
+from avtools import chunked_transcription
+from avtools import audio_cache
+from avtools import vad
+from avtools import audio_extract
+from avtools import audio_split
+from avtools import audio_enhance
+from avtools import ffmpeg_utils
+from avtools import ffmpeg_progress
+from avtools import car_conversion
+from avtools import metrics
+from avtools import transcript_store
+
+
+# Las funciones de cada modo devuelven sus archivos de salida (None si fallan)
+def returned_outputs(result):
+    return result
 
 
 # Función para listar archivos de audio y video en el directorio actual
@@ -52,76 +64,121 @@ def list_media_files(directory="."):
 
 
 # Función para dividir el archivo de audio
-def split_audio(input_file, split_time):
-    audio = AudioSegment.from_file(input_file)
-    duration = len(audio)
-    split_ms = int(
-        split_time * 60 * 1000
-    )  # Convertir minutos a milisegundos y a entero
-
-    base_name, extension = os.path.splitext(os.path.basename(input_file))
-
-    for i, start in enumerate(range(0, duration, split_ms)):
-        end = start + split_ms
-        if end > duration:
-            end = duration
-        chunk = audio[start:end]
-        output_file = f"{base_name}_part_{i+1}{extension}"
-        chunk.export(output_file, format=extension[1:])
+@metrics.tracked("split_audio", outputs=returned_outputs)
+def split_audio(input_file, split_time=None, max_mb=None):
+    # Copia los paquetes de audio a cada parte con FFmpeg, sin decodificar el archivo
+    segment_seconds = split_time * 60 if split_time else None  # Convertir minutos a segundos
+    metrics.add_bytes(bytes_in=os.path.getsize(input_file))
+    with metrics.stage("split"):
+        parts, plan = audio_split.split_audio(
+            input_file, segment_seconds=segment_seconds, max_mb=max_mb
+        )
+    if plan == audio_extract.TRANSCODE:
+        print("El códec no admite copia directa; las partes se recodificaron.")
+    for i, output_file in enumerate(parts):
         print(f"Parte {i+1} guardada: {output_file}")
+    return parts
 
 
 # Función para mejorar la calidad del audio
+@metrics.tracked("enhance_audio", outputs=returned_outputs)
 def enhance_audio(input_file):
-    # Cargar el archivo de audio
-    y, sr = librosa.load(input_file)
-
-    # Aplicar normalización
-    y_normalized = librosa.util.normalize(y)
-
-    # Aplicar un filtro de realce de frecuencias
-    y_enhanced = librosa.effects.preemphasis(y_normalized)
-
     # Generar el nombre del archivo de salida
     base_name = os.path.splitext(os.path.basename(input_file))[0]
     output_file = f"{base_name}_enhanced.wav"
 
-    # Guardar el audio mejorado
-    sf.write(output_file, y_enhanced, sr)
+    # Normalizar y aplicar el realce de frecuencias por bloques, a la frecuencia original
+    metrics.add_bytes(bytes_in=os.path.getsize(input_file))
+    with metrics.stage("enhance"):
+        stats = audio_enhance.enhance_audio(input_file, output_file)
+    metrics.set_media_seconds(stats["samples"] / stats["sample_rate"])
     print(f"Audio mejorado guardado: {output_file}")
+    print(
+        f"{stats['samples']} muestras a {stats['sample_rate']} Hz procesadas en "
+        f"{stats['seconds']:.2f} s ({stats['samples_per_second']:,.0f} muestras/s)"
+    )
+    return output_file
 
 
 # Función para transcribir audio con Whisper
-def transcribe_audio(input_file, model_name):
-    model = whisper.load_model(model_name)
-    result = model.transcribe(
-        input_file, language="es"
-    )  # Agregar el parámetro language='es' para español
-
-    base_name = os.path.splitext(os.path.basename(input_file))[0]
-    output_file = f"{base_name}_transcription.txt"
-
-    with open(output_file, "w", encoding="utf-8") as f:
-        f.write(result["text"])
-
-    print(f"Transcripción guardada: {output_file}")
+@metrics.tracked("transcribe", outputs=returned_outputs)
+def transcribe_audio(
+    input_file,
+    model_name,
+    chunk_minutes=None,
+    workers=None,
+    vad_backend=None,
+    formats=("txt",),
+    max_line_width=None,
+    paragraphs=False,
+):
+    metrics.add_bytes(bytes_in=os.path.getsize(input_file))
+    if chunk_minutes:
+        # Fragmentos de ~chunk_minutes transcritos en paralelo en varios procesos
+        with metrics.stage("transcribe"):
+            result = chunked_transcription.transcribe_in_chunks(
+                input_file, model_name, "es", chunk_minutes, workers, vad_backend=vad_backend
+            )
+    else:
+        # El modelo queda residente entre transcripciones del modo interactivo
+        # El audio decodificado queda en caché para las siguientes transcripciones
+        audio = audio_cache.load_audio(input_file)
+        with metrics.stage("transcribe"), whisper_models.use_model(model_name) as model:
+            if vad_backend:
+                # Solo se transcriben los tramos con voz
+                result = vad.transcribe_speech(model, audio, vad_backend, language="es")
+                print(f"Audio con voz transcrito: {result['speech_ratio']:.0%}")
+            else:
+                result = model.transcribe(
+                    audio, language="es"
+                )  # Agregar el parámetro language='es' para español
+
+    # Los segmentos se guardan para generar otros formatos sin volver a transcribir
+    base_name = f"{os.path.splitext(os.path.basename(input_file))[0]}_transcription"
+    bundle_path = f"{base_name}{transcript_store.BUNDLE_EXTENSION}"
+    with metrics.stage("write_outputs"):
+        transcript_store.save_bundle(
+            bundle_path, {base_name: transcript_store.SegmentStore.from_result(result)}
+        )
+        output_files = write_transcripts(bundle_path, formats, max_line_width, paragraphs)
+    return output_files + [bundle_path]
+
+
+# Función para generar los formatos de una transcripción guardada
+def write_transcripts(bundle_path, formats, max_line_width=None, paragraphs=False):
+    """Escribe ``nombre.formato`` en el directorio actual por cada transcripción y formato."""
+    output_files = []
+    for name, store in transcript_store.load_bundle(bundle_path).items():
+        for output_format in formats:
+            output_file = f"{name}.{output_format}"
+            with open(output_file, "w", encoding="utf-8") as f:
+                f.write(
+                    transcript_store.render(store, output_format, max_line_width, paragraphs)
+                )
+            print(f"Transcripción guardada: {output_file}")
+            output_files.append(output_file)
+    return output_files
 
 
 # Función para convertir video a audio
+@metrics.tracked("convert_to_audio", outputs=returned_outputs)
 def convert_video_to_audio(input_file, output_format):
-    video = VideoFileClip(input_file)
     base_name = os.path.splitext(os.path.basename(input_file))[0]
     output_file = f"{base_name}.{output_format}"
 
-    if output_format == "mp3":
-        video.audio.write_audiofile(output_file)
-    elif output_format == "wav":
-        video.audio.write_audiofile(output_file, codec="pcm_s16le")
-    elif output_format == "ogg":
-        video.audio.write_audiofile(output_file, codec="libvorbis")
-
-    video.close()
+    # Copia el flujo de audio si el formato lo admite; si no, transcodifica con FFmpeg
+    metrics.add_bytes(bytes_in=os.path.getsize(input_file))
+    progress = ffmpeg_progress.FfmpegProgress(
+        on_update=ffmpeg_progress.print_progress_line
+    )
+    with metrics.stage("encode"):
+        plan = audio_extract.extract_audio(
+            input_file, output_file, output_format, progress
+        )
+    if plan == audio_extract.COPY:
+        print("Flujo de audio copiado sin recodificar.")
     print(f"Audio extraído y guardado como: {output_file}")
+    return output_file
 
 
 # Interfaz para dividir audio
@@ -143,9 +200,14 @@ def split_audio_interface():
         return
 
     input_file = audio_files[file_index]
-    split_time = float(input("Ingrese el tiempo de división en minutos: "))
-
-    split_audio(input_file, split_time)
+    max_mb = input(
+        "Tamaño máximo de cada parte en MB (presione Enter para dividir por tiempo): "
+    )
+    if max_mb:
+        split_audio(input_file, max_mb=float(max_mb))
+    else:
+        split_time = float(input("Ingrese el tiempo de división en minutos: "))
+        split_audio(input_file, split_time)
 
 
 # Interfaz para mejorar audio
@@ -225,97 +287,80 @@ def convert_video_to_audio_interface():
     input_file = video_files[file_index]
 
     print("\nFormatos de audio disponibles:")
-    print("1. mp3")
-    print("2. wav")
-    print("3. ogg")
+    output_formats = audio_extract.OUTPUT_FORMATS
+    for i, output_format in enumerate(output_formats):
+        print(f"{i+1}. {output_format}")
 
     format_choice = input("Seleccione el número del formato de salida: ")
-    output_formats = ["mp3", "wav", "ogg"]
     output_format = output_formats[int(format_choice) - 1]
 
     convert_video_to_audio(input_file, output_format)
 
 
-def convert_video_for_car(input_file, output_file=None):
+@metrics.tracked("convert_for_car", outputs=returned_outputs)
+def convert_video_for_car(input_file, output_file=None, segments=1):
     """Convierte un video a formato compatible con reproductores de carro (H.264, 1080p, 25fps)"""
     if not os.path.exists(input_file):
         print(f"Error: El archivo {input_file} no existe")
         return
 
     # Si no se especifica un archivo de salida, crear uno con sufijo '_car_compatible'
+    # (siempre MP4, el contenedor que aceptan los reproductores)
     if output_file is None:
         file_name_without_extension = os.path.splitext(input_file)[0]
-        file_extension = os.path.splitext(input_file)[1]
-        output_file = f"{file_name_without_extension}_car_compatible{file_extension}"
+        output_file = f"{file_name_without_extension}_car_compatible.mp4"
 
+    metrics.add_bytes(bytes_in=os.path.getsize(input_file))
     try:
-        # Verificar si el video ya está en formato H.264
-        probe_cmd = f'ffprobe -v error -select_streams v:0 -show_entries stream=codec_name -of default=noprint_wrappers=1:nokey=1 "{input_file}"'
-        codec = subprocess.check_output(probe_cmd, shell=True).decode("utf-8").strip()
-
-        if codec == "h264":
-            # Verificar la resolución
-            resolution_cmd = f'ffprobe -v error -select_streams v:0 -show_entries stream=width,height -of csv=s=x:p=0 "{input_file}"'
-            resolution = (
-                subprocess.check_output(resolution_cmd, shell=True)
-                .decode("utf-8")
-                .strip()
+        # Copia, cambia de contenedor, recodifica solo el audio o todo, lo que baste
+        progress = ffmpeg_progress.FfmpegProgress(
+            on_update=ffmpeg_progress.print_progress_line
+        )
+        with metrics.stage("encode"):
+            status = car_conversion.convert_for_car(
+                input_file, output_file, progress=progress, segments=segments
             )
-            width, height = map(int, resolution.split("x"))
-
-            if width <= 1920 and height <= 1080:
-                # El video ya es compatible, solo copiarlo
-                import shutil
-
-                shutil.copy2(input_file, output_file)
-                print(f"El video ya es compatible. Copiado a {output_file}")
-                return
-
-        # Convertir el video a H.264 con resolución 1080p y framerate 25fps
-        cmd = f'ffmpeg -i "{input_file}" -c:v libx264 -profile:v high -level:v 4.0 -preset medium -crf 23 -vf "scale=1920:1080:force_original_aspect_ratio=decrease,pad=1920:1080:(ow-iw)/2:(oh-ih)/2" -r 25 -c:a aac -b:a 128k "{output_file}"'
-        subprocess.run(cmd, shell=True, check=True)
-        print(f"Video convertido exitosamente: {output_file}")
+        print(f"{car_conversion.STATUS_MESSAGES[status]}: {output_file}")
     except Exception as e:
-        print(f"Error al convertir el video: {str(e)}")
+        print(f"Error al convertir el video: {ffmpeg_utils.ffmpeg_error_message(e)}")
+        return None
+    return output_file
 
 
-def batch_convert_videos_for_car(input_dir, output_dir):
+@metrics.tracked("batch_convert_for_car")
+def batch_convert_videos_for_car(input_dir, output_dir, jobs=1, resume=False):
     """Convierte todos los videos en un directorio a formato compatible con reproductores de carro"""
     # Verificar que los directorios existan
     if not os.path.exists(input_dir):
         print(f"Error: El directorio de entrada {input_dir} no existe")
         return
 
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-
-    # Obtener todos los archivos de video en el directorio de entrada
-    video_files = [
-        f
-        for f in os.listdir(input_dir)
-        if f.endswith((".mp4", ".mkv", ".avi", ".mov", ".webm"))
-    ]
-
+    video_files = car_conversion.list_videos(input_dir)
     if not video_files:
         print(f"No se encontraron archivos de video en {input_dir}")
         return
 
     print(f"Se encontraron {len(video_files)} archivos de video para procesar")
-
-    for video_file in video_files:
-        input_path = os.path.join(input_dir, video_file)
-        file_name_without_extension = os.path.splitext(video_file)[0]
-        output_path = os.path.join(
-            output_dir, f"{file_name_without_extension}_car_compatible.mp4"
+    if jobs > 1:
+        print(
+            f"Conversiones simultáneas: {jobs} "
+            f"({car_conversion.threads_per_job(jobs)} hilos de FFmpeg cada una)"
         )
 
-        # Verificar si el archivo ya existe en el directorio de salida
-        if os.path.exists(output_path):
-            print(f"{video_file}: Ya convertido anteriormente")
-            continue
-
-        print(f"Procesando: {video_file}")
-        convert_video_for_car(input_path, output_path)
+    # Los resultados (con el plan aplicado a cada video) se muestran a medida que
+    # termina cada uno. Una línea de progreso del lote se reescribe en la terminal; cada resultado
+    # se imprime encima de ella
+    progress = ffmpeg_progress.BatchProgress(
+        on_update=ffmpeg_progress.print_progress_line
+    )
+    for video_file, status, error in car_conversion.iter_batch_convert(
+        input_dir, output_dir, jobs, resume, progress
+    ):
+        if status == car_conversion.FAILED:
+            line = f"{video_file}: Error - {error}"
+        else:
+            line = f"{video_file}: {car_conversion.STATUS_MESSAGES[status]}"
+        print(f"\r{line:<60}")
 
 
 def main():
@@ -332,6 +377,7 @@ def main():
             "convert",
             "convert-car",
             "batch-convert-car",
+            "render",
             "interactive",
         ],
         default="interactive",
@@ -341,6 +387,11 @@ def main():
     parser.add_argument(
         "--split-time", type=float, help="Tiempo de división en minutos"
     )
+    parser.add_argument(
+        "--split-size-mb",
+        type=float,
+        help="Tamaño máximo de cada parte en MB (alternativa a --split-time)",
+    )
     parser.add_argument(
         "--model",
         type=str,
@@ -351,16 +402,69 @@ def main():
     parser.add_argument(
         "--language", type=str, default="es", help="Idioma para transcripción"
     )
+    parser.add_argument(
+        "--chunk-minutes",
+        type=float,
+        help="Transcribir en paralelo por fragmentos de esta duración (minutos)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Número de procesos para la transcripción por fragmentos "
+        "(por defecto, los que caben en la RAM disponible)",
+    )
+    parser.add_argument(
+        "--vad",
+        choices=sorted(vad.BACKENDS),
+        help="Transcribir solo los tramos con voz, detectados con este método",
+    )
+    parser.add_argument(
+        "--formats",
+        nargs="+",
+        choices=transcript_store.FORMATS,
+        default=["txt"],
+        help="Formatos de la transcripción (modos 'transcribe' y 'render')",
+    )
+    parser.add_argument(
+        "--max-line-width",
+        type=int,
+        help="Ancho máximo de línea de los formatos txt, srt y vtt",
+    )
+    parser.add_argument(
+        "--paragraphs",
+        action="store_true",
+        help="Unir los segmentos de la transcripción en párrafos",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Conversiones simultáneas en el modo 'batch-convert-car'",
+    )
+    parser.add_argument(
+        "--segments",
+        type=int,
+        default=1,
+        help="En 'convert-car', codificar el video en este número de tramos simultáneos",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Repetir solo los videos fallidos, incompletos o modificados según el registro del lote",
+    )
     parser.add_argument(
         "--output-format",
         type=str,
-        choices=["mp3", "wav", "ogg"],
+        choices=audio_extract.OUTPUT_FORMATS,
         default="mp3",
         help="Formato de salida para conversión de video a audio",
     )
 
     args = parser.parse_args()
 
+    # Las métricas de la línea de comandos van a su propio archivo .prom
+    metrics.configure(source="cli")
+
     if args.mode == "interactive":
         # Menú principal interactivo
         while True:
@@ -419,7 +523,13 @@ def main():
                     )
                     or "videos_convertidos"
                 )
-                batch_convert_videos_for_car(input_dir, output_dir)
+                jobs = input(
+                    "Conversiones simultáneas (presione Enter para usar 1): "
+                )
+                resume = input("¿Reanudar el lote anterior? (s/N): ").lower() == "s"
+                batch_convert_videos_for_car(
+                    input_dir, output_dir, int(jobs) if jobs else 1, resume
+                )
             elif choice == "7":
                 break
             else:
@@ -430,10 +540,12 @@ def main():
         )
 
     elif args.mode == "split":
-        if not args.input or not args.split_time:
-            print("Error: Se requiere --input y --split-time para el modo 'split'")
+        if not args.input or not (args.split_time or args.split_size_mb):
+            print(
+                "Error: Se requiere --input y --split-time o --split-size-mb para el modo 'split'"
+            )
             return
-        split_audio(args.input, args.split_time)
+        split_audio(args.input, args.split_time, args.split_size_mb)
 
     elif args.mode == "enhance":
         if not args.input:
@@ -445,7 +557,26 @@ def main():
         if not args.input:
             print("Error: Se requiere --input para el modo 'transcribe'")
             return
-        transcribe_audio(args.input, args.model)
+        transcribe_audio(
+            args.input,
+            args.model,
+            args.chunk_minutes,
+            args.workers,
+            args.vad,
+            args.formats,
+            args.max_line_width,
+            args.paragraphs,
+        )
+
+    elif args.mode == "render":
+        # Otros formatos u opciones de una transcripción ya hecha, sin el modelo
+        if not args.input:
+            print(
+                f"Error: Se requiere --input (un archivo {transcript_store.BUNDLE_EXTENSION}) "
+                "para el modo 'render'"
+            )
+            return
+        write_transcripts(args.input, args.formats, args.max_line_width, args.paragraphs)
 
     elif args.mode == "convert":
         if not args.input:
@@ -457,12 +588,12 @@ def main():
         if not args.input:
             print("Error: Se requiere --input para el modo 'convert-car'")
             return
-        convert_video_for_car(args.input)
+        convert_video_for_car(args.input, segments=args.segments)
 
     elif args.mode == "batch-convert-car":
         input_dir = args.input if args.input else "videos_originales"
         output_dir = "videos_convertidos"
-        batch_convert_videos_for_car(input_dir, output_dir)
+        batch_convert_videos_for_car(input_dir, output_dir, args.jobs, args.resume)
 
 
 if __name__ == "__main__":